@@ -1,9 +1,12 @@
 """Unit tests for `yapapi.engine` module."""
+import asyncio
+import sys
+from unittest import mock
 from unittest.mock import Mock
 
 import pytest
 
-from yapapi import Golem
+from yapapi import Golem, events
 import yapapi.engine
 from yapapi.engine import Job
 import yapapi.rest
@@ -81,3 +84,271 @@ def test_job_id(monkeypatch):
     with pytest.raises(ValueError):
         duplicate_id = used_ids[0]
         Job(engine=Mock(), expiration_time=Mock(), payload=Mock(), id=duplicate_id)
+
+
+@pytest.mark.asyncio
+async def test_job_scores_proposals_in_batches(monkeypatch):
+    """Test that proposals waiting in `unscored_offers` are scored with one `score_offers()` call."""
+
+    scored_batches = []
+    handled = {}
+
+    async def score_offers(offers):
+        scored_batches.append([offer.id for offer in offers])
+        return [float(offer.id) for offer in offers]
+
+    async def handle_proposal(proposal, ignore_draft=False, score=None):
+        handled[proposal.id] = score
+        return Mock()
+
+    engine = Mock(max_proposal_handlers=5)
+    engine._strategy.score_offers = score_offers
+    job = Job(engine=engine, expiration_time=Mock(), payload=Mock())
+    monkeypatch.setattr(job, "_handle_proposal", handle_proposal)
+
+    for n in (1, 2, 3):
+        job.unscored_offers.put_nowait(Mock(issuer=f"provider-{n}", id=n))
+
+    handler_task = asyncio.get_event_loop().create_task(job._handle_all_proposals())
+    await asyncio.sleep(0.1)
+    handler_task.cancel()
+
+    assert scored_batches == [[1, 2, 3]]
+    assert handled == {1: 1.0, 2: 2.0, 3: 3.0}
+
+
+@pytest.mark.asyncio
+async def test_job_batch_scoring_error(monkeypatch):
+    """Test that proposals are scored one by one if `score_offers()` fails."""
+
+    handled = {}
+
+    async def score_offers(_offers):
+        raise RuntimeError("Strategy error")
+
+    async def handle_proposal(proposal, ignore_draft=False, score=None):
+        handled[proposal.id] = score
+        return Mock()
+
+    engine = Mock(max_proposal_handlers=5)
+    engine._strategy.score_offers = score_offers
+    job = Job(engine=engine, expiration_time=Mock(), payload=Mock())
+    monkeypatch.setattr(job, "_handle_proposal", handle_proposal)
+
+    for n in (1, 2):
+        job.unscored_offers.put_nowait(Mock(issuer=f"provider-{n}", id=n))
+
+    handler_task = asyncio.get_event_loop().create_task(job._handle_all_proposals())
+    await asyncio.sleep(0.1)
+    handler_task.cancel()
+
+    assert handled == {1: None, 2: None}
+
+
+def test_max_proposal_handlers_invalid():
+    """Check that `max_proposal_handlers` lower than 1 is rejected."""
+
+    with pytest.raises(ValueError):
+        yapapi.engine._Engine(
+            budget=1.0, strategy=Mock(), event_consumer=Mock(), max_proposal_handlers=0
+        )
+
+
+def test_agreement_race_extra_invalid():
+    """Check that a negative `agreement_race_extra` is rejected."""
+
+    with pytest.raises(ValueError):
+        yapapi.engine._Engine(
+            budget=1.0, strategy=Mock(), event_consumer=Mock(), agreement_race_extra=-1
+        )
+
+
+def test_pipeline_depth_invalid():
+    """Check that `pipeline_depth` lower than 1 is rejected."""
+
+    with pytest.raises(ValueError):
+        yapapi.engine._Engine(budget=1.0, strategy=Mock(), event_consumer=Mock(), pipeline_depth=0)
+
+
+class PipelinedBatch:
+    """A batch whose only command finishes when `finish` is called."""
+
+    def __init__(self, idx: int, log: list, fail: bool = False):
+        self.idx = idx
+        self.log = log
+        self.fail = fail
+        self.finished = asyncio.Event()
+
+    def finish(self):
+        self.finished.set()
+
+    async def __aiter__(self):
+        await self.finished.wait()
+        self.log.append(("executed", self.idx))
+        if self.fail:
+            raise yapapi.rest.activity.BatchError("failed")
+        yield Mock, {"cmd_idx": 0}
+
+
+def mock_script(idx: int, log: list, wait_for_results: bool = False):
+    async def before():
+        log.append(("before", idx))
+
+    async def after():
+        log.append(("after", idx))
+
+    return Mock(
+        timeout=None,
+        wait_for_results=wait_for_results,
+        _before=before,
+        _after=after,
+        _evaluate=Mock(return_value=[]),
+        process_batch_event=Mock(return_value=idx),
+    )
+
+
+async def run_pipeline(pipeline_depth, batches, scripts):
+    engine = yapapi.engine._Engine(
+        budget=1.0, strategy=Mock(), event_consumer=Mock(), pipeline_depth=pipeline_depth
+    )
+    engine.accept_payments_for_agreement = mock.AsyncMock()
+    sent = iter(batches)
+    activity = Mock(send=mock.AsyncMock(side_effect=lambda *_args, **_kwargs: next(sent)))
+    futures = []
+
+    async def worker():
+        for script in scripts:
+            futures.append((yield script))
+
+    task = asyncio.get_event_loop().create_task(
+        engine.process_batches("job", "agreement", activity, worker())
+    )
+    return task, futures
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_process_batches_pipelined():
+    """Check that at most `pipeline_depth` scripts are in flight and finish in order."""
+
+    log: list = []
+    batches = [PipelinedBatch(idx, log) for idx in range(4)]
+    scripts = [mock_script(idx, log) for idx in range(4)]
+    task, futures = await run_pipeline(2, batches, scripts)
+
+    await asyncio.sleep(0.01)
+    # The third script is sent only after the first one finishes
+    assert log == [("before", 0), ("before", 1)]
+
+    batches[1].finish()
+    await asyncio.sleep(0.01)
+    assert log == [("before", 0), ("before", 1), ("executed", 1)]
+
+    batches[0].finish()
+    await asyncio.sleep(0.01)
+    assert log[3:5] == [("executed", 0), ("after", 0)]
+    # Each finished script makes room for the next one
+    assert log.index(("before", 2)) > log.index(("after", 0))
+    assert log.index(("before", 3)) > log.index(("after", 1))
+
+    batches[3].finish()
+    batches[2].finish()
+    with pytest.raises(StopAsyncIteration):
+        await asyncio.wait_for(task, timeout=1)
+    assert [entry for entry in log if entry[0] == "after"] == [("after", n) for n in range(4)]
+    assert [future.result() for future in futures] == [[n] for n in range(4)]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_process_batches_pipelined_error():
+    """Check that an error of a pipelined script doesn't change the order of results."""
+
+    log: list = []
+    batches = [PipelinedBatch(0, log), PipelinedBatch(1, log, fail=True)]
+    scripts = [mock_script(0, log), mock_script(1, log, wait_for_results=True)]
+    task, futures = await run_pipeline(2, batches, scripts)
+
+    await asyncio.sleep(0.01)
+    batches[1].finish()
+    await asyncio.sleep(0.01)
+    # The failed script waits for the first one before its error is raised in the worker
+    assert not task.done()
+
+    batches[0].finish()
+    with pytest.raises(yapapi.rest.activity.BatchError):
+        await asyncio.wait_for(task, timeout=1)
+    assert futures[0].result() == [0]
+    assert log[-1] == ("after", 0)
+
+
+@pytest.mark.asyncio
+async def test_job_receive_proposal_nowait():
+    """Check that proposals are dropped when the job's intake is full."""
+
+    job = Job(engine=Mock(), expiration_time=Mock(), payload=Mock())
+    job.unscored_offers = yapapi.engine.ProposalIntake(maxsize=1)
+
+    assert job._receive_proposal_nowait(Mock(issuer="provider-1"))
+    assert not job._receive_proposal_nowait(Mock(issuer="provider-2"))
+    assert job.offers_collected == 1
+
+
+def test_job_claim_draft():
+    """Check that a job claims only the drafts responding to its counter-proposals, once."""
+
+    job = Job(engine=Mock(), expiration_time=Mock(), payload=Mock())
+    job._counter_proposal_ids["counter-1"] = None
+
+    assert not job._claim_draft(Mock(prev_proposal_id=None))
+    assert not job._claim_draft(Mock(prev_proposal_id="counter-2"))
+    assert job._claim_draft(Mock(prev_proposal_id="counter-1"))
+    assert not job._claim_draft(Mock(prev_proposal_id="counter-1"))
+
+
+@pytest.mark.asyncio
+async def test_job_reports_proposal_handlers():
+    """Check that a job emits an event with the proposal handlers' stats when their limit changes."""
+
+    job = Job(engine=Mock(), expiration_time=Mock(), payload=Mock())
+    job.engine.max_proposal_handlers = 8
+    handling = asyncio.get_event_loop().create_task(job._handle_all_proposals())
+    await asyncio.sleep(0)
+
+    job.proposal_handlers.record_latency(100.0)
+    job.engine.emit.assert_called_once_with(
+        events.ProposalHandlersAdjusted,
+        job=job,
+        limit=job.proposal_handlers.limit,
+        queue_depth=0,
+        throughput=0.0,
+    )
+
+    handling.cancel()
+    await asyncio.sleep(0)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_process_batches_pipelined_worker_error():
+    """Check that pipelined scripts are cancelled when the worker fails."""
+
+    log: list = []
+    batches = [PipelinedBatch(0, log)]
+    failing = mock_script(1, log)
+    failing._before = mock.AsyncMock(side_effect=RuntimeError("upload failed"))
+    task, futures = await run_pipeline(2, batches, [mock_script(0, log), failing])
+
+    # The worker doesn't handle the error of the second script while the first one is running
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(task, timeout=1)
+    assert futures[0].cancelled()
+    assert ("after", 0) not in log
+
+    batches = [PipelinedBatch(idx, log) for idx in range(2)]
+    task, futures = await run_pipeline(2, batches, [mock_script(idx, log) for idx in range(2)])
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert all(future.cancelled() for future in futures)
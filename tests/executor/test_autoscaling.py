@@ -0,0 +1,56 @@
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+
+from yapapi.executor import AutoscalingPolicy, ExecutorLoad
+
+
+def load(workers, idle_workers=0, backlog=0):
+    return ExecutorLoad(
+        workers=workers, idle_workers=idle_workers, backlog=backlog, in_progress=workers
+    )
+
+
+@pytest.mark.parametrize("min_workers, max_workers", [(-1, 5), (3, 2), (0, 0)])
+def test_invalid_bounds(min_workers, max_workers):
+    with pytest.raises(ValueError):
+        AutoscalingPolicy(min_workers=min_workers, max_workers=max_workers)
+
+
+def test_grows_with_backlog():
+    policy = AutoscalingPolicy(min_workers=1, max_workers=10)
+
+    assert policy.desired_workers(load(0, backlog=1)) == 1
+    assert policy.desired_workers(load(1, backlog=1)) == 2
+    assert policy.desired_workers(load(4, backlog=1)) == 8
+    assert policy.desired_workers(load(8, backlog=1)) == 10
+    # Idle workers will take the waiting tasks
+    assert policy.desired_workers(load(4, idle_workers=1, backlog=1)) == 4
+
+
+def test_grows_slowly_when_agreements_are_slow():
+    policy = AutoscalingPolicy(min_workers=1, max_workers=10)
+    policy.observe_task(timedelta(seconds=5))
+    policy.observe_agreement(timedelta(seconds=20))
+
+    assert policy.desired_workers(load(4, backlog=1)) == 5
+
+
+def test_shrinks_after_backlog_drains():
+    policy = AutoscalingPolicy(
+        min_workers=2, max_workers=10, scale_down_delay=timedelta(seconds=30)
+    )
+
+    with mock.patch("time.monotonic", return_value=100.0):
+        assert policy.desired_workers(load(6, idle_workers=5)) == 6
+    with mock.patch("time.monotonic", return_value=120.0):
+        assert policy.desired_workers(load(6, idle_workers=5)) == 6
+    with mock.patch("time.monotonic", return_value=130.0):
+        assert policy.desired_workers(load(6, idle_workers=3)) == 3
+        assert policy.desired_workers(load(6, idle_workers=5)) == 2
+
+    # New backlog resets the delay
+    with mock.patch("time.monotonic", return_value=131.0):
+        policy.desired_workers(load(2, backlog=1))
+        assert policy.desired_workers(load(4, idle_workers=2)) == 4
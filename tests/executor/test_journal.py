@@ -0,0 +1,157 @@
+from decimal import Decimal
+
+import pytest
+
+from yapapi.executor import _serialization
+from yapapi.executor import journal as journal_module, Task, TaskJournal
+from yapapi.executor.task import TaskStatus
+
+
+def accepted_task(data, result) -> Task:
+    task = Task(data=data)
+    task._status = TaskStatus.ACCEPTED
+    task._result = result
+    return task
+
+
+def test_journal_reopen(tmp_path):
+    """Test that tasks recorded in a journal are found after it's reopened."""
+
+    path = tmp_path / "tasks.journal"
+    journal = TaskJournal(path)
+    journal.record(accepted_task({"frame": 1}, "result-1"))
+    journal.record(accepted_task({"frame": 2}, None))
+    # Tasks recorded in this run are not looked up
+    assert journal.lookup({"frame": 1}) is None
+    journal.close()
+
+    journal = TaskJournal(path)
+    assert len(journal) == 2
+    assert journal.lookup({"frame": 1}) == ("result-1",)
+    assert journal.lookup({"frame": 2}) == (None,)
+    assert journal.lookup({"frame": 3}) is None
+
+    journal.record(accepted_task({"frame": 3}, [3]))
+    journal.close()
+    journal = TaskJournal(path)
+    assert journal.lookup({"frame": 3}) == ([3],)
+    journal.close()
+
+
+def test_journal_custom_key(tmp_path):
+    path = tmp_path / "tasks.journal"
+    journal = TaskJournal(path, task_key=lambda data: data["frame"])
+    journal.record(accepted_task({"frame": 1, "attempt": 1}, "result"))
+    journal.close()
+
+    journal = TaskJournal(path, task_key=lambda data: data["frame"])
+    assert journal.lookup({"frame": 1, "attempt": 2}) == ("result",)
+    journal.close()
+
+
+def test_journal_torn_write(tmp_path):
+    """Test that a partially written record is dropped when the journal is reopened."""
+
+    path = tmp_path / "tasks.journal"
+    journal = TaskJournal(path)
+    for n in range(3):
+        journal.record(accepted_task(n, n))
+    journal.close()
+
+    with open(path, "r+b") as f:
+        f.truncate(path.stat().st_size - 1)
+
+    journal = TaskJournal(path)
+    assert len(journal) == 2
+    assert journal.lookup(2) is None
+    journal.record(accepted_task(2, 2))
+    journal.close()
+
+    journal = TaskJournal(path)
+    assert [journal.lookup(n) for n in range(3)] == [(0,), (1,), (2,)]
+    journal.close()
+
+
+def test_journal_lossless_results(tmp_path):
+    """Test that results JSON can't represent are restored exactly."""
+
+    path = tmp_path / "tasks.journal"
+    results = [b"\x00bytes", Decimal("0.1"), (1, 2), {1: "int key"}]
+    journal = TaskJournal(path)
+    for n, result in enumerate(results):
+        journal.record(accepted_task(n, result))
+    journal.close()
+
+    journal = TaskJournal(path)
+    assert [journal.lookup(n) for n in range(len(results))] == [(result,) for result in results]
+    journal.close()
+
+
+def test_journal_errors_not_raised(tmp_path, monkeypatch):
+    """Test that errors recording a task are logged instead of being raised."""
+
+    path = tmp_path / "tasks.journal"
+    journal = TaskJournal(path)
+    journal.record(accepted_task(0, lambda: "can't be pickled"))
+    journal.record(accepted_task(1, 1))
+    journal.sync()
+
+    def disk_full(*_args):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(journal._file, "write", disk_full)
+    journal.record(accepted_task(2, 2))
+    journal.record(accepted_task(3, 3))
+    journal.close()
+
+    journal = TaskJournal(path)
+    assert len(journal) == 1
+    assert journal.lookup(1) == (1,)
+    journal.close()
+
+
+def test_default_task_key():
+    assert _serialization.default_task_key({"b": [1], "a": 2}) == b'{"a":2,"b":[1]}'
+    # Any other representation of data that JSON can't represent could change between runs
+    with pytest.raises(TypeError):
+        _serialization.default_task_key(object())
+
+
+def test_journal_key_errors_not_raised(tmp_path):
+    """Test that tasks whose keys can't be computed are neither looked up nor recorded."""
+
+    def task_key(data):
+        return data["frame"]
+
+    path = tmp_path / "tasks.journal"
+    journal = TaskJournal(path, task_key=task_key)
+    journal.record(accepted_task({"frame": 1}, 1))
+    journal.record(accepted_task({}, 2))
+    journal.close()
+
+    journal = TaskJournal(path, task_key=task_key)
+    assert len(journal) == 1
+    assert journal.lookup({"frame": 1}) == (1,)
+    assert journal.lookup({}) is None
+    journal.close()
+
+    journal = TaskJournal(tmp_path / "default-key.journal")
+    journal.record(accepted_task(object(), 1))
+    assert journal.lookup(object()) is None
+    journal.close()
+
+
+def test_journal_sorted_in_runs(tmp_path, monkeypatch):
+    """Test that records loaded in a number of sorted runs are merged correctly."""
+
+    monkeypatch.setattr(journal_module, "_SORT_CHUNK", 3)
+    path = tmp_path / "tasks.journal"
+    journal = TaskJournal(path)
+    for n in range(10):
+        journal.record(accepted_task(n, n * 10))
+    journal.close()
+
+    journal = TaskJournal(path)
+    assert list(journal._keys) == sorted(journal._keys)
+    assert [journal.lookup(n) for n in range(10)] == [(n * 10,) for n in range(10)]
+    journal.close()
@@ -0,0 +1,55 @@
+import asyncio
+import pytest
+
+from yapapi.executor._reorder import ReorderBuffer
+
+
+@pytest.mark.asyncio
+async def test_reorder_delivers_in_order():
+    delivered = []
+    buffer = ReorderBuffer(delivered.append, window=10)
+    for item in "abcde":
+        await buffer.admit(item)
+
+    buffer.finish("c")
+    buffer.finish("b", deliver=False)
+    assert delivered == []
+    buffer.finish("a")
+    assert delivered == ["a", "c"]
+    buffer.finish("e")
+    buffer.finish("d")
+    assert delivered == ["a", "c", "d", "e"]
+
+    # The dropped item is released as soon as it's reached
+    assert len(buffer) == 4
+    for _ in delivered:
+        buffer.release()
+    assert len(buffer) == 0
+
+
+@pytest.mark.asyncio
+async def test_reorder_window():
+    delivered = []
+    buffer = ReorderBuffer(delivered.append, window=2)
+    await buffer.admit(1)
+    await buffer.admit(2)
+
+    admit = asyncio.ensure_future(buffer.admit(3))
+    await asyncio.sleep(0.01)
+    assert not admit.done()
+
+    # Finishing a later item or delivering the earliest one doesn't make space in the window
+    buffer.finish(2)
+    buffer.finish(1)
+    assert delivered == [1, 2]
+    await asyncio.sleep(0.01)
+    assert not admit.done()
+
+    buffer.release()
+    await asyncio.wait_for(admit, timeout=1)
+    assert len(buffer) == 2
+
+
+def test_reorder_window_invalid():
+    with pytest.raises(ValueError):
+        ReorderBuffer(print, window=0)
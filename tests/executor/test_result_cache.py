@@ -0,0 +1,108 @@
+from decimal import Decimal
+import os
+import pickle
+import tempfile
+import time
+
+import pytest
+
+from yapapi.executor import DiskResultCache, MemoryResultCache
+from yapapi.payload.vm import _VmPackage
+
+
+def vm_payload(image_hash: str) -> _VmPackage:
+    return _VmPackage(
+        repo_url="http://repo", image_hash=image_hash, image_url=None, constraints=None
+    )
+
+
+def test_cache_key():
+    cache = MemoryResultCache()
+    payload = vm_payload("abc")
+
+    assert cache.key({"a": 1, "b": 2}, payload) == cache.key({"b": 2, "a": 1}, payload)
+    assert cache.key({"a": 1}, payload) != cache.key({"a": 2}, payload)
+    assert cache.key({"a": 1}, payload) != cache.key({"a": 1}, vm_payload("def"))
+
+    custom = MemoryResultCache(task_key=lambda data: data["a"])
+    assert custom.key({"a": "x", "b": 1}, payload) == custom.key({"a": "x", "b": 2}, payload)
+
+    # Data that JSON can't represent needs a custom `task_key`
+    with pytest.raises(TypeError):
+        cache.key(object(), payload)
+
+
+def test_memory_cache_lru():
+    cache = MemoryResultCache(maxsize=2)
+    cache.put("k1", 1)
+    cache.put("k2", None)
+    assert cache.get("k1") == (1,)
+    cache.put("k3", 3)
+
+    assert cache.get("k2") is None
+    assert cache.get("k1") == (1,)
+    assert cache.get("k3") == (3,)
+
+
+def test_disk_cache(tmp_path):
+    """Test that results stored on disk are found by another cache using the same directory."""
+
+    cache = DiskResultCache(tmp_path, memory_size=1)
+    cache.put("a" * 64, {"result": 1})
+    cache.put("b" * 64, [2])
+    # The first result is read from disk
+    assert cache.get("a" * 64) == ({"result": 1},)
+
+    cache = DiskResultCache(tmp_path)
+    assert cache.get("a" * 64) == ({"result": 1},)
+    assert cache.get("b" * 64) == ([2],)
+    assert cache.get("c" * 64) is None
+
+
+def test_disk_cache_eviction(tmp_path):
+    """Test that the least recently used results are deleted when the cache grows too big."""
+
+    size = len(pickle.dumps("0123456"))
+    cache = DiskResultCache(tmp_path, max_bytes=2 * size + 2, memory_size=1)
+    cache.put("a" * 64, "0123456")
+    cache.put("b" * 64, "0123456")
+    assert cache.get("a" * 64) == ("0123456",)
+    cache.put("c" * 64, "0123456")
+
+    assert cache.get("b" * 64) is None
+    assert cache.get("a" * 64) == ("0123456",)
+    assert len([path for path in tmp_path.glob("*/*")]) == 2
+
+    # Recency is taken from the files' modification times by a new cache
+    old = time.time() - 100
+    os.utime(tmp_path / "cc" / ("c" * 64), (old, old))
+    cache = DiskResultCache(tmp_path, max_bytes=size + 1)
+    assert cache.get("c" * 64) is None
+    assert cache.get("a" * 64) == ("0123456",)
+
+
+def test_disk_cache_lossless(tmp_path):
+    """Test that results JSON can't represent are restored exactly from disk."""
+
+    results = [b"\x00bytes", Decimal("0.1"), (1, 2)]
+    cache = DiskResultCache(tmp_path, memory_size=1)
+    for n, result in enumerate(results):
+        cache.put(str(n) * 64, result)
+
+    cache = DiskResultCache(tmp_path)
+    assert [cache.get(str(n) * 64) for n in range(3)] == [(result,) for result in results]
+
+
+def test_disk_cache_write_error(tmp_path, monkeypatch):
+    """Test that a result that can't be written to disk is only kept in memory."""
+
+    cache = DiskResultCache(tmp_path)
+
+    def disk_full(*_args, **_kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(tempfile, "mkstemp", disk_full)
+    cache.put("a" * 64, "result")
+    assert cache.get("a" * 64) == ("result",)
+    assert not list(tmp_path.glob("*/*"))
+    assert DiskResultCache(tmp_path).get("a" * 64) is None
@@ -3,8 +3,9 @@ import itertools
 import logging
 import pytest
 from random import randint
+from unittest.mock import Mock
 
-from yapapi.executor._smartq import SmartQueue
+from yapapi.executor._smartq import Handle, SmartQueue, _RescheduledItems
 
 
 async def async_iter(iterable):
@@ -226,3 +227,338 @@ async def test_smartq_finish():
     await q.close()
 
     assert consumed == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_new_items_listener():
+    """Test that listeners are called when new and rescheduled items become available."""
+
+    q = SmartQueue(async_iter([1, 2]))
+    calls = []
+    q.add_new_items_listener(lambda: calls.append(q.has_unassigned_items()))
+    await asyncio.sleep(0.01)
+    assert calls == [True]
+
+    with q.new_consumer() as consumer:
+        handle = await q.get(consumer)
+        await asyncio.sleep(0.01)
+        assert calls == [True, True]
+
+        await q.reschedule(handle)
+        assert calls == [True, True, True]
+
+    await q.close()
+
+
+@pytest.mark.asyncio
+async def test_consumer_finished():
+    q = SmartQueue(async_iter([]))
+    with q.new_consumer() as consumer:
+        assert consumer.finished is False
+        consumer.finish()
+        assert consumer.finished is True
+
+
+@pytest.mark.asyncio
+async def test_release_waiting_consumer():
+    """Test that releasing a consumer waiting for an item stops its iteration."""
+
+    async def iterate(consumer):
+        return [handle.data async for handle in consumer]
+
+    blocking_items = asyncio.Queue()
+
+    async def never_ending():
+        yield await blocking_items.get()
+
+    q = SmartQueue(never_ending())
+    with q.new_consumer() as consumer:
+        task = asyncio.get_event_loop().create_task(iterate(consumer))
+        await asyncio.sleep(0.01)
+        assert consumer.waiting
+        await q.release_consumer(consumer)
+        assert await asyncio.wait_for(task, timeout=1) == []
+        assert not consumer.waiting
+    await q.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("prefetch", [1, 3])
+async def test_prefetch(prefetch):
+    """Test that the queue fetches up to `prefetch` items before they're requested."""
+
+    fetched = []
+
+    async def items():
+        for n in range(10):
+            fetched.append(n)
+            yield n
+
+    q = SmartQueue(items(), prefetch=prefetch)
+    await asyncio.sleep(0.01)
+    # One more item is fetched and waits for space in the buffer
+    assert fetched == list(range(prefetch + 1))
+
+    with q.new_consumer() as consumer:
+        handle = await q.get(consumer)
+        assert handle.data == 0
+        await q.mark_done(handle)
+    await q.close()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_invalid():
+    with pytest.raises(ValueError):
+        SmartQueue(async_iter([]), prefetch=0)
+
+
+def test_rescheduled_items():
+    """Test that rescheduled items are returned only to consumers that haven't had them."""
+
+    consumer_1, consumer_2, consumer_3 = (Mock(owner=None) for _ in range(3))
+    rescheduled = _RescheduledItems()
+
+    handles = [Handle(n, consumer=consumer_1) for n in range(3)]
+    handles[2].assign_consumer(consumer_2)
+    for handle in handles:
+        rescheduled.add(handle)
+    assert len(rescheduled) == 3
+
+    assert rescheduled.pop_for(consumer_1) is None
+    assert rescheduled.pop_for(consumer_2) is handles[0]
+    assert rescheduled.pop_for(consumer_3) is handles[1]
+    assert rescheduled.pop_for(consumer_2) is None
+    assert rescheduled.pop_for(consumer_3) is handles[2]
+    assert not rescheduled
+
+
+@pytest.mark.asyncio
+async def test_rescheduled_item_handed_to_eligible_waiter():
+    """Test that a rescheduled item is handed over to a waiting consumer that hasn't had it."""
+
+    blocking_items = asyncio.Queue()
+
+    async def items():
+        while True:
+            yield await blocking_items.get()
+
+    q = SmartQueue(items())
+    blocking_items.put_nowait(1)
+    await asyncio.sleep(0.01)
+
+    with q.new_consumer() as consumer_1, q.new_consumer() as consumer_2:
+        handle = await q.get(consumer_1)
+        get_1 = asyncio.get_event_loop().create_task(q.get(consumer_1))
+        get_2 = asyncio.get_event_loop().create_task(q.get(consumer_2))
+        await asyncio.sleep(0.01)
+        assert consumer_1 in q._waiters and consumer_2 in q._waiters
+
+        await q.reschedule(handle)
+        assert await asyncio.wait_for(get_2, timeout=1) is handle
+        assert handle.consumer is consumer_2
+        assert not get_1.done()
+
+        get_1.cancel()
+        await q.release_consumer(consumer_2)
+    await q.close()
+
+
+@pytest.mark.asyncio
+async def test_next_batch():
+    """Test that a consumer gets the available items in batches, each item with its own handle."""
+
+    q = SmartQueue(async_iter(range(5)), prefetch=5)
+    await asyncio.sleep(0.01)
+
+    with q.new_consumer() as consumer_1, q.new_consumer() as consumer_2:
+        batch = await consumer_1.next_batch(3)
+        assert [handle.data for handle in batch] == [0, 1, 2]
+        assert all(handle.consumer is consumer_1 for handle in batch)
+
+        # Items of a batch are marked as done or rescheduled individually
+        await q.mark_done(batch[0])
+        await q.reschedule(batch[1])
+        assert q.num_in_progress() == 1
+
+        # Only the items available immediately are returned
+        batch_2 = await consumer_2.next_batch(5)
+        assert [handle.data for handle in batch_2] == [1, 3, 4]
+
+        for handle in [batch[2], *batch_2]:
+            await q.mark_done(handle)
+        with pytest.raises(StopAsyncIteration):
+            await consumer_1.next_batch(3)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_stragglers():
+    """Test that idle consumers get copies of stragglers and that the first completed copy wins."""
+
+    q = SmartQueue(async_iter([1, 2]), prefetch=2)
+    await asyncio.sleep(0.01)
+    cancelled = []
+    q.add_cancelled_copies_listener(cancelled.append)
+
+    with q.new_consumer() as consumer_1, q.new_consumer() as consumer_2:
+        handle_1 = await q.get(consumer_1)
+        handle_2 = await q.get(consumer_1)
+        get_task = asyncio.get_event_loop().create_task(q.get(consumer_2))
+        await asyncio.sleep(0.01)
+
+        assert await q.duplicate_stragglers(lambda item: item == 2) == 1
+        copy = await asyncio.wait_for(get_task, timeout=1)
+        assert copy.data == 2 and copy.speculative and copy.consumer is consumer_2
+        assert not handle_2.speculative
+
+        # The original is rescheduled but not made available again since its copy is running
+        await q.reschedule(handle_2)
+        assert not q.has_unassigned_items()
+
+        # Each item is copied at most once
+        assert await q.duplicate_stragglers(lambda item: True) == 0
+
+        await q.mark_done(handle_1)
+        await q.mark_done(copy)
+        assert cancelled == []
+        assert q.finished()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_stragglers_cancels_losers():
+    q = SmartQueue(async_iter([1]))
+    await asyncio.sleep(0.01)
+    cancelled = []
+    q.add_cancelled_copies_listener(cancelled.append)
+
+    with q.new_consumer() as consumer_1, q.new_consumer() as consumer_2:
+        handle = await q.get(consumer_1)
+        get_task = asyncio.get_event_loop().create_task(q.get(consumer_2))
+        await asyncio.sleep(0.01)
+        await q.duplicate_stragglers(lambda item: True)
+        copy = await asyncio.wait_for(get_task, timeout=1)
+
+        await q.mark_done(copy)
+        assert cancelled == [handle]
+        assert q.finished()
+
+
+@pytest.mark.asyncio
+async def test_sort_key():
+    """Test that available items are served in the order of their keys, new or rescheduled."""
+
+    q = SmartQueue(async_iter([5, 3, 4, 1, 2]), prefetch=4, key=lambda item: item)
+    await asyncio.sleep(0.01)
+
+    with q.new_consumer() as consumer_1, q.new_consumer() as consumer_2:
+        # Only the first 4 items are fetched, so 1 comes before 5
+        handle_1 = await q.get(consumer_1)
+        assert handle_1.data == 1
+        await asyncio.sleep(0.01)
+
+        await q.reschedule(handle_1)
+        served = []
+        for _ in range(5):
+            handle = await q.get(consumer_2)
+            served.append(handle.data)
+            await q.mark_done(handle)
+        assert served == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_reschedule_avoids_owner():
+    """Test that a rescheduled item isn't assigned to another consumer with the same owner."""
+
+    q = SmartQueue(async_iter([1]))
+    with q.new_consumer(owner="provider-1") as consumer_1:
+        handle = await q.get(consumer_1)
+    await asyncio.sleep(0.01)
+    assert q.has_unassigned_items()
+
+    with q.new_consumer(owner="provider-2") as consumer_3:
+        with q.new_consumer(owner="provider-1") as consumer_2:
+            assert q._take_item(consumer_2) is None
+        assert await q.get(consumer_3) is handle
+        await q.mark_done(handle)
+    await q.close()
+
+
+@pytest.mark.asyncio
+async def test_reschedule_falls_back_to_owner():
+    """Test that a rescheduled item is assigned to the same owner if no other one can take it."""
+
+    q = SmartQueue(async_iter([1]))
+    with q.new_consumer(owner="provider-1") as consumer_1:
+        handle = await q.get(consumer_1)
+    await asyncio.sleep(0.01)
+
+    with q.new_consumer(owner="provider-1") as consumer_2:
+        assert await asyncio.wait_for(q.get(consumer_2), timeout=1) is handle
+        await q.mark_done(handle)
+    assert q.finished()
+    await q.close()
+
+
+@pytest.mark.asyncio
+async def test_reschedule_falls_back_to_owner_when_others_leave():
+    """Test that a consumer waiting for an item avoided by its owner gets it once it's the last."""
+
+    q = SmartQueue(async_iter([1]))
+    with q.new_consumer(owner="provider-1") as consumer_1:
+        handle = await q.get(consumer_1)
+    await asyncio.sleep(0.01)
+
+    with q.new_consumer(owner="provider-1") as consumer_2:
+        with q.new_consumer(owner="provider-2"):
+            waiting = asyncio.get_event_loop().create_task(q.get(consumer_2))
+            await asyncio.sleep(0.01)
+            assert not waiting.done()
+        assert await asyncio.wait_for(waiting, timeout=1) is handle
+        await q.mark_done(handle)
+    await q.close()
+
+
+@pytest.mark.asyncio
+async def test_retry_budget_and_backoff():
+    """Test that retries are delayed exponentially and that items exceeding the budget fail."""
+
+    q = SmartQueue(async_iter([1]), max_retries=2, retry_backoff=0.05)
+    failed = []
+    q.add_failed_items_listener(failed.append)
+
+    for n in range(2):
+        with q.new_consumer() as consumer:
+            handle = await q.get(consumer)
+            await q.reschedule(handle)
+            assert handle.retries == n + 1
+            assert not q.has_unassigned_items() and not q.finished()
+        await asyncio.sleep(0.05 * 2**n + 0.02)
+        assert q.has_unassigned_items()
+
+    with q.new_consumer() as consumer:
+        handle = await q.get(consumer)
+        await q.reschedule(handle)
+    assert failed == [handle]
+    assert q.finished()
+    await q.close()
+
+
+@pytest.mark.asyncio
+async def test_reschedule_all_without_retry():
+    """Test that items given up through no fault of their consumer don't count as retried."""
+
+    q = SmartQueue(async_iter([1, 2]), prefetch=2, retry_backoff=10.0)
+    await asyncio.sleep(0.01)
+
+    with q.new_consumer(owner="provider-1") as consumer_1:
+        handles = await consumer_1.next_batch(2)
+        await q.reschedule_all(consumer_1, retry=False)
+    assert all(handle.retries == 0 for handle in handles)
+    assert q.has_unassigned_items()
+
+    # The items aren't held back by the backoff, nor avoided by their previous owner
+    with q.new_consumer(owner="provider-1") as consumer_2, q.new_consumer(owner="provider-2"):
+        assert await asyncio.wait_for(consumer_2.next_batch(2), timeout=1) == handles
+        for handle in handles:
+            await q.mark_done(handle)
+    assert q.finished()
+    await q.close()
@@ -0,0 +1,47 @@
+"""Micro-benchmark of `SmartQueue` throughput with many concurrent consumers.
+
+Run with `pytest -s tests/executor/test_smartq_benchmark.py` to see the results.
+"""
+import asyncio
+import time
+
+import pytest
+
+from yapapi.executor._smartq import SmartQueue
+
+NUM_ITEMS = 2000
+
+
+async def async_iter(iterable):
+    for item in iterable:
+        yield item
+
+
+async def consume(queue: SmartQueue, processed: list) -> None:
+    with queue.new_consumer() as consumer:
+        async for handle in consumer:
+            processed.append(handle.data)
+            await queue.mark_done(handle)
+            # Let other consumers run, as a real worker would while processing the item
+            await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("num_consumers", [10, 100, 1000])
+async def test_smart_queue_throughput(num_consumers):
+    """Measure how many items per second go through `get()` and `mark_done()`."""
+
+    queue = SmartQueue(async_iter(range(NUM_ITEMS)))
+    processed = []
+
+    start = time.perf_counter()
+    consumers = [consume(queue, processed) for _ in range(num_consumers)]
+    await asyncio.wait_for(asyncio.gather(*consumers), timeout=60)
+    elapsed = time.perf_counter() - start
+    await queue.close()
+
+    assert sorted(processed) == list(range(NUM_ITEMS))
+    print(
+        f"\n{num_consumers} consumers: {NUM_ITEMS} items in {elapsed:.3f}s, "
+        f"{NUM_ITEMS / elapsed:.0f} items/s"
+    )
@@ -1,7 +1,78 @@
+from datetime import datetime, timedelta, timezone
+import sys
+from unittest import mock
+from unittest.mock import Mock
+
+import pytest
+
+from yapapi import events
 from yapapi.executor import Task
+from yapapi.executor._smartq import Handle
+from yapapi.executor.task import TaskStatus
 
 
 def test_task():
     t: Task[int, None] = Task(data=1)
 
     assert t.data == 1
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_speculative_copy():
+    """Test that the first accepted copy of a task completes the original task."""
+
+    completed = []
+    emitter = Mock()
+    queue = Mock()
+    queue.mark_done = mock.AsyncMock()
+    queue.reschedule = mock.AsyncMock()
+
+    task: Task[int, str] = Task(data=1)
+    task._add_callback(lambda t, status: completed.append((t, status)))
+    task._start(emitter)
+
+    copy = Task.for_handle(Handle(task, speculative=True), queue, emitter)
+    assert copy is not task
+    assert copy.id == task.id and copy.data == task.data
+
+    copy.accept_result("copy result")
+    assert completed == [(task, TaskStatus.ACCEPTED)]
+    assert task.result == "copy result"
+
+    # The result of the original is dropped
+    task.accept_result("original result")
+    assert task.result == "copy result"
+    assert len(completed) == 1
+
+
+def test_task_priority_order():
+    now = datetime.now(timezone.utc)
+    tasks = [
+        Task(data="low"),
+        Task(data="late", priority=1, deadline=now + timedelta(minutes=10)),
+        Task(data="no deadline", priority=1),
+        Task(data="soon", priority=1, deadline=now + timedelta(minutes=1)),
+    ]
+    ordered = sorted(tasks, key=lambda task: task._queue_key())
+    assert [task.data for task in ordered] == ["soon", "late", "no deadline", "low"]
+
+    with pytest.raises(ValueError):
+        Task(data=None, deadline=datetime.now())
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_deadline_missed():
+    queue = Mock()
+    queue.mark_done = mock.AsyncMock()
+    emitter = Mock()
+
+    on_time = Task(data=1, deadline=datetime.now(timezone.utc) + timedelta(minutes=1))
+    late = Task(data=2, deadline=datetime.now(timezone.utc) - timedelta(minutes=1))
+    for task in (on_time, late):
+        Task.for_handle(Handle(task), queue, emitter).accept_result()
+
+    emitted = [(call.args[0], call.kwargs["task"]) for call in emitter.call_args_list]
+    assert (events.TaskDeadlineMissed, late) in emitted
+    assert (events.TaskDeadlineMissed, on_time) not in emitted
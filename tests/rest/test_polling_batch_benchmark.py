@@ -0,0 +1,90 @@
+"""Benchmark of the latency with which `PollingBatch` notices finished commands.
+
+The activity endpoint is replaced with a local stand-in, finishing the commands of a batch
+at random intervals. Run with `pytest -s tests/rest/test_polling_batch_benchmark.py`
+to see the latency distribution.
+"""
+import asyncio
+import random
+import statistics
+from typing import List, Optional
+from unittest.mock import Mock
+
+import pytest
+
+from yapapi.rest.activity import PollingBatch
+
+NUM_COMMANDS = 20
+
+
+class StandInActivityApi:
+    """Serves GetExecBatchResults for a batch whose commands finish at given times."""
+
+    def __init__(self, durations: List[float], long_polling: bool):
+        """
+        :param durations: running times in seconds of the subsequent commands
+        :param long_polling: whether the `command_index` parameter is supported
+        """
+        loop = asyncio.get_event_loop()
+        self.finish_times = []
+        finish_time = loop.time()
+        for duration in durations:
+            finish_time += duration
+            self.finish_times.append(finish_time)
+        self.long_polling = long_polling
+        self.calls = 0
+
+    def _finished(self) -> List[Mock]:
+        now = asyncio.get_event_loop().time()
+        return [
+            Mock(index=i, result="Ok", is_batch_finished=(i == len(self.finish_times) - 1))
+            for i, t in enumerate(self.finish_times)
+            if t <= now
+        ]
+
+    async def get_exec_batch_results(
+        self,
+        _activity_id,
+        _batch_id,
+        timeout: float,
+        command_index: Optional[int] = None,
+        **_kwargs,
+    ):
+        self.calls += 1
+        loop = asyncio.get_event_loop()
+        if not self.long_polling:
+            command_index = None
+        # Like the server, wait for the given command or, without it, for any result
+        wait_for = command_index if command_index is not None else 0
+        deadline = loop.time() + timeout
+        while len(self._finished()) <= wait_for and loop.time() < deadline:
+            await asyncio.sleep(0.001)
+        return self._finished()
+
+
+async def measure_latencies(long_polling: bool) -> List[float]:
+    durations = [random.uniform(0.01, 0.3) for _ in range(NUM_COMMANDS)]
+    api = StandInActivityApi(durations, long_polling)
+    batch = PollingBatch(Mock(_api=api, _id="activity"), "batch", NUM_COMMANDS)
+
+    loop = asyncio.get_event_loop()
+    latencies = []
+    async for _event_class, kwargs in batch:
+        latencies.append(loop.time() - api.finish_times[kwargs["cmd_idx"]])
+    print(
+        f"\nlong_polling={long_polling}: {api.calls} calls for {NUM_COMMANDS} commands, "
+        f"latency p50 {statistics.median(latencies) * 1000:.0f}ms, "
+        f"p90 {sorted(latencies)[int(0.9 * len(latencies))] * 1000:.0f}ms, "
+        f"max {max(latencies) * 1000:.0f}ms"
+    )
+    return latencies
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("long_polling", [True, False])
+async def test_polling_batch_latency(long_polling):
+    """Measure the time between a command finishing and its result being yielded."""
+
+    latencies = await asyncio.wait_for(measure_latencies(long_polling), timeout=60)
+    assert len(latencies) == NUM_COMMANDS
+    assert max(latencies) < PollingBatch.MAX_POLL_INTERVAL + 0.1
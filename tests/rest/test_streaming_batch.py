@@ -0,0 +1,188 @@
+"""Tests of `StreamingBatch` receiving events from a local stand-in of the activity API."""
+import asyncio
+import json
+import sys
+from typing import Dict, List
+from unittest import mock
+from unittest.mock import Mock
+
+from aiohttp import web
+import pytest
+
+from yapapi import events
+from yapapi.rest.activity import Activity, BatchError, StreamingBatch, _ActivityEventStream
+
+
+def runtime_event(batch_id: str, index: int, kind: Dict) -> bytes:
+    data = json.dumps({"batchId": batch_id, "index": index, "kind": kind})
+    return f"event: runtime\ndata: {data}\n\n".encode()
+
+
+def batch_events(batch_id: str, size: int) -> List[bytes]:
+    evts = []
+    for idx in range(size):
+        evts.append(runtime_event(batch_id, idx, {"started": {"command": {"run": {}}}}))
+        evts.append(runtime_event(batch_id, idx, {"stdout": f"{batch_id}-{idx}"}))
+        evts.append(runtime_event(batch_id, idx, {"finished": {"return_code": 0}}))
+    return evts
+
+
+class StandInActivityApi:
+    """Streams the events of batches, dropping the first connection after `drop_after` events.
+
+    After a dropped connection the events of a batch are streamed again from the beginning.
+    """
+
+    def __init__(self, batch_size: int, drop_after: int = 0):
+        self.batch_size = batch_size
+        self.drop_after = drop_after
+        self.requests: List[str] = []
+        self.peers = set()
+        self.runner = None
+        self.host = None
+
+    async def stream(self, request: web.Request) -> web.StreamResponse:
+        batch_id = request.match_info["batch_id"]
+        self.requests.append(batch_id)
+        self.peers.add(request.transport.get_extra_info("peername"))
+        drop = self.drop_after and len(self.requests) == 1
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            for n, evt in enumerate(batch_events(batch_id, self.batch_size)):
+                if drop and n == self.drop_after:
+                    request.transport.close()
+                    return response
+                await response.write(evt)
+                await asyncio.sleep(0.001)
+            await response.write_eof()
+        except ConnectionResetError:
+            # The client stopped reading, e.g. because the activity was closed
+            pass
+        return response
+
+    async def __aenter__(self) -> "StandInActivityApi":
+        app = web.Application()
+        app.router.add_get("/activity/{activity_id}/exec/{batch_id}", self.stream)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.host = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.runner.cleanup()
+
+
+def mock_activity(host: str, batch_ids: List[str]) -> Activity:
+    api_client = Mock(configuration=Mock(host=host), default_headers={})
+    api = Mock(
+        api_client=api_client,
+        call_exec=mock.AsyncMock(side_effect=batch_ids),
+        destroy_activity=mock.AsyncMock(),
+    )
+    return Activity(api, Mock(), "activity_id", stream_events=True)
+
+
+async def collect(batch: StreamingBatch) -> List[tuple]:
+    return [(event_class, kwargs) async for event_class, kwargs in batch]
+
+
+def expected_events(batch_id: str, size: int) -> List[tuple]:
+    return [
+        evt
+        for idx in range(size)
+        for evt in (
+            (events.CommandStarted, {"cmd_idx": idx}),
+            (events.CommandStdOut, {"cmd_idx": idx, "output": f"{batch_id}-{idx}"}),
+            (events.CommandExecuted, {"cmd_idx": idx, "success": True, "message": None}),
+        )
+    ]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_streaming_batches_share_event_stream():
+    """Test that the events of concurrent batches are routed to them through one session."""
+
+    async with StandInActivityApi(batch_size=3) as api:
+        async with mock_activity(api.host, ["b1", "b2"]) as activity:
+            batch_1 = await activity.send([{}] * 3)
+            batch_2 = await activity.send([{}] * 3)
+            assert isinstance(batch_1, StreamingBatch)
+            session = activity._event_stream._session
+
+            results_1, results_2 = await asyncio.gather(collect(batch_1), collect(batch_2))
+            assert results_1 == expected_events("b1", 3)
+            assert results_2 == expected_events("b2", 3)
+
+            assert activity._event_stream._session is session
+        assert activity._event_stream._session is None
+        assert sorted(api.requests) == ["b1", "b2"]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_streaming_batch_reuses_connection():
+    """Test that subsequent batches of an activity are streamed over a kept-alive connection."""
+
+    async with StandInActivityApi(batch_size=1) as api:
+        async with mock_activity(api.host, [f"b{n}" for n in range(5)]) as activity:
+            for n in range(5):
+                batch = await activity.send([{}])
+                assert await collect(batch) == expected_events(f"b{n}", 1)
+        assert len(api.requests) == 5
+        # The next batch may be sent before the previous one's connection is returned to the pool
+        assert len(api.peers) <= 2
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+@pytest.mark.parametrize("drop_after", [1, 3, 4])
+async def test_streaming_batch_resumes_after_dropped_connection(drop_after, monkeypatch):
+    """Test that the starts and results of commands are not delivered again after reconnecting."""
+
+    monkeypatch.setattr(_ActivityEventStream, "RECONNECT_DELAY", 0.01)
+
+    async with StandInActivityApi(batch_size=3, drop_after=drop_after) as api:
+        async with mock_activity(api.host, ["b1"]) as activity:
+            batch = await activity.send([{}] * 3)
+            assert await collect(batch) == expected_events("b1", 3)
+        assert api.requests == ["b1", "b1"]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_streaming_batch_repeats_output_after_dropped_connection(monkeypatch):
+    """Test that output of the command in progress may be delivered again after reconnecting.
+
+    Output events carry no position within the command's output, so they're not skipped.
+    """
+
+    monkeypatch.setattr(_ActivityEventStream, "RECONNECT_DELAY", 0.01)
+
+    async with StandInActivityApi(batch_size=3, drop_after=5) as api:
+        async with mock_activity(api.host, ["b1"]) as activity:
+            batch = await activity.send([{}] * 3)
+            expected = expected_events("b1", 3)
+            assert await collect(batch) == expected[:5] + expected[4:]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_streaming_batch_gives_up_reconnecting(monkeypatch):
+    """Test that a batch fails when the stream can't be resumed."""
+
+    monkeypatch.setattr(_ActivityEventStream, "RECONNECT_DELAY", 0.01)
+    monkeypatch.setattr(_ActivityEventStream, "MAX_RECONNECTS", 2)
+
+    async with StandInActivityApi(batch_size=3) as api:
+        host = api.host
+    activity = mock_activity(host, ["b1"])
+    batch = await activity.send([{}] * 3)
+    with pytest.raises(BatchError):
+        await collect(batch)
+    await activity.__aexit__(None, None, None)
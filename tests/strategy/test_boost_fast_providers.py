@@ -0,0 +1,42 @@
+import pytest
+import sys
+from unittest import mock
+
+from yapapi.strategy import BoostFastProviders
+
+from tests.factories.rest.market import OfferProposalFactory
+
+from .helpers import Always6
+
+
+@pytest.mark.asyncio
+async def test_boost_fast_providers():
+    stats = mock.Mock()
+    stats.score.side_effect = {"fast": 2.0, "slow": 0.5, "unknown": 1.0}.__getitem__
+    strategy = BoostFastProviders(Always6(), stats)
+
+    offers = [OfferProposalFactory(provider_id=p) for p in ("fast", "slow", "unknown")]
+    assert [await strategy.score_offer(offer) for offer in offers] == [12, 3, 6]
+    assert await strategy.score_offers(offers) == [12, 3, 6]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_boost_fast_providers_keeps_rejections():
+    stats = mock.Mock()
+    stats.score.return_value = 2.0
+    base_strategy = mock.Mock(spec=Always6)
+    base_strategy.score_offer = mock.AsyncMock(return_value=-1.0)
+    strategy = BoostFastProviders(base_strategy, stats)
+
+    assert await strategy.score_offer(OfferProposalFactory()) == -1.0
+
+
+@pytest.mark.asyncio
+async def test_boost_fast_providers_overridden_score_offer():
+    class Always1(BoostFastProviders):
+        async def score_offer(self, offer):
+            return 1
+
+    strategy = Always1(Always6(), mock.Mock())
+    assert await strategy.score_offers([OfferProposalFactory()]) == [1]
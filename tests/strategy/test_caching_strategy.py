@@ -0,0 +1,101 @@
+from unittest import mock
+
+import pytest
+
+from yapapi.strategy import (
+    CachingMarketStrategy,
+    DecreaseScoreForUnconfirmedAgreement,
+    DummyMS,
+    LeastExpensiveLinearPayuMS,
+)
+from yapapi.strategy.caching_strategy import props_digest
+
+from tests.factories.events import AgreementRejectedFactory as AgreementRejected
+from tests.factories.rest.market import OfferProposalFactory
+
+from .helpers import Always6
+
+
+def test_props_digest():
+    assert props_digest({"a": 1, "b": [1, 2]}) == props_digest({"b": [1, 2], "a": 1})
+    assert props_digest({"a": 1}) != props_digest({"a": 2})
+
+
+@pytest.mark.asyncio
+async def test_caching_strategy():
+    base_strategy = LeastExpensiveLinearPayuMS()
+    strategy = CachingMarketStrategy(base_strategy, maxsize=2)
+    offers = [OfferProposalFactory(coeffs=[0.001 * n, 0.002, 0.1]) for n in (1, 2, 3)]
+    expected = [await base_strategy.score_offer(offer) for offer in offers]
+
+    with mock.patch.object(
+        base_strategy, "score_offers", wraps=base_strategy.score_offers
+    ) as score_offers:
+        assert await strategy.score_offers(offers[:2]) == expected[:2]
+        assert await strategy.score_offers(offers[:2]) == expected[:2]
+        score_offers.assert_called_once_with(offers[:2])
+
+        # Scoring the third offer evicts the least recently used one
+        assert await strategy.score_offer(offers[1]) == expected[1]
+        assert await strategy.score_offers(offers[2:]) == expected[2:]
+        assert await strategy.score_offers(offers) == expected
+        assert score_offers.call_args_list[-1] == mock.call([offers[0]])
+
+    assert strategy.hits == 5
+    assert strategy.misses == 4
+
+
+@pytest.mark.asyncio
+async def test_caching_strategy_no_token():
+    """Test that scores of strategies that don't provide cache tokens are not cached."""
+    base_strategy = Always6()
+    strategy = CachingMarketStrategy(base_strategy)
+    offer = OfferProposalFactory()
+
+    with mock.patch.object(base_strategy, "score_offer", wraps=base_strategy.score_offer):
+        assert await strategy.score_offer(offer) == 6
+        assert await strategy.score_offer(offer) == 6
+        assert base_strategy.score_offer.call_count == 2
+    assert strategy.hits == strategy.misses == 0
+
+
+@pytest.mark.asyncio
+async def test_caching_strategy_invalidated_by_wrapper():
+    """Test that `DecreaseScoreForUnconfirmedAgreement` invalidates cached scores of an issuer."""
+    base_strategy = LeastExpensiveLinearPayuMS()
+    wrapper = DecreaseScoreForUnconfirmedAgreement(base_strategy, 0.5)
+    strategy = CachingMarketStrategy(wrapper)
+    offer = OfferProposalFactory(provider_id=1)
+    score = await base_strategy.score_offer(offer)
+
+    assert await strategy.score_offer(offer) == score
+    assert await strategy.score_offer(offer) == score
+    wrapper.on_event(AgreementRejected(agreement__provider_id=1))
+    assert await strategy.score_offer(offer) == score * 0.5
+    assert strategy.hits == 1
+    assert strategy.misses == 2
+
+
+@pytest.mark.parametrize("base_class", [LeastExpensiveLinearPayuMS, DummyMS])
+def test_score_cache_token_overridden_score_offer(base_class):
+    """Test that scores of subclasses overriding `score_offer` are not declared cacheable."""
+
+    class Subclass(base_class):
+        async def score_offer(self, offer):
+            return 6
+
+    offer = OfferProposalFactory()
+    assert base_class().score_cache_token(offer) is not None
+    assert Subclass().score_cache_token(offer) is None
+
+
+@pytest.mark.asyncio
+async def test_caching_strategy_overridden_score_offer():
+    """Test that batch scoring uses `score_offer` overridden in a subclass."""
+
+    class Always1(CachingMarketStrategy):
+        async def score_offer(self, offer):
+            return 1
+
+    strategy = Always1(LeastExpensiveLinearPayuMS())
+    assert await strategy.score_offers([OfferProposalFactory()]) == [1]
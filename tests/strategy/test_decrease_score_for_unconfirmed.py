@@ -77,3 +77,30 @@ async def test_full_DSFUA_workflow(dummy_yagna_engine, events_def, decreased_pro
                 else DEFAULT_OFFER_SCORE
             )
             assert expected_score == await golem._engine._strategy.score_offer(offer)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("events_def, decreased_providers", sample_data)
+async def test_decrease_score_for_batch(events_def, decreased_providers):
+    """Test if DecreaseScoreForUnconfirmedAgreement applies the penalty when scoring in batches"""
+    strategy = DecreaseScoreForUnconfirmedAgreement(Always6(), 0.5)
+
+    for event_cls, event_provider_id in events_def:
+        event = event_cls(agreement__provider_id=event_provider_id)
+        strategy.on_event(event)
+
+    offers = [OfferProposalFactory(provider_id=provider_id) for provider_id in (1, 2)]
+    expected_scores = [3 if provider_id in decreased_providers else 6 for provider_id in (1, 2)]
+    assert expected_scores == await strategy.score_offers(offers)
+
+
+@pytest.mark.asyncio
+async def test_decrease_score_for_batch_overridden_score_offer():
+    """Test if batch scoring uses `score_offer()` overridden in a subclass"""
+
+    class Always1(DecreaseScoreForUnconfirmedAgreement):
+        async def score_offer(self, offer):
+            return 1
+
+    strategy = Always1(Always6(), 0.5)
+    assert [1, 1] == await strategy.score_offers([OfferProposalFactory(), OfferProposalFactory()])
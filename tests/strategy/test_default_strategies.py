@@ -4,6 +4,7 @@ import pytest
 from unittest.mock import Mock
 
 from yapapi import Golem
+from yapapi.props.base import InvalidPropertiesError
 from yapapi.props.com import Counter
 import yapapi.rest.configuration
 from yapapi.strategy import (
@@ -157,3 +158,51 @@ class TestLeastExpensiveLinearPayuMS:
     async def test_score_negative_coeff(self, coeffs):
         offer = OfferProposalFactory(coeffs=coeffs)
         assert await self.strategy.score_offer(offer) == SCORE_REJECTED
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("expected_time", [0.1, 1, 60])
+async def test_LeastExpensiveLinearPayuMS_score_offers(expected_time):
+    """Test that batch scoring gives exactly the same scores as scoring offers one by one."""
+
+    prices = [-0.01, 0.0, 0.01, 0.3, 3.0]
+    offers = [OfferProposalFactory(coeffs=coeffs) for coeffs in product(prices, repeat=3)]
+
+    strategies = (
+        LeastExpensiveLinearPayuMS(expected_time_secs=expected_time),
+        LeastExpensiveLinearPayuMS(
+            expected_time_secs=expected_time,
+            max_fixed_price=Decimal("1.0"),
+            max_price_for={Counter.CPU: Decimal("0.2"), Counter.TIME: Decimal("0.01")},
+        ),
+    )
+
+    for strategy in strategies:
+        expected_scores = [await strategy.score_offer(offer) for offer in offers]
+        assert await strategy.score_offers(offers) == expected_scores
+
+
+@pytest.mark.asyncio
+async def test_LeastExpensiveLinearPayuMS_score_offers_invalid_props():
+    """Test that offers that can't be scored in a batch are scored using `score_offer()`."""
+
+    strategy = LeastExpensiveLinearPayuMS()
+    valid_offer = OfferProposalFactory()
+    int_coeffs_offer = OfferProposalFactory(coeffs=(1, 2, 3))
+
+    with pytest.raises(InvalidPropertiesError):
+        await strategy.score_offers([valid_offer, int_coeffs_offer])
+
+    assert await strategy.score_offers([valid_offer]) == [await strategy.score_offer(valid_offer)]
+    assert await strategy.score_offers([]) == []
+
+
+@pytest.mark.asyncio
+async def test_LeastExpensiveLinearPayuMS_score_offers_overridden_score_offer():
+    """Test that batch scoring uses `score_offer()` overridden in a subclass."""
+
+    class RejectAll(LeastExpensiveLinearPayuMS):
+        async def score_offer(self, offer):
+            return SCORE_REJECTED
+
+    assert await RejectAll().score_offers([OfferProposalFactory()]) == [SCORE_REJECTED]
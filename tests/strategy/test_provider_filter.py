@@ -55,3 +55,33 @@ async def test_default_strategy_update(dummy_yagna_engine):
             offer = OfferProposalFactory(provider_id=provider_id)
             expected_score = DEFAULT_OFFER_SCORE if provider_id == 2 else SCORE_REJECTED
             assert expected_score == await golem._engine._strategy.score_offer(offer)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "bad_providers",
+    ((), (1,), (2,), (1, 2)),
+)
+async def test_restricted_providers_batch(bad_providers):
+    """Test if the strategy restricts correct providers when scoring in batches"""
+
+    async def is_allowed(provider_id):
+        return provider_id not in bad_providers
+
+    strategy = ProviderFilter(Always6(), is_allowed)
+
+    offers = [OfferProposalFactory(provider_id=provider_id) for provider_id in (1, 2, 3)]
+    expected_scores = [
+        SCORE_REJECTED if provider_id in bad_providers else 6 for provider_id in (1, 2, 3)
+    ]
+    assert expected_scores == await strategy.score_offers(offers)
+
+
+@pytest.mark.asyncio
+async def test_restricted_providers_batch_overridden_score_offer():
+    class RejectAll(ProviderFilter):
+        async def score_offer(self, offer):
+            return SCORE_REJECTED
+
+    strategy = RejectAll(Always6(), lambda provider_id: True)
+    assert await strategy.score_offers([OfferProposalFactory()]) == [SCORE_REJECTED]
@@ -1,4 +1,7 @@
+import asyncio
+import datetime
 import random
+import sys
 from unittest import mock
 
 import pytest
@@ -99,3 +102,286 @@ async def test_use_agreement_no_proposals():
 
     result = await pool.use_agreement(use_agreement_cb)
     assert result is None
+
+
+@pytest.mark.asyncio
+async def test_use_agreement_negotiates_concurrently():
+    """Test that a provider slow to confirm an agreement doesn't block other negotiations."""
+
+    slow_provider_confirmed = asyncio.Event()
+    in_flight = 0
+    max_in_flight = 0
+
+    def mock_negotiation(proposal_id, slow=False):
+        async def get_details():
+            return mock.MagicMock()
+
+        async def confirm():
+            nonlocal in_flight
+            if slow:
+                await slow_provider_confirmed.wait()
+            in_flight -= 1
+            return True
+
+        async def create_agreement():
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            agreement = mock.MagicMock(proposal_id=proposal_id, id=f"agreement-{proposal_id}")
+            agreement.get_details = get_details
+            agreement.confirm = confirm
+            return agreement
+
+        return create_agreement
+
+    pool = agreements_pool.AgreementsPool(
+        lambda _event, **kwargs: None, lambda _offer: None, max_negotiations=2
+    )
+    for n in range(4):
+        proposal = mock.MagicMock(issuer=f"provider-{n}")
+        # The proposal with the highest score belongs to the slow provider
+        proposal.create_agreement = mock_negotiation(n, slow=(n == 0))
+        await pool.add_proposal(10.0 - n, proposal)
+
+    chosen_proposal_ids = []
+
+    def use_agreement_cb(agreement):
+        chosen_proposal_ids.append(agreement.proposal_id)
+        return True
+
+    loop = asyncio.get_event_loop()
+    waiters = [loop.create_task(pool.use_agreement(use_agreement_cb)) for _ in range(3)]
+    await asyncio.sleep(0.1)
+
+    # Two waiters got agreements with the fast providers, the third one waits for the slow one
+    assert sorted(chosen_proposal_ids) == [1, 2]
+    assert max_in_flight == 2
+
+    slow_provider_confirmed.set()
+    await asyncio.wait_for(asyncio.gather(*waiters), timeout=1)
+    assert sorted(chosen_proposal_ids) == [0, 1, 2]
+    assert pool.confirmed == 3
+
+
+@pytest.mark.asyncio
+async def test_add_proposal_supersedes_previous_offer():
+    """Test that only the latest offer from a provider is used, with its latest score."""
+
+    pool = agreements_pool.AgreementsPool(lambda _event, **kwargs: None, lambda _offer: None)
+
+    for n, (issuer, score) in enumerate([("a", 1.0), ("b", 2.0), ("a", 3.0), ("b", 0.5)]):
+        proposal = mock.MagicMock(issuer=issuer)
+        proposal.create_agreement = mock_agreement(proposal_id=n)
+        await pool.add_proposal(score, proposal)
+
+    chosen_proposal_ids = []
+
+    def use_agreement_cb(agreement):
+        chosen_proposal_ids.append(agreement.proposal_id)
+        return True
+
+    for _ in range(3):
+        await pool.use_agreement(use_agreement_cb)
+
+    assert chosen_proposal_ids == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_use_agreement_reuses_released_agreement():
+    """Test that an agreement released with `allow_reuse` is used again instead of a new one."""
+
+    pool = agreements_pool.AgreementsPool(lambda _event, **kwargs: None, lambda _offer: None)
+    for n in range(2):
+        proposal = mock.MagicMock(issuer=f"provider-{n}")
+        proposal.create_agreement = mock_agreement(proposal_id=n, id=f"agreement-{n}")
+        await pool.add_proposal(1.0, proposal)
+
+    first = await pool.use_agreement(lambda agreement: agreement.id)
+    await pool.release_agreement(first, allow_reuse=True)
+    assert await pool.use_agreement(lambda agreement: agreement.id) == first
+    assert pool.confirmed == 1
+
+
+class FakeDatetime(datetime.datetime):
+    """`datetime.datetime` with a settable `now()`."""
+
+    current = datetime.datetime(2021, 1, 1)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+@pytest.mark.asyncio
+async def test_cycle_evicts_expired_offers(monkeypatch):
+    """Test that offers older than `offer_ttl` are evicted and recycled in a single batch."""
+
+    monkeypatch.setattr(datetime, "datetime", FakeDatetime)
+    recycled = []
+    pool = agreements_pool.AgreementsPool(
+        lambda _event, **kwargs: None,
+        lambda _offer: None,
+        offer_ttl=datetime.timedelta(seconds=60),
+        offers_recycler=recycled.append,
+    )
+
+    proposals = [mock.MagicMock(issuer=f"provider-{n}") for n in range(3)]
+    for n, proposal in enumerate(proposals):
+        FakeDatetime.current = datetime.datetime(2021, 1, 1, 0, n)
+        await pool.add_proposal(1.0, proposal)
+    # An offer from the first provider supersedes its expired one
+    await pool.add_proposal(1.0, mock.MagicMock(issuer="provider-0"))
+
+    FakeDatetime.current = datetime.datetime(2021, 1, 1, 0, 2, 30)
+    await pool.cycle()
+    assert recycled == [[proposals[1]]]
+
+    FakeDatetime.current = datetime.datetime(2021, 1, 1, 0, 3, 30)
+    await pool.cycle()
+    assert recycled == [[proposals[1]], [proposals[2], mock.ANY]]
+    assert not pool._offer_buffer
+
+
+@pytest.mark.asyncio
+async def test_score_half_life(monkeypatch):
+    """Test that a newer offer is preferred to an older one with a slightly higher score."""
+
+    monkeypatch.setattr(datetime, "datetime", FakeDatetime)
+    pool = agreements_pool.AgreementsPool(
+        lambda _event, **kwargs: None,
+        lambda _offer: None,
+        score_half_life=datetime.timedelta(minutes=1),
+    )
+
+    # Scores after 3 minutes: 1.5 / 8, 1.0 / 4, 0.4 / 2 and 0.6 / 1
+    for n, score in enumerate([1.5, 1.0, 0.4, 0.6]):
+        FakeDatetime.current = datetime.datetime(2021, 1, 1, 0, n)
+        proposal = mock.MagicMock(issuer=f"provider-{n}")
+        proposal.create_agreement = mock_agreement(proposal_id=n)
+        await pool.add_proposal(score, proposal)
+
+    chosen_proposal_ids = []
+
+    def use_agreement_cb(agreement):
+        chosen_proposal_ids.append(agreement.proposal_id)
+        return True
+
+    for _ in range(4):
+        await pool.use_agreement(use_agreement_cb)
+    assert chosen_proposal_ids == [3, 1, 2, 0]
+
+
+@pytest.mark.asyncio
+async def test_add_proposal_calls_listeners():
+    pool = agreements_pool.AgreementsPool(lambda _event, **kwargs: None, lambda _offer: None)
+    listener = mock.Mock()
+    pool.add_proposal_listener(listener)
+
+    await pool.add_proposal(1.0, mock.MagicMock(issuer="provider-1"))
+    listener.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+async def test_use_agreement_reuses_best_provider():
+    """Test that the free agreement with the best-scored provider is reused."""
+
+    stats = mock.Mock()
+    stats.score.side_effect = {"slow": 0.5, "fast": 2.0, "unknown": 1.0}.__getitem__
+    pool = agreements_pool.AgreementsPool(
+        lambda _event, **kwargs: None, lambda _offer: None, provider_stats=stats
+    )
+    for agreement_id, provider_id in (
+        ("slow", "slow"),
+        ("fast", "fast"),
+        ("unknown", "unknown"),
+        ("no-id", None),
+    ):
+        details = mock.Mock()
+        details.raw_details.offer.provider_id = provider_id
+        pool._agreements[agreement_id] = agreements_pool.BufferedAgreement(
+            agreement=mock.Mock(id=agreement_id),
+            agreement_details=details,
+            worker_task=None,
+            has_multi_activity=True,
+        )
+        pool._free_agreements[agreement_id] = None
+
+    chosen = [await pool.use_agreement(lambda agreement: agreement.id) for _ in range(4)]
+    assert chosen == ["fast", "unknown", "no-id", "slow"]
+
+
+def mock_racing_agreement(proposal_id, confirmed: asyncio.Event):
+    """Return a coroutine that creates a mock agreement confirmed once `confirmed` is set."""
+
+    async def confirm():
+        await confirmed.wait()
+        return True
+
+    agreement = mock.MagicMock(proposal_id=proposal_id, id=f"agreement-{proposal_id}")
+    agreement.get_details = mock.AsyncMock(return_value=mock.MagicMock())
+    agreement.confirm = confirm
+    agreement.cancel = mock.AsyncMock(return_value=True)
+    agreement.terminate = mock.AsyncMock(return_value=True)
+
+    async def create_agreement():
+        return agreement
+
+    return agreement, create_agreement
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_use_agreement_races_providers():
+    """Test that extra negotiations are cancelled once enough agreements are confirmed."""
+
+    fast, slow = asyncio.Event(), asyncio.Event()
+    pool = agreements_pool.AgreementsPool(
+        lambda _event, **kwargs: None, lambda _offer: None, race_extra=2
+    )
+    agreements = []
+    for n in range(4):
+        proposal = mock.MagicMock(issuer=f"provider-{n}")
+        agreement, proposal.create_agreement = mock_racing_agreement(n, fast if n == 2 else slow)
+        agreements.append(agreement)
+        await pool.add_proposal(10.0 - n, proposal)
+
+    use_agreement = asyncio.ensure_future(pool.use_agreement(lambda agreement: agreement.id))
+    await asyncio.sleep(0.01)
+    # One negotiation is needed, two more race it
+    assert len(pool._negotiations) == 3
+
+    fast.set()
+    assert await asyncio.wait_for(use_agreement, timeout=1) == "agreement-2"
+    await asyncio.sleep(0.01)
+    assert not pool._negotiations
+    for n in (0, 1):
+        agreements[n].cancel.assert_awaited_once()
+    assert not agreements[2].cancel.called
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_use_agreement_terminates_excess_agreements():
+    """Test that agreements confirmed when no caller needs them are terminated."""
+
+    confirmed = asyncio.Event()
+    pool = agreements_pool.AgreementsPool(
+        lambda _event, **kwargs: None, lambda _offer: None, race_extra=1
+    )
+    agreements = []
+    for n in range(2):
+        proposal = mock.MagicMock(issuer=f"provider-{n}")
+        agreement, proposal.create_agreement = mock_racing_agreement(n, confirmed)
+        agreements.append(agreement)
+        await pool.add_proposal(1.0, proposal)
+
+    use_agreement = asyncio.ensure_future(pool.use_agreement(lambda agreement: agreement.id))
+    await asyncio.sleep(0.01)
+    confirmed.set()
+    used = await asyncio.wait_for(use_agreement, timeout=1)
+    await asyncio.sleep(0.01)
+
+    unused = [a for a in agreements if a.id != used]
+    assert len(unused) == 1
+    unused[0].terminate.assert_awaited_once()
+    assert list(pool._agreements) == [used]
@@ -0,0 +1,198 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from yapapi.proposal_handling import (
+    INITIAL_PROPOSAL_HANDLERS,
+    ProposalHandlerPool,
+    ProposalIntake,
+)
+
+
+def mock_proposal(issuer, id):
+    return mock.Mock(issuer=issuer, id=id)
+
+
+async def score_proposals(proposals):
+    return [1.0] * len(proposals)
+
+
+async def handle_proposal(_proposal, _score):
+    pass
+
+
+def test_invalid_limits():
+    with pytest.raises(ValueError):
+        ProposalHandlerPool(ProposalIntake(), score_proposals, handle_proposal, max_handlers=0)
+    with pytest.raises(ValueError):
+        ProposalHandlerPool(
+            ProposalIntake(), score_proposals, handle_proposal, min_handlers=5, max_handlers=4
+        )
+
+
+def test_limit_additive_increase():
+    """Test that the limit grows by about one handler per `limit` fast market API calls."""
+    pool = ProposalHandlerPool(ProposalIntake(), score_proposals, handle_proposal, max_handlers=10)
+    assert pool.limit == INITIAL_PROPOSAL_HANDLERS
+
+    for _ in range(INITIAL_PROPOSAL_HANDLERS - 1):
+        pool.record_latency(0.1)
+    assert pool.limit == INITIAL_PROPOSAL_HANDLERS
+    for _ in range(2):
+        pool.record_latency(0.1)
+    assert pool.limit == INITIAL_PROPOSAL_HANDLERS + 1
+
+    for _ in range(1000):
+        pool.record_latency(0.1)
+    assert pool.limit == 10
+
+
+def test_limit_multiplicative_decrease():
+    """Test that the limit is halved on slow or failed calls, but not more than once per burst."""
+    pool = ProposalHandlerPool(
+        ProposalIntake(), score_proposals, handle_proposal, max_handlers=64, latency_threshold=1.0
+    )
+    for _ in range(5000):
+        pool.record_latency(0.1)
+    assert pool.limit == 64
+
+    with mock.patch("time.monotonic", return_value=1000.0):
+        pool.record_latency(5.0)
+        assert pool.limit == 32
+        pool.record_latency(0.1, success=False)
+        assert pool.limit == 32
+
+    with mock.patch("time.monotonic", return_value=1001.5):
+        pool.record_latency(0.1, success=False)
+        assert pool.limit == 16
+
+    for n in range(10):
+        with mock.patch("time.monotonic", return_value=1010.0 + 10 * n):
+            pool.record_latency(5.0)
+    assert pool.limit == 1
+
+
+def test_limit_changes_reported():
+    """Test that `on_limit_changed` is called after each change of the limit, and only then."""
+    on_limit_changed = mock.Mock()
+    pool = ProposalHandlerPool(
+        ProposalIntake(),
+        score_proposals,
+        handle_proposal,
+        latency_threshold=1.0,
+        on_limit_changed=on_limit_changed,
+    )
+
+    for _ in range(INITIAL_PROPOSAL_HANDLERS - 1):
+        pool.record_latency(0.1)
+    on_limit_changed.assert_not_called()
+    pool.record_latency(5.0)
+    on_limit_changed.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+async def test_run_handles_all_proposals():
+    """Test that all proposals are handled, with no more concurrent handlers than the limit."""
+
+    proposals = ProposalIntake()
+    handled = []
+    running = 0
+    max_running = 0
+
+    async def handle(proposal, score):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        handled.append((proposal.id, score))
+        running -= 1
+
+    pool = ProposalHandlerPool(proposals, score_proposals, handle, max_handlers=3)
+    for n in range(20):
+        proposals.put_nowait(mock_proposal(issuer=f"provider-{n}", id=n))
+
+    run_task = asyncio.get_event_loop().create_task(pool.run())
+    await asyncio.sleep(0.5)
+
+    assert sorted(handled) == [(n, 1.0) for n in range(20)]
+    assert max_running == 3
+    assert pool.queue_depth == 0
+    assert pool.stats()["handled"] == 20
+    assert pool.throughput > 0
+
+    run_task.cancel()
+    await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_timed_adjusts_limit():
+    pool = ProposalHandlerPool(
+        ProposalIntake(), score_proposals, handle_proposal, latency_threshold=1.0
+    )
+
+    async def failing_call():
+        raise RuntimeError("Market API error")
+
+    with pytest.raises(RuntimeError):
+        await pool.timed(failing_call())
+    assert pool.limit == INITIAL_PROPOSAL_HANDLERS // 2
+
+    async def market_call():
+        return 42
+
+    assert await pool.timed(market_call()) == 42
+    assert pool.stats()["latency"] is not None
+
+
+def test_intake_keeps_newest_proposal_per_issuer():
+    intake = ProposalIntake(maxsize=10)
+
+    intake.put_nowait(mock_proposal("provider-1", "a"))
+    intake.put_nowait(mock_proposal("provider-2", "b"))
+    intake.put_nowait(mock_proposal("provider-1", "c"))
+    intake.put_nowait(mock_proposal("", "d"))
+    intake.put_nowait(mock_proposal("", "e"))
+
+    assert intake.qsize() == 4
+    assert intake.dropped == 1
+    # The newer proposal from provider-1 takes the place of the older one
+    assert [intake.get_nowait().id for _ in range(4)] == ["c", "b", "d", "e"]
+    assert intake.empty()
+    with pytest.raises(asyncio.QueueEmpty):
+        intake.get_nowait()
+
+
+@pytest.mark.asyncio
+async def test_intake_backpressure():
+    """Test that `put()` waits when the intake is full, unless the proposal replaces a pending one."""
+    intake = ProposalIntake(maxsize=2)
+    await intake.put(mock_proposal("provider-1", "a"))
+    await intake.put(mock_proposal("provider-2", "b"))
+    assert intake.full()
+
+    with pytest.raises(asyncio.QueueFull):
+        intake.put_nowait(mock_proposal("provider-3", "c"))
+
+    # A proposal from a provider with a pending proposal doesn't need additional space
+    await asyncio.wait_for(intake.put(mock_proposal("provider-2", "d")), timeout=0.1)
+
+    put_task = asyncio.get_event_loop().create_task(intake.put(mock_proposal("provider-3", "e")))
+    await asyncio.sleep(0.1)
+    assert not put_task.done()
+
+    assert (await intake.get()).id == "a"
+    await asyncio.wait_for(put_task, timeout=0.1)
+    assert [intake.get_nowait().id for _ in range(2)] == ["d", "e"]
+    assert intake.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_intake_get_waits():
+    intake = ProposalIntake()
+    get_task = asyncio.get_event_loop().create_task(intake.get())
+    await asyncio.sleep(0.1)
+    assert not get_task.done()
+
+    intake.put_nowait(mock_proposal("provider-1", "a"))
+    assert (await asyncio.wait_for(get_task, timeout=0.1)).id == "a"
@@ -0,0 +1,81 @@
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+
+from yapapi import events
+from yapapi.provider_stats import MAX_SPEED_FACTOR, ProviderStats
+from yapapi.script.command import Deploy, Run
+
+
+def _agreement(provider_id):
+    agreement = mock.Mock()
+    agreement.details.raw_details.offer.provider_id = provider_id
+    return agreement
+
+
+def _task_event(event_class, provider_id, running_time=None, **kwargs):
+    task = mock.Mock(running_time=running_time)
+    return event_class(
+        job=mock.Mock(),
+        agreement=_agreement(provider_id),
+        activity=mock.Mock(),
+        task=task,
+        **kwargs,
+    )
+
+
+def test_provider_stats_score():
+    stats = ProviderStats()
+    for _ in range(4):
+        stats.on_event(_task_event(events.TaskAccepted, "fast", timedelta(seconds=1)))
+        stats.on_event(_task_event(events.TaskAccepted, "slow", timedelta(seconds=10)))
+    stats.on_event(_task_event(events.TaskRejected, "slow", reason="bad result"))
+
+    assert stats.running_time("fast") == 1.0
+    assert stats.running_time("slow", 0.9) == 10.0
+    assert stats.failure_rate("fast") == 0.0
+    assert stats.failure_rate("slow") == 0.2
+    assert stats.failure_rate("unknown") is None
+
+    assert stats.score("unknown") == 1.0
+    assert stats.score("fast") == MAX_SPEED_FACTOR
+    assert stats.score("slow") == pytest.approx(5 / 6 * 5.5 / 10)
+
+
+@pytest.mark.asyncio
+async def test_provider_stats_deploy_time():
+    stats = ProviderStats()
+    agreement = _agreement("provider")
+
+    def script_event(event_class, script):
+        return event_class(
+            job=mock.Mock(), agreement=agreement, activity=mock.Mock(), script=script
+        )
+
+    deploy_script = mock.Mock(id=1, _commands=[Deploy(), Run("/bin/sh")])
+    run_script = mock.Mock(id=2, _commands=[Run("/bin/sh")])
+    with mock.patch("yapapi.provider_stats.time.monotonic", side_effect=[10.0, 13.0]):
+        stats.on_event(script_event(events.ScriptSent, deploy_script))
+        stats.on_event(script_event(events.ScriptSent, run_script))
+        stats.on_event(script_event(events.ScriptFinished, run_script))
+        stats.on_event(script_event(events.ScriptFinished, deploy_script))
+
+    assert stats.deploy_time("provider") == 3.0
+
+
+def test_provider_stats_save_load(tmp_path):
+    path = tmp_path / "stats.json"
+    stats = ProviderStats(path=path, window=3)
+    for seconds in range(5):
+        stats.on_event(_task_event(events.TaskAccepted, "provider", timedelta(seconds=seconds)))
+    stats.on_event(_task_event(events.TaskRejected, "provider", reason=None))
+    stats.save()
+
+    loaded = ProviderStats(path=path, window=3)
+    assert list(loaded) == ["provider"]
+    assert loaded.running_time("provider", 0) == 2.0
+    assert loaded.failure_rate("provider") == pytest.approx(1 / 3)
+
+    with pytest.raises(ValueError):
+        ProviderStats().save()
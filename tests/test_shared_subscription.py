@@ -0,0 +1,188 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import sys
+from unittest import mock
+from unittest.mock import Mock
+
+import pytest
+
+from yapapi import events
+from yapapi.props.builder import DemandBuilder
+from yapapi.shared_subscription import demand_key, SharedSubscription
+
+
+class FakeSubscription:
+    def __init__(self):
+        self.id = "subscription-1"
+        self.proposals: asyncio.Queue = asyncio.Queue()
+        self.deleted = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.deleted = True
+
+    async def events(self):
+        while True:
+            yield await self.proposals.get()
+
+
+def demand(expiration: datetime, **props) -> DemandBuilder:
+    builder = DemandBuilder()
+    builder.add_properties({"golem.srv.comp.expiration": int(expiration.timestamp() * 1000)})
+    builder.add_properties(props)
+    builder.ensure("(golem.runtime.name=vm)")
+    return builder
+
+
+def mock_job(subscription: FakeSubscription, expiration: datetime, claimed=(), full=False):
+    job = Mock(expiration_time=expiration)
+    job._demand_builder.subscribe = mock.AsyncMock(return_value=subscription)
+    job._receive_proposal = mock.AsyncMock()
+    job._receive_proposal_nowait = Mock(return_value=not full)
+    job._claim_draft = lambda proposal: proposal.prev_proposal_id in claimed
+    return job
+
+
+def mock_proposal(issuer, id, draft=False, prev_proposal_id=None):
+    return Mock(issuer=issuer, id=id, is_draft=draft, prev_proposal_id=prev_proposal_id)
+
+
+def received(job):
+    return [call.args[0] for call in job._receive_proposal.call_args_list]
+
+
+def received_nowait(job):
+    return [call.args[0] for call in job._receive_proposal_nowait.call_args_list]
+
+
+def test_demand_key():
+    now = datetime.now(timezone.utc)
+    later = now + timedelta(minutes=10)
+
+    assert demand_key(demand(now, a=1)) == demand_key(demand(later, a=1))
+    assert demand_key(demand(now, a=1)) != demand_key(demand(now, a=2))
+
+    other_constraints = demand(now, a=1)
+    other_constraints.ensure("(golem.inf.mem.gib>=4)")
+    assert demand_key(demand(now, a=1)) != demand_key(other_constraints)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_shared_subscription_fan_out():
+    """Test that offers are passed to all jobs and drafts only to the job that claims them.
+
+    Drafts not claimed by any job are dropped.
+    """
+
+    now = datetime.now(timezone.utc)
+    subscription = FakeSubscription()
+    job_1 = mock_job(subscription, now)
+    job_2 = mock_job(subscription, now + timedelta(minutes=1), claimed=("counter-2",))
+    shared = SharedSubscription(Mock())
+
+    await shared.add_job(job_1)
+    await shared.add_job(job_2)
+
+    offer = mock_proposal("provider-1", "offer-1")
+    draft = mock_proposal("provider-1", "draft-1", draft=True, prev_proposal_id="counter-2")
+    unclaimed = mock_proposal("provider-2", "draft-2", draft=True, prev_proposal_id="counter-3")
+    for proposal in (offer, draft, unclaimed):
+        subscription.proposals.put_nowait(proposal)
+    await asyncio.sleep(0.01)
+
+    # The subscription was created from the demand of the job with the latest expiration
+    job_1._demand_builder.subscribe.assert_not_called()
+    job_2._demand_builder.subscribe.assert_awaited_once()
+    job_1.emit.assert_called_with(events.SubscriptionCreated, subscription=subscription)
+    job_2.emit.assert_called_with(events.SubscriptionCreated, subscription=subscription)
+
+    assert received_nowait(job_1) == [offer]
+    assert received_nowait(job_2) == [offer, draft]
+
+    assert not shared.remove_job(job_1)
+    assert shared.remove_job(job_2)
+    await asyncio.sleep(0.01)
+    assert subscription.deleted
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_shared_subscription_late_join():
+    """Test that a job joining an existing subscription receives the offers collected before."""
+
+    now = datetime.now(timezone.utc)
+    subscription = FakeSubscription()
+    job_1 = mock_job(subscription, now)
+    job_2 = mock_job(subscription, now)
+    shared = SharedSubscription(Mock())
+
+    await shared.add_job(job_1)
+    offers = [mock_proposal("provider-1", "offer-1"), mock_proposal("provider-1", "offer-2")]
+    for offer in offers:
+        subscription.proposals.put_nowait(offer)
+    await asyncio.sleep(0.01)
+
+    await shared.add_job(job_2)
+    job_2.emit.assert_called_once_with(events.SubscriptionCreated, subscription=subscription)
+    # The only job waits for space in its intake
+    assert received(job_1) == offers
+    # Only the latest offer from each provider is passed to the new job
+    assert received(job_2) == [offers[1]]
+
+    assert not shared.remove_job(job_2)
+    assert not subscription.deleted
+    assert shared.remove_job(job_1)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_shared_subscription_failure():
+    """Test that all jobs waiting for a subscription get the error when subscribing fails."""
+
+    job = Mock(expiration_time=datetime.now(timezone.utc))
+    job._demand_builder.subscribe = mock.AsyncMock(side_effect=RuntimeError("no market"))
+    shared = SharedSubscription(Mock())
+
+    await shared.add_job(job)
+    with pytest.raises(RuntimeError):
+        await shared.wait()
+    job.emit.assert_called_once_with(events.SubscriptionFailed, reason="no market")
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_shared_subscription_full_intake():
+    """Test that a job with a full intake doesn't hold off passing proposals to the others."""
+
+    now = datetime.now(timezone.utc)
+    subscription = FakeSubscription()
+    job_1 = mock_job(subscription, now, claimed=("counter-1",), full=True)
+
+    async def wait_for_space(_proposal):
+        await asyncio.Event().wait()
+
+    job_1._receive_proposal = mock.AsyncMock(side_effect=wait_for_space)
+    job_2 = mock_job(subscription, now)
+    shared = SharedSubscription(Mock())
+
+    await shared.add_job(job_1)
+    await shared.add_job(job_2)
+
+    offers = [mock_proposal(f"provider-{n}", f"offer-{n}") for n in range(3)]
+    draft = mock_proposal("provider-1", "draft-1", draft=True, prev_proposal_id="counter-1")
+    for proposal in (offers[0], draft, *offers[1:]):
+        subscription.proposals.put_nowait(proposal)
+    await asyncio.sleep(0.01)
+
+    assert received_nowait(job_2) == offers
+    # The draft is passed to its job in a separate task, waiting for space in the intake
+    assert received(job_1) == [draft]
+    assert len(shared._forwarding) == 1
+
+    assert not shared.remove_job(job_2)
+    assert shared.remove_job(job_1)
+    await asyncio.sleep(0.01)
+    assert not shared._forwarding
@@ -0,0 +1,74 @@
+import asyncio
+import itertools
+import sys
+from unittest import mock
+from unittest.mock import Mock
+
+import pytest
+
+from yapapi.engine import _Engine
+from yapapi.warm_pool import WarmPool
+
+
+def mock_engine():
+    engine = Mock(offer_ttl=None, offer_score_half_life=None, provider_stats=None)
+    engine.agreement_race_extra = 0
+    engine.process_batches = mock.AsyncMock()
+    engine.accept_payments_for_agreement = mock.AsyncMock()
+    activity_ids = itertools.count()
+
+    async def start_worker(job, run_worker):
+        ctx = Mock()
+        ctx._activity.id = next(activity_ids)
+        return asyncio.get_event_loop().create_task(run_worker(ctx))
+
+    engine.start_worker = start_worker
+    return engine
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="AsyncMock requires python 3.8+")
+@pytest.mark.asyncio
+async def test_warm_pool_refills():
+    engine = mock_engine()
+    pool = WarmPool(engine, Mock(), size=2)
+    pool._job.find_offers = mock.AsyncMock()
+    await pool.start()
+    engine.add_warm_pool.assert_called_once_with(pool)
+
+    await asyncio.sleep(0.1)
+    assert len(pool) == 2
+    # Each activity has the payload deployed and started
+    assert engine.process_batches.await_count == 2
+
+    first = pool.claim()
+    second = pool.claim()
+    assert {first.activity.id, second.activity.id} == {0, 1}
+    assert pool.claim() is None
+
+    await asyncio.sleep(0.1)
+    assert len(pool) == 2
+    first.release()
+    second.release(reuse=False)
+    await asyncio.sleep(0.1)
+    assert engine.accept_payments_for_agreement.await_count == 2
+    assert len(pool) == 2
+
+    await pool.stop()
+    assert len(pool) == 0
+    engine.remove_warm_pool.assert_called_once_with(pool)
+    engine.finalize_job.assert_called_once_with(pool._job)
+
+
+def test_claim_warm_worker_matches_payload():
+    pools = [Mock(payload="a"), Mock(payload="b"), Mock(payload="b")]
+    pools[1].claim.return_value = None
+    engine = Mock(_warm_pools=pools)
+
+    assert _Engine.claim_warm_worker(engine, "b") is pools[2].claim.return_value
+    assert _Engine.claim_warm_worker(engine, "c") is None
+    pools[0].claim.assert_not_called()
+
+
+def test_warm_pool_invalid_size():
+    with pytest.raises(ValueError):
+        WarmPool(Mock(), Mock(), size=0)
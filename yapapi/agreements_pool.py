@@ -1,19 +1,32 @@
 import asyncio
 from dataclasses import dataclass
 import datetime
+import heapq
+import itertools
 import logging
+import math
 import random
 import sys
-from typing import Dict, NamedTuple, Optional, Callable
+from typing import Dict, List, NamedTuple, Optional, Callable, Set, Tuple
 
 import aiohttp
+from typing_extensions import Final
 
 from yapapi import events
 from yapapi.props import Activity, NodeInfo
+from yapapi.provider_stats import ProviderStats
 from yapapi.rest.market import Agreement, AgreementDetails, ApiException, OfferProposal
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_CONCURRENT_NEGOTIATIONS: Final[int] = 5
+"Default maximum number of agreements negotiated concurrently by an `AgreementsPool`."
+
+_RACE_LOST_REASON: Final[dict] = {
+    "message": "Enough agreements confirmed by other providers",
+    "golem.requestor.code": "Cancelled",
+}
+
 
 class _BufferedProposal(NamedTuple):
     """Providers' proposal with additional local metadata"""
@@ -35,6 +48,10 @@ class BufferedAgreement:
     has_multi_activity: bool
 
 
+#   Offer buffer heap entry: (negated score, random tie-breaker, insertion counter, offer)
+_OfferHeapEntry = Tuple[float, float, int, _BufferedProposal]
+
+
 class AgreementsPool:
     """Manages proposals and agreements pool"""
 
@@ -42,12 +59,53 @@ class AgreementsPool:
         self,
         emitter: Callable[..., events.Event],
         offer_recycler: Callable[[OfferProposal], None],
+        max_negotiations: int = DEFAULT_MAX_CONCURRENT_NEGOTIATIONS,
+        offer_ttl: Optional[datetime.timedelta] = None,
+        score_half_life: Optional[datetime.timedelta] = None,
+        offers_recycler: Optional[Callable[[List[OfferProposal]], None]] = None,
+        provider_stats: Optional[ProviderStats] = None,
+        race_extra: int = 0,
     ):
+        """
+        :param emitter: callable emitting events
+        :param offer_recycler: callable passing an offer back to be negotiated again
+        :param max_negotiations: maximum number of agreements negotiated concurrently
+        :param offer_ttl: time after which a buffered offer is evicted in :func:`cycle`
+            and recycled. If `None`, offers are buffered until used
+        :param score_half_life: if given, the scores of buffered offers are halved every
+            `score_half_life`, so that newer offers are preferred over older ones
+            with slightly higher scores
+        :param offers_recycler: callable passing a number of offers back to be negotiated again,
+            used to recycle evicted offers. If not given, `offer_recycler` is called for each offer
+        :param provider_stats: if given, the agreement reused is the one with the provider
+            that has the best :func:`~yapapi.provider_stats.ProviderStats.score`
+        :param race_extra: number of agreements negotiated in addition to the ones needed, to
+            race the providers. As soon as enough agreements are confirmed, the remaining
+            negotiations are cancelled and agreements confirmed in excess are terminated
+        """
         self.emitter = emitter
         self.offer_recycler = offer_recycler
+        self.offers_recycler = offers_recycler
+        self._offer_ttl = offer_ttl
+        self._score_half_life = score_half_life
+        self._provider_stats = provider_stats
+        self._race_extra = race_extra
         self._offer_buffer: Dict[str, _BufferedProposal] = {}  # provider_id -> Proposal
+        #   Heap of buffered offers with the best score on top. An entry is valid only as long as
+        #   its offer is the one in `_offer_buffer`, entries of superseded offers are skipped.
+        self._offer_heap: List[_OfferHeapEntry] = []
+        self._offer_counter = itertools.count()
         self._agreements: Dict[str, BufferedAgreement] = {}  # agreement_id -> Agreement
+        #   Ids of the agreements available for reuse, i.e. with no worker task,
+        #   in the order in which they became available
+        self._free_agreements: Dict[str, None] = {}
         self._lock = asyncio.Lock()
+        self._max_negotiations = max_negotiations
+        self._negotiations: Set[asyncio.Task] = set()
+        #   Tasks cancelling or terminating agreements of the negotiations that lost a race
+        self._withdrawals: Set[asyncio.Task] = set()
+        self._waiting = 0
+        self._proposal_listeners: List[Callable[[], None]] = []
         self.confirmed = 0
 
     async def cycle(self):
@@ -55,6 +113,8 @@ class AgreementsPool:
 
         Should be called regularly.
         """
+        self._evict_expired_offers()
+
         for agreement_id in frozenset(self._agreements):
             try:
                 buffered_agreement = self._agreements[agreement_id]
@@ -66,24 +126,98 @@ class AgreementsPool:
                     buffered_agreement.agreement.id, allow_reuse=task.exception() is None
                 )
 
+    def add_proposal_listener(self, listener: Callable[[], None]) -> None:
+        """Register a callable to be called whenever a proposal is added to the pool."""
+        self._proposal_listeners.append(listener)
+
     async def add_proposal(self, score: float, proposal: OfferProposal) -> None:
         """Adds providers' proposal to the pool of available proposals"""
         async with self._lock:
-            self._offer_buffer[proposal.issuer] = _BufferedProposal(
-                datetime.datetime.now(), score, proposal
+            offer = _BufferedProposal(datetime.datetime.now(), score, proposal)
+            # Re-insert the provider's entry, so that `_offer_buffer` is ordered by timestamps
+            self._offer_buffer.pop(proposal.issuer, None)
+            self._offer_buffer[proposal.issuer] = offer
+            # A random tie-breaker, so that an offer is picked at random among the ones
+            # with the same priority
+            heapq.heappush(
+                self._offer_heap,
+                (self._priority(offer), random.random(), next(self._offer_counter), offer),
             )
+            if len(self._offer_heap) > 2 * len(self._offer_buffer) + 16:
+                self._compact_offer_heap()
+        for listener in self._proposal_listeners:
+            listener()
+
+    def _priority(self, offer: _BufferedProposal) -> float:
+        """Return the priority of a buffered offer in the offer heap, lower is better."""
+        if self._score_half_life is None:
+            return -offer.score
+        if offer.score <= 0:
+            return math.inf
+        # Decaying all scores by the same factor doesn't change their order, so instead of
+        # decaying the scores of older offers we boost the newer ones, by the same factor
+        # in the logarithmic scale. This way priorities don't change over time.
+        half_lives = offer.ts.timestamp() / self._score_half_life.total_seconds()
+        return -(math.log(offer.score) + half_lives * math.log(2))
+
+    def _evict_expired_offers(self) -> None:
+        """Remove the offers older than `offer_ttl` from the buffer and recycle them."""
+        if self._offer_ttl is None:
+            return
+        deadline = datetime.datetime.now() - self._offer_ttl
+        expired = []
+        for offer in self._offer_buffer.values():
+            if offer.ts >= deadline:
+                break
+            expired.append(offer.proposal)
+        if not expired:
+            return
+
+        for proposal in expired:
+            del self._offer_buffer[proposal.issuer]
+        logger.debug("Evicted %d expired offers, recycling them", len(expired))
+        if self.offers_recycler is not None:
+            self.offers_recycler(expired)
+        else:
+            for proposal in expired:
+                self.offer_recycler(proposal)
+
+    def _is_buffered(self, offer: _BufferedProposal) -> bool:
+        return self._offer_buffer.get(offer.proposal.issuer) is offer
+
+    def _compact_offer_heap(self) -> None:
+        """Remove the entries of superseded offers from the offer heap."""
+        self._offer_heap = [entry for entry in self._offer_heap if self._is_buffered(entry[3])]
+        heapq.heapify(self._offer_heap)
 
     async def use_agreement(
         self, cbk: Callable[[Agreement], asyncio.Task]
     ) -> Optional[asyncio.Task]:
-        """Get an agreement and start the `cbk()` task within it."""
-        async with self._lock:
-            agreement = await self._get_agreement()
-            if agreement is None:
-                return None
-            task = cbk(agreement)
-            await self._set_worker(agreement.id, task)
-            return task
+        """Get an agreement and start the `cbk()` task within it.
+
+        If there's no agreement available for reuse, new agreements are negotiated with
+        the best-scored offers, up to one for each caller waiting for an agreement but
+        no more than `max_negotiations` at a time. The first agreement confirmed is used.
+        Return `None` if there are no offers left to negotiate with.
+        """
+        self._waiting += 1
+        try:
+            while True:
+                async with self._lock:
+                    agreement = self._get_free_agreement()
+                    if agreement is not None:
+                        task = cbk(agreement)
+                        await self._set_worker(agreement.id, task)
+                        return task
+                    self._start_negotiations()
+                    negotiations = set(self._negotiations)
+                if not negotiations:
+                    return None
+                # Wait for any negotiation to end, confirmed agreements are free to be taken
+                # by the first caller that gets the lock
+                await asyncio.wait(negotiations, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self._waiting -= 1
 
     async def _set_worker(self, agreement_id: str, task: asyncio.Task) -> None:
         try:
@@ -92,33 +226,130 @@ class AgreementsPool:
             return
         assert buffered_agreement.worker_task is None
         buffered_agreement.worker_task = task
+        self._free_agreements.pop(agreement_id, None)
 
-    async def _get_agreement(self) -> Optional[Agreement]:
-        """Returns an Agreement
+    def _get_free_agreement(self) -> Optional[Agreement]:
+        """Return an agreement available for reuse, if any.
 
-        Firstly it tries to reuse agreement from a pool of available agreements
-        (no active worker_task). If that fails it tries to convert offer into agreement.
+        Without `provider_stats`, it's the agreement that's been available the longest.
+        Otherwise it's the one with the best-scored provider, the longest available among those.
         """
-        emit = self.emitter
+        agreement_id = next(iter(self._free_agreements), None)
+        if agreement_id is None:
+            return None
+        if self._provider_stats is not None:
+            best_score = None
+            for free_id in self._free_agreements:
+                details = self._agreements[free_id].agreement_details
+                provider_id = details.raw_details.offer.provider_id
+                # Like a provider with no statistics, a provider with no id gets a neutral score
+                score = self._provider_stats.score(provider_id) if provider_id else 1.0
+                if best_score is None or score > best_score:
+                    agreement_id, best_score = free_id, score
+        logger.debug("Reusing agreement. id: %s", agreement_id)
+        return self._agreements[agreement_id].agreement
+
+    def _pop_best_offer(self) -> Optional[_BufferedProposal]:
+        """Remove the offer with the highest score from the buffer and return it."""
+        while self._offer_heap:
+            *_, offer = heapq.heappop(self._offer_heap)
+            if self._is_buffered(offer):
+                del self._offer_buffer[offer.proposal.issuer]
+                return offer
+        return None
+
+    def _start_negotiations(self) -> None:
+        """Start negotiating agreements with the best offers, if there are too few negotiations.
+
+        With `race_extra`, that many negotiations are started in addition to the ones needed.
+        """
+        loop = asyncio.get_event_loop()
+        target = min(self._waiting, self._max_negotiations)
+        if target:
+            target += self._race_extra
+        while len(self._negotiations) < target:
+            offer = self._pop_best_offer()
+            if offer is None:
+                return
+            negotiation = loop.create_task(self._negotiate_agreement(offer))
+            self._negotiations.add(negotiation)
+            negotiation.add_done_callback(self._on_negotiation_done)
 
+    def _enough_agreements(self) -> bool:
+        """Check if there's a free agreement for every caller waiting for one."""
+        return len(self._free_agreements) >= self._waiting
+
+    def _on_negotiation_done(self, negotiation: asyncio.Task) -> None:
+        self._negotiations.discard(negotiation)
+        if self._race_extra and self._negotiations and self._enough_agreements():
+            logger.debug(
+                "Enough agreements confirmed, cancelling %d negotiations", len(self._negotiations)
+            )
+            for other in self._negotiations:
+                other.cancel()
+
+    def _withdraw_agreement(self, agreement: Agreement, confirmed: bool) -> None:
+        """Cancel or terminate, in the background, an agreement that lost a race."""
+
+        async def withdraw() -> None:
+            try:
+                if confirmed or not await agreement.cancel(_RACE_LOST_REASON):
+                    # The provider might have approved the agreement before it was cancelled
+                    await agreement.terminate(_RACE_LOST_REASON)
+            except Exception:
+                logger.debug("Failed to withdraw agreement %s", agreement.id, exc_info=True)
+
+        withdrawal = asyncio.get_event_loop().create_task(withdraw())
+        self._withdrawals.add(withdrawal)
+        withdrawal.add_done_callback(self._withdrawals.discard)
+
+    async def _negotiate_agreement(self, offer: _BufferedProposal) -> None:
+        """Convert an offer into a confirmed agreement and add it to the pool.
+
+        Only the bookkeeping is done with the lock held, so that a slow provider doesn't
+        stop other agreements from being negotiated.
+        """
         try:
-            buffered_agreement = random.choice(
-                [ba for ba in self._agreements.values() if ba.worker_task is None]
+            buffered_agreement = await self._create_agreement(offer)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.debug(
+                "Failed to create agreement. proposal: %s", offer.proposal.id, exc_info=True
             )
-            logger.debug("Reusing agreement. id: %s", buffered_agreement.agreement.id)
-            return buffered_agreement.agreement
-        except IndexError:  # empty pool
-            pass
+            return
+        if buffered_agreement is None:
+            return
 
+        agreement = buffered_agreement.agreement
         try:
-            offers = list(self._offer_buffer.items())
-            # Shuffle the offers before picking one with the max score,
-            # in case there's more than one with this score.
-            random.shuffle(offers)
-            provider_id, offer = max(offers, key=lambda elem: elem[1].score)
-        except ValueError:  # empty pool
-            return None
-        del self._offer_buffer[provider_id]
+            await self._lock.acquire()
+        except asyncio.CancelledError:
+            self._withdraw_agreement(agreement, confirmed=True)
+            raise
+        try:
+            self.emitter(events.AgreementConfirmed, agreement=agreement)
+            self.confirmed += 1
+            if self._race_extra and self._enough_agreements():
+                logger.debug("Terminating agreement confirmed in excess. id: %s", agreement.id)
+                self._withdraw_agreement(agreement, confirmed=True)
+                self.emitter(
+                    events.AgreementTerminated, agreement=agreement, reason=_RACE_LOST_REASON
+                )
+                return
+            self._agreements[agreement.id] = buffered_agreement
+            self._free_agreements[agreement.id] = None
+        finally:
+            self._lock.release()
+
+    async def _create_agreement(self, offer: _BufferedProposal) -> Optional[BufferedAgreement]:
+        """Create and confirm an agreement for the offer.
+
+        Return `None` if the provider didn't confirm the agreement,
+        in which case the offer is recycled.
+        """
+        emit = self.emitter
+
         try:
             agreement = await offer.proposal.create_agreement()
         except asyncio.CancelledError:
@@ -127,6 +358,18 @@ class AgreementsPool:
             exc_info = (type(e), e, sys.exc_info()[2])
             emit(events.ProposalFailed, proposal=offer.proposal, exc_info=exc_info)
             raise
+        try:
+            return await self._confirm_agreement(offer, agreement)
+        except asyncio.CancelledError:
+            # The negotiation lost a race or the pool is terminating,
+            # don't leave the provider with a pending agreement
+            self._withdraw_agreement(agreement, confirmed=False)
+            raise
+
+    async def _confirm_agreement(
+        self, offer: _BufferedProposal, agreement: Agreement
+    ) -> Optional[BufferedAgreement]:
+        emit = self.emitter
         try:
             agreement_details = await agreement.get_details()
             provider_activity = agreement_details.provider_view.extract(Activity)
@@ -143,7 +386,7 @@ class AgreementsPool:
             emit(events.AgreementRejected, agreement=agreement)
             self.offer_recycler(offer.proposal)
             return None
-        self._agreements[agreement.id] = BufferedAgreement(
+        return BufferedAgreement(
             agreement=agreement,
             agreement_details=agreement_details,
             worker_task=None,
@@ -151,9 +394,6 @@ class AgreementsPool:
                 provider_activity.multi_activity and requestor_activity.multi_activity
             ),
         )
-        emit(events.AgreementConfirmed, agreement=agreement)
-        self.confirmed += 1
-        return agreement
 
     async def release_agreement(self, agreement_id: str, allow_reuse: bool = True) -> None:
         """Marks agreement as unused.
@@ -172,6 +412,8 @@ class AgreementsPool:
             if not allow_reuse or not buffered_agreement.has_multi_activity:
                 reason = {"message": "Work cancelled", "golem.requestor.code": "Cancelled"}
                 await self._terminate_agreement(agreement_id, reason)
+            else:
+                self._free_agreements[agreement_id] = None
 
     async def _terminate_agreement(self, agreement_id: str, reason: dict) -> None:
         """Terminate the agreement with given `agreement_id`."""
@@ -207,12 +449,21 @@ class AgreementsPool:
                 )
 
         del self._agreements[agreement_id]
+        self._free_agreements.pop(agreement_id, None)
         self.emitter(
             events.AgreementTerminated, agreement=buffered_agreement.agreement, reason=reason
         )
 
     async def terminate_all(self, reason: dict) -> None:
-        """Terminate all agreements."""
+        """Terminate all agreements, cancelling the negotiations in progress."""
+
+        negotiations = list(self._negotiations)
+        for negotiation in negotiations:
+            negotiation.cancel()
+        if negotiations:
+            await asyncio.gather(*negotiations, return_exceptions=True)
+        if self._withdrawals:
+            await asyncio.gather(*self._withdrawals, return_exceptions=True)
 
         async with self._lock:
             for agreement_id in frozenset(self._agreements):
@@ -232,6 +483,7 @@ class AgreementsPool:
             buffered_agreement.worker_task and buffered_agreement.worker_task.cancel()
             buffered_agreement.agreement._terminated = True
             del self._agreements[agr_id]
+            self._free_agreements.pop(agr_id, None)
             self.emitter(
                 events.AgreementTerminated, agreement=buffered_agreement.agreement, reason=reason
             )
@@ -10,7 +10,7 @@ import inspect
 
 from yapapi.strategy import BaseMarketStrategy, SCORE_REJECTED, WrappingMarketStrategy
 from yapapi.rest.market import OfferProposal
-from typing import Awaitable, Callable, Union
+from typing import Awaitable, Callable, List, Union
 
 IsAllowedType = Union[
     Callable[[str], bool],
@@ -70,13 +70,29 @@ class ProviderFilter(WrappingMarketStrategy):
         super().__init__(base_strategy)
         self._is_allowed = is_allowed
 
-    async def score_offer(self, offer: OfferProposal) -> float:
+    async def _issuer_allowed(self, offer: OfferProposal) -> bool:
         if inspect.iscoroutinefunction(self._is_allowed):
-            allowed = await self._is_allowed(offer.issuer)  # type: ignore
+            return await self._is_allowed(offer.issuer)  # type: ignore
         else:
-            allowed = self._is_allowed(offer.issuer)
+            return self._is_allowed(offer.issuer)  # type: ignore
 
-        if not allowed:
+    async def score_offer(self, offer: OfferProposal) -> float:
+        if not await self._issuer_allowed(offer):
             return SCORE_REJECTED
 
         return await self.base_strategy.score_offer(offer)
+
+    async def score_offers(self, offers: List[OfferProposal]) -> List[float]:
+        """Score a batch of `offers`, passing only the ones from allowed providers to the base strategy.
+
+        Subclasses overriding :func:`score_offer` get all offers scored with it.
+        """
+        if type(self).score_offer is not ProviderFilter.score_offer:
+            return await super().score_offers(offers)
+        allowed = [await self._issuer_allowed(offer) for offer in offers]
+        base_scores = iter(
+            await self.base_strategy.score_offers(
+                [offer for offer, is_allowed in zip(offers, allowed) if is_allowed]
+            )
+        )
+        return [next(base_scores) if is_allowed else SCORE_REJECTED for is_allowed in allowed]
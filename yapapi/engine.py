@@ -1,11 +1,11 @@
 import asyncio
 import aiohttp
 from asyncio import CancelledError
-from collections import defaultdict
+from collections import defaultdict, deque, OrderedDict
 import contextlib
 from copy import deepcopy
 from dataclasses import dataclass
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 import itertools
 import logging
@@ -16,12 +16,15 @@ from typing import (
     Awaitable,
     Callable,
     cast,
+    Deque,
     Dict,
     Iterator,
     List,
     Optional,
     Set,
     Type,
+    TypeVar,
+    TYPE_CHECKING,
     Union,
 )
 from typing_extensions import AsyncGenerator, Final
@@ -35,12 +38,19 @@ from yapapi import rest, events
 from yapapi.agreements_pool import AgreementsPool
 from yapapi.ctx import WorkContext
 from yapapi.payload import Payload
+from yapapi.provider_stats import ProviderStats
+from yapapi.proposal_handling import (
+    DEFAULT_MAX_PROPOSAL_HANDLERS,
+    ProposalHandlerPool,
+    ProposalIntake,
+)
 from yapapi import props
 from yapapi.props.builder import DemandBuilder, DemandDecorator
 from yapapi.rest.activity import Activity
-from yapapi.rest.market import Agreement, OfferProposal, Subscription
+from yapapi.rest.market import Agreement, OfferProposal
 from yapapi.rest.payment import DebitNote
 from yapapi.script import Script
+from yapapi.shared_subscription import demand_key, SharedSubscription
 from yapapi.script.command import BatchCommand
 from yapapi.storage import gftp
 from yapapi.strategy import (
@@ -52,12 +62,18 @@ from yapapi.strategy import (
 )
 from yapapi.invoice_manager import InvoiceManager
 
+if TYPE_CHECKING:
+    from yapapi.warm_pool import WarmPool, WarmWorker
+
 DEFAULT_DRIVER: str = os.getenv("YAGNA_PAYMENT_DRIVER", "erc20").lower()
 DEFAULT_NETWORK: str = os.getenv("YAGNA_PAYMENT_NETWORK", "rinkeby").lower()
 DEFAULT_SUBNET: Optional[str] = os.getenv("YAGNA_SUBNET", "devnet-beta")
 
 MAX_CONCURRENTLY_PROCESSED_DEBIT_NOTES: Final[int] = 10
 
+MAX_TRACKED_COUNTER_PROPOSALS: Final[int] = 10000
+"Maximum number of a job's recent counter-proposals remembered to route drafts to that job."
+
 logger = logging.getLogger("yapapi.executor")
 
 
@@ -86,6 +102,8 @@ class NoPaymentAccountError(Exception):
         )
 
 
+T = TypeVar("T")
+
 # Type aliases to make some type annotations more meaningful
 JobId = str
 ActivityId = str
@@ -106,6 +124,12 @@ class _Engine:
         payment_network: Optional[str] = None,
         stream_output: bool = False,
         app_key: Optional[str] = None,
+        max_proposal_handlers: int = DEFAULT_MAX_PROPOSAL_HANDLERS,
+        offer_ttl: Optional[timedelta] = None,
+        offer_score_half_life: Optional[timedelta] = None,
+        provider_stats: Optional[ProviderStats] = None,
+        agreement_race_extra: int = 0,
+        pipeline_depth: Optional[int] = None,
     ):
         """Initialize the engine.
 
@@ -125,7 +149,28 @@ class _Engine:
         :param stream_output: stream computation output from providers
         :param app_key: optional Yagna application key. If not provided, the default is to
                         get the value from `YAGNA_APPKEY` environment variable
+        :param max_proposal_handlers: maximum number of offer proposals handled concurrently
+            by a single job
+        :param offer_ttl: time after which an offer waiting for an agreement is negotiated again.
+            If `None`, offers wait until they're used
+        :param offer_score_half_life: if given, the scores of offers waiting for an agreement
+            are halved every `offer_score_half_life`
+        :param provider_stats: optional statistics of providers, used to choose which agreement
+            to reuse. They're expected to be updated with this engine's events
+        :param agreement_race_extra: number of agreements negotiated by each job in addition
+            to the ones needed. The first agreements confirmed are used and the others
+            are cancelled or terminated
+        :param pipeline_depth: if given, maximum number of scripts in flight on a single
+            activity. Scripts are sent before the previous ones finish and their results are
+            processed in the order in which they were sent. If `None`, scripts that don't
+            wait for results are processed concurrently, in no particular order
         """
+        if max_proposal_handlers < 1:
+            raise ValueError(f"Expected max_proposal_handlers >= 1, got {max_proposal_handlers}")
+        if agreement_race_extra < 0:
+            raise ValueError(f"Expected agreement_race_extra >= 0, got {agreement_race_extra}")
+        if pipeline_depth is not None and pipeline_depth < 1:
+            raise ValueError(f"Expected pipeline_depth >= 1, got {pipeline_depth}")
         self._api_config = rest.Configuration(app_key)
         self._budget_amount = Decimal(budget)
         self._budget_allocations: List[rest.payment.Allocation] = []
@@ -137,6 +182,12 @@ class _Engine:
         self._payment_driver: str = payment_driver.lower() if payment_driver else DEFAULT_DRIVER
         self._payment_network: str = payment_network.lower() if payment_network else DEFAULT_NETWORK
         self._stream_output = stream_output
+        self._max_proposal_handlers = max_proposal_handlers
+        self._offer_ttl = offer_ttl
+        self._offer_score_half_life = offer_score_half_life
+        self._provider_stats = provider_stats
+        self._agreement_race_extra = agreement_race_extra
+        self._pipeline_depth = pipeline_depth
 
         # a set of `Job` instances used to track jobs - computations or services - started
         # it can be used to wait until all jobs are finished
@@ -163,6 +214,12 @@ class _Engine:
         #   All agreements ever used within this Engine will be stored here
         self._all_agreements: Dict[AgreementId, Agreement] = {}
 
+        #   Market subscriptions shared by jobs with the same demand, by demand key
+        self._shared_subscriptions: Dict[str, SharedSubscription] = {}
+
+        #   Pools of activities prepared ahead of the work, in the order of creation
+        self._warm_pools: List["WarmPool"] = []
+
     async def create_demand_builder(
         self, expiration_time: datetime, payload: Payload
     ) -> DemandBuilder:
@@ -200,6 +257,36 @@ class _Engine:
         """Return the name of the subnet used by this engine, or `None` if it is not set."""
         return self._subnet
 
+    @property
+    def max_proposal_handlers(self) -> int:
+        """Return the maximum number of offer proposals handled concurrently by a single job."""
+        return self._max_proposal_handlers
+
+    @property
+    def offer_ttl(self) -> Optional[timedelta]:
+        """Time after which an offer waiting for an agreement is negotiated again."""
+        return self._offer_ttl
+
+    @property
+    def offer_score_half_life(self) -> Optional[timedelta]:
+        """Time after which the score of an offer waiting for an agreement is halved."""
+        return self._offer_score_half_life
+
+    @property
+    def provider_stats(self) -> Optional[ProviderStats]:
+        """Statistics of providers used to choose which agreement to reuse."""
+        return self._provider_stats
+
+    @property
+    def agreement_race_extra(self) -> int:
+        """Number of agreements negotiated by each job in addition to the ones needed."""
+        return self._agreement_race_extra
+
+    @property
+    def pipeline_depth(self) -> Optional[int]:
+        """Maximum number of scripts in flight on a single activity, if scripts are pipelined."""
+        return self._pipeline_depth
+
     @property
     def started(self) -> bool:
         """Return `True` if this instance is initialized, `False` otherwise."""
@@ -291,6 +378,9 @@ class _Engine:
         for gen in self._generators:
             await gen.aclose()
 
+        for pool in list(self._warm_pools):
+            await pool.stop()
+
         # Wait until all computations are finished
         logger.debug("Waiting for the jobs to finish...")
         await asyncio.gather(*[job.finished.wait() for job in self._jobs])
@@ -603,6 +693,24 @@ class _Engine:
         job.finished.set()
         job.emit(events.JobFinished, exc_info=job._exc_info)  # type: ignore
 
+    def add_warm_pool(self, pool: "WarmPool") -> None:
+        """Register a pool of activities to be claimed by jobs with the same payload."""
+        self._warm_pools.append(pool)
+
+    def remove_warm_pool(self, pool: "WarmPool") -> None:
+        """Unregister a pool of activities registered with :func:`add_warm_pool`."""
+        if pool in self._warm_pools:
+            self._warm_pools.remove(pool)
+
+    def claim_warm_worker(self, payload: Payload) -> Optional["WarmWorker"]:
+        """Claim an activity with `payload` deployed and started from a warm pool, if any."""
+        for pool in self._warm_pools:
+            if pool.payload == payload:
+                worker = pool.claim()
+                if worker is not None:
+                    return worker
+        return None
+
     def register_generator(self, generator: AsyncGenerator) -> None:
         """Register a generator with this engine."""
         self._generators.add(generator)
@@ -677,61 +785,103 @@ class _Engine:
         activity: rest.activity.Activity,
         batch_generator: AsyncGenerator[Script, Awaitable[List[events.CommandEvent]]],
     ) -> None:
-        """Send command batches produced by `batch_generator` to `activity`."""
-
-        script: Script = await batch_generator.__anext__()
+        """Send command batches produced by `batch_generator` to `activity`.
 
-        while True:
-            batch_deadline = (
-                datetime.now(timezone.utc) + script.timeout if script.timeout is not None else None
-            )
+        With `pipeline_depth` set, a script that doesn't wait for results is followed by
+        the next one before it finishes, so that e.g. the uploads of the next script overlap
+        with the execution of the previous one, up to `pipeline_depth` scripts in flight.
+        """
 
+        script: Script = await batch_generator.__anext__()
+        #   Tasks processing the results of the pipelined scripts, in the order of sending
+        in_flight: Deque[asyncio.Task] = deque()
+
+        async def get_batch_results(
+            script: Script,
+            remote: rest.activity.Batch,
+            previous: Optional[asyncio.Task],
+        ) -> List[events.CommandEvent]:
+            results: List[events.CommandEvent] = []
             try:
-                await script._before()
-                batch: List[BatchCommand] = script._evaluate()
-                remote = await activity.send(batch, deadline=batch_deadline)
-            except Exception:
-                script = await batch_generator.athrow(*sys.exc_info())
-                continue
-
-            script.emit(events.ScriptSent)
-
-            async def get_batch_results() -> List[events.CommandEvent]:
-                results: List[events.CommandEvent] = []
                 async for event_class, event_kwargs in remote:
                     event = script.process_batch_event(event_class, event_kwargs)
                     results.append(event)
+            finally:
+                if previous is not None:
+                    # Deliver the results (or the error) in the order in which scripts were sent
+                    await asyncio.wait([previous])
+
+            script.emit(events.GettingResults)
+            await script._after()
+            script.emit(events.ScriptFinished)
+            await self.accept_payments_for_agreement(job_id, agreement_id)
 
-                script.emit(events.GettingResults)
-                await script._after()
-                script.emit(events.ScriptFinished)
-                await self.accept_payments_for_agreement(job_id, agreement_id)
+            #   NOTE: This is the same as script.results for non-streaming mode,
+            #         but when streaming we have here additional CommandEvents that
+            #         are not CommandExecuted
+            return results
 
-                #   NOTE: This is the same as script.results for non-streaming mode,
-                #         but when streaming we have here additional CommandEvents that
-                #         are not CommandExecuted
-                return results
+        loop = asyncio.get_event_loop()
 
-            loop = asyncio.get_event_loop()
+        try:
+            while True:
+                if self._pipeline_depth is not None:
+                    while in_flight and in_flight[0].done():
+                        in_flight.popleft()
+                    if len(in_flight) >= self._pipeline_depth:
+                        await asyncio.wait([in_flight.popleft()])
+
+                batch_deadline = (
+                    datetime.now(timezone.utc) + script.timeout
+                    if script.timeout is not None
+                    else None
+                )
 
-            if script.wait_for_results:
-                # Block until the results are available
                 try:
-                    future_results = loop.create_future()
-                    results = await get_batch_results()
-                    future_results.set_result(results)
+                    await script._before()
+                    batch: List[BatchCommand] = script._evaluate()
+                    remote = await activity.send(batch, deadline=batch_deadline)
                 except Exception:
-                    # Raise the exception in `batch_generator` (the `worker` coroutine).
-                    # If the client code is able to handle it then we'll proceed with
-                    # subsequent batches. Otherwise the worker finishes with error.
                     script = await batch_generator.athrow(*sys.exc_info())
+                    continue
+
+                script.emit(events.ScriptSent)
+
+                previous = in_flight[-1] if in_flight else None
+                results_task = loop.create_task(get_batch_results(script, remote, previous))
+                if self._pipeline_depth is not None:
+                    in_flight.append(results_task)
+
+                if script.wait_for_results:
+                    # Block until the results are available
+                    try:
+                        future_results = loop.create_future()
+                        results = await results_task
+                        future_results.set_result(results)
+                    except Exception:
+                        # Raise the exception in `batch_generator` (the `worker` coroutine).
+                        # If the client code is able to handle it then we'll proceed with
+                        # subsequent batches. Otherwise the worker finishes with error.
+                        script = await batch_generator.athrow(*sys.exc_info())
+                    else:
+                        script = await batch_generator.asend(future_results)
+
                 else:
-                    script = await batch_generator.asend(future_results)
+                    # Let the generator continue while the results are processed in the task
+                    script = await batch_generator.asend(results_task)
 
-            else:
-                # Schedule the coroutine in a separate asyncio task
-                future_results = loop.create_task(get_batch_results())
-                script = await batch_generator.asend(future_results)
+        except StopAsyncIteration:
+            # Let the pipelined scripts finish before the activity is released
+            if in_flight:
+                await asyncio.wait(in_flight)
+            raise
+        finally:
+            # If the worker failed or processing was cancelled, stop the scripts still in flight
+            # instead of leaving them running on an activity that's being destroyed
+            for results_task in in_flight:
+                results_task.cancel()
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
 
     def recycle_offer(self, offer: OfferProposal) -> None:
         """This offer was already processed, but something happened and we should treat it as a fresh one.
@@ -746,9 +896,34 @@ class _Engine:
 
         We don't care which Job initiated recycling - it should be recycled by all unfinished Jobs.
         """
+        self.recycle_offers([offer])
+
+    def recycle_offers(self, offers: List[OfferProposal]) -> None:
+        """Recycle a number of offers at once, see :func:`recycle_offer`.
+
+        Each unfinished Job rescores the offers in a single batch.
+        """
         unfinished_jobs = (job for job in self._jobs if not job.finished.is_set())
         for job in unfinished_jobs:
-            asyncio.get_event_loop().create_task(job._handle_proposal(offer, ignore_draft=True))
+            asyncio.get_event_loop().create_task(job._recycle_offers(offers))
+
+    async def find_offers_for_job(self, job: "Job") -> None:
+        """Collect offer proposals for `job` until collecting fails or the call is cancelled.
+
+        Jobs with the same demand (apart from its expiration time) share a single market
+        subscription, which is deleted when the last of them stops collecting offers.
+        """
+        assert job._demand_builder is not None
+        key = demand_key(job._demand_builder)
+        shared = self._shared_subscriptions.get(key)
+        if shared is None:
+            shared = self._shared_subscriptions[key] = SharedSubscription(self._market_api)
+        try:
+            await shared.add_job(job)
+            await shared.wait()
+        finally:
+            if shared.remove_job(job) and self._shared_subscriptions.get(key) is shared:
+                del self._shared_subscriptions[key]
 
     def _get_job_by_id(self, job_id) -> "Job":
         try:
@@ -805,16 +980,29 @@ class Job:
 
         self.engine = engine
         self.offers_collected: int = 0
-        self.unscored_offers: asyncio.Queue[OfferProposal] = asyncio.Queue()
+        self.unscored_offers: ProposalIntake = ProposalIntake()
+        self.proposal_handlers: Optional[ProposalHandlerPool] = None
         self.proposals_confirmed: int = 0
         self.expiration_time: datetime = expiration_time
         self.payload: Payload = payload
 
-        self.agreements_pool = AgreementsPool(self.emit, self.engine.recycle_offer)
+        self.agreements_pool = AgreementsPool(
+            self.emit,
+            self.engine.recycle_offer,
+            offer_ttl=self.engine.offer_ttl,
+            score_half_life=self.engine.offer_score_half_life,
+            offers_recycler=self.engine.recycle_offers,
+            provider_stats=self.engine.provider_stats,
+            race_extra=self.engine.agreement_race_extra,
+        )
         self.finished = asyncio.Event()
 
         self._demand_builder: Optional[DemandBuilder] = None
 
+        #   Ids of the most recent counter-proposals sent by this job, used to tell which drafts
+        #   received on a shared subscription belong to this job
+        self._counter_proposal_ids: "OrderedDict[str, None]" = OrderedDict()
+
         #   Exception that ended the job
         self._exc_info = None
 
@@ -832,6 +1020,7 @@ class Job:
         self,
         proposal: OfferProposal,
         ignore_draft: bool = False,
+        score: Optional[float] = None,
     ) -> events.Event:
         """Handle a single `OfferProposal`.
 
@@ -841,22 +1030,26 @@ class Job:
 
         If `ignore_draft` is True, we either reject, or respond with a counter-proposal,
         but never pass the proposal to the agreements pool.
+
+        If `score` is given, the `proposal` was already scored (e.g. as a part of a batch)
+        and it's not passed to the market strategy again.
         """
 
         async def reject_proposal(reason: str) -> events.ProposalRejected:
             """Reject `proposal` due to given `reason`."""
-            await proposal.reject(reason)
+            await self._timed_market_call(proposal.reject(reason))
             return self.emit(events.ProposalRejected, proposal=proposal, reason=reason)
 
-        try:
-            score = await self.engine._strategy.score_offer(proposal)
-        except Exception:
-            logger.warning(
-                f"Strategy error: score_offer(proposal) failed when calling with proposal: %s",
-                proposal.id,
-                exc_info=True,
-            )
-            return await reject_proposal("Unknown error in score offer")
+        if score is None:
+            try:
+                score = await self.engine._strategy.score_offer(proposal)
+            except Exception:
+                logger.warning(
+                    f"Strategy error: score_offer(proposal) failed when calling with proposal: %s",
+                    proposal.id,
+                    exc_info=True,
+                )
+                return await reject_proposal("Unknown error in score offer")
 
         logger.debug(
             "Scored offer %s, provider: %s, strategy: %s, score: %f",
@@ -890,60 +1083,127 @@ class Job:
                 # reject proposal if there are no common payment platforms
                 return await reject_proposal("No common payment platform")
 
-            await proposal.respond(demand_builder.properties, demand_builder.constraints)
+            counter_proposal_id = await self._timed_market_call(
+                proposal.respond(demand_builder.properties, demand_builder.constraints)
+            )
+            self._counter_proposal_ids[counter_proposal_id] = None
+            if len(self._counter_proposal_ids) > MAX_TRACKED_COUNTER_PROPOSALS:
+                self._counter_proposal_ids.popitem(last=False)
             return self.emit(events.ProposalResponded, proposal=proposal)
 
         else:
             await self.agreements_pool.add_proposal(score, proposal)
             return self.emit(events.ProposalConfirmed, proposal=proposal)
 
-    async def _find_offers_for_subscription(
-        self,
-        subscription: Subscription,
-    ) -> None:
-        """Create a market subscription and repeatedly collect offer proposals for it."""
+    async def _receive_proposal(self, proposal: OfferProposal) -> None:
+        """Pass a proposal collected from the market to the proposal handlers."""
+        self.emit(events.ProposalReceived, proposal=proposal)
+        self.offers_collected += 1
+        # Wait until there's space in the intake, so that a slow negotiation holds off
+        # collecting further proposals
+        await self.unscored_offers.put(proposal)
 
-        try:
-            proposals = subscription.events()
-        except Exception as ex:
-            self.emit(events.CollectFailed, subscription=subscription, reason=str(ex))
-            raise
+    def _receive_proposal_nowait(self, proposal: OfferProposal) -> bool:
+        """Pass a proposal to the proposal handlers if there's space in the intake.
 
-        async for proposal in proposals:
-            self.emit(events.ProposalReceived, proposal=proposal)
-            self.offers_collected += 1
+        :return: False if the intake is full and the proposal was dropped
+        """
+        try:
             self.unscored_offers.put_nowait(proposal)
+        except asyncio.QueueFull:
+            return False
+        self.emit(events.ProposalReceived, proposal=proposal)
+        self.offers_collected += 1
+        return True
 
-    async def _handle_all_proposals(self) -> None:
-        max_number_of_tasks = 5
-        semaphore = asyncio.Semaphore(max_number_of_tasks)
+    def _claim_draft(self, proposal: OfferProposal) -> bool:
+        """Check if `proposal` is a response to one of this job's counter-proposals."""
+        prev_proposal_id = proposal.prev_proposal_id
+        if prev_proposal_id is not None and prev_proposal_id in self._counter_proposal_ids:
+            del self._counter_proposal_ids[prev_proposal_id]
+            return True
+        return False
 
-        while True:
-            proposal = await self.unscored_offers.get()
+    async def _score_proposals(self, proposals: List[OfferProposal]) -> List[Optional[float]]:
+        """Score a batch of `proposals` using the market strategy.
 
-            async def handler(proposal_):
-                """Wrap `_handle_proposal()` method with error handling."""
-                try:
-                    event = await self._handle_proposal(proposal_)
-                    assert isinstance(event, events.ProposalEvent)
-                    if isinstance(event, events.ProposalConfirmed):
-                        self.proposals_confirmed += 1
-                except CancelledError:
-                    raise
-                except Exception:
-                    with contextlib.suppress(Exception):
-                        self.emit(events.ProposalFailed, proposal=proposal_, exc_info=sys.exc_info())  # type: ignore
-                finally:
-                    semaphore.release()
+        If batch scoring fails, `None` is returned for every proposal,
+        so that they are scored (or rejected) one by one in `_handle_proposal()`.
+        """
+        try:
+            scores: List[Optional[float]] = list(
+                await self.engine._strategy.score_offers(proposals)
+            )
+            if len(scores) != len(proposals):
+                raise ValueError(f"Expected {len(proposals)} scores, got {len(scores)}")
+            return scores
+        except Exception:
+            logger.warning(
+                "Strategy error: score_offers(proposals) failed for a batch of %d proposals",
+                len(proposals),
+                exc_info=True,
+            )
+            return [None] * len(proposals)
+
+    async def _recycle_offers(self, offers: List[OfferProposal]) -> None:
+        """Score the recycled `offers` in a batch and return to the negotiations."""
+        scores = await self._score_proposals(offers)
+        results = await asyncio.gather(
+            *(
+                self._handle_proposal(offer, ignore_draft=True, score=score)
+                for offer, score in zip(offers, scores)
+            ),
+            return_exceptions=True,
+        )
+        for offer, result in zip(offers, results):
+            if isinstance(result, Exception):
+                logger.debug("Failed to recycle offer %s", offer.id, exc_info=result)
 
-            # Create a new handler task
-            await semaphore.acquire()
-            asyncio.get_event_loop().create_task(handler(proposal))
+    async def _timed_market_call(self, market_call: Awaitable[T]) -> T:
+        """Await `market_call`, reporting its round-trip time to the proposal handler pool."""
+        if self.proposal_handlers is None:
+            return await market_call
+        return await self.proposal_handlers.timed(market_call)
+
+    async def _handle_all_proposals(self) -> None:
+        self.proposal_handlers = ProposalHandlerPool(
+            self.unscored_offers,
+            self._score_proposals,
+            self._handle_scored_proposal,
+            max_handlers=self.engine.max_proposal_handlers,
+            on_limit_changed=self._proposal_handlers_adjusted,
+        )
+        await self.proposal_handlers.run()
+
+    def _proposal_handlers_adjusted(self) -> None:
+        assert self.proposal_handlers
+        self.emit(
+            events.ProposalHandlersAdjusted,
+            limit=self.proposal_handlers.limit,
+            queue_depth=self.proposal_handlers.queue_depth,
+            throughput=self.proposal_handlers.throughput,
+        )
+
+    async def _handle_scored_proposal(
+        self, proposal: OfferProposal, score: Optional[float]
+    ) -> None:
+        """Wrap `_handle_proposal()` method with error handling."""
+        try:
+            event = await self._handle_proposal(proposal, score=score)
+            assert isinstance(event, events.ProposalEvent)
+            if isinstance(event, events.ProposalConfirmed):
+                self.proposals_confirmed += 1
+        except CancelledError:
+            raise
+        except Exception:
+            with contextlib.suppress(Exception):
+                self.emit(events.ProposalFailed, proposal=proposal, exc_info=sys.exc_info())  # type: ignore
 
     async def find_offers(self) -> None:
         """Create demand subscription and process offers.
 
-        When the subscription expires, create a new one. And so on...
+        The subscription is shared with other jobs with the same demand and renewed
+        when it expires.
         """
         if self._demand_builder is None:
             self._demand_builder = await self.engine.create_demand_builder(
@@ -953,15 +1213,7 @@ class Job:
         offer_handler_task = asyncio.get_event_loop().create_task(self._handle_all_proposals())
 
         try:
-            while True:
-                try:
-                    subscription = await self._demand_builder.subscribe(self.engine._market_api)
-                    self.emit(events.SubscriptionCreated, subscription=subscription)
-                except Exception as ex:
-                    self.emit(events.SubscriptionFailed, reason=str(ex))
-                    raise
-                async with subscription:
-                    await self._find_offers_for_subscription(subscription)
+            await self.engine.find_offers_for_job(self)
         except (Exception, CancelledError):
             offer_handler_task.cancel()
             raise
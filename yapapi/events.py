@@ -106,6 +106,8 @@ Events inheritance tree
                         TaskFinished
                         TaskAccepted
                         TaskRejected
+                        TaskDeadlineMissed
+                        TaskFailed
                     ServiceEvent
                         ServiceStateChanged
                         ServiceFinished
@@ -408,6 +410,19 @@ class ProposalFailed(ProposalEvent):
     pass
 
 
+@attr.s(auto_attribs=True, repr=False)
+class ProposalHandlersAdjusted(JobEvent):
+    """The number of concurrently handled proposals was changed to :attr:`limit`
+
+    :attr:`queue_depth` is the number of proposals waiting to be handled and :attr:`throughput`
+    the number of proposals handled per second recently.
+    """
+
+    limit: int
+    queue_depth: int
+    throughput: float
+
+
 @attr.s(auto_attribs=True, repr=False)
 class NoProposalsConfirmed(JobEvent):
     """We didn't confirm any proposal for a period of :attr:`timeout`"""
@@ -533,6 +548,20 @@ class TaskRejected(TaskEvent):
     reason: Optional[str]
 
 
+@attr.s(auto_attribs=True, repr=False)
+class TaskDeadlineMissed(TaskEvent):
+    """:attr:`task` was accepted after its :attr:`deadline` passed"""
+
+    deadline: datetime
+
+
+@attr.s(auto_attribs=True, repr=False)
+class TaskFailed(TaskEvent):
+    """:attr:`task` was given up on after it had been retried :attr:`retries` times"""
+
+    retries: int
+
+
 @attr.s(auto_attribs=True, repr=False)
 class DownloadStarted(CommandEvent):
     command: "yapapi.script.command._ReceiveContent"
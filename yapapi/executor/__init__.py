@@ -1,12 +1,16 @@
 """An implementation of the new Golem's task executor."""
 import asyncio
 from asyncio import CancelledError
+import bisect
+import contextlib
 from datetime import datetime, timedelta, timezone
 import sys
 from typing import (
+    Any,
     AsyncIterator,
     Awaitable,
     Callable,
+    Dict,
     Iterable,
     List,
     Optional,
@@ -23,10 +27,15 @@ from yapapi.payload import Payload
 from yapapi.script import Script
 from yapapi.engine import _Engine, Job
 from yapapi.script.command import Deploy, Start
+from yapapi.warm_pool import WarmWorker
 import yapapi.utils
 
+from .autoscaling import AutoscalingPolicy, ExecutorLoad
+from .journal import TaskJournal
+from .result_cache import DiskResultCache, MemoryResultCache, ResultCache
 from .task import Task, TaskStatus
-from ._smartq import SmartQueue
+from ._reorder import ReorderBuffer
+from ._smartq import Consumer, DEFAULT_PREFETCH, Handle, SmartQueue
 
 CFG_INVOICE_TIMEOUT: Final[timedelta] = timedelta(minutes=5)
 "Time to receive invoice from provider after tasks ended."
@@ -39,6 +48,15 @@ logger = yapapi.utils.get_logger(__name__)
 
 DEFAULT_GET_OFFERS_TIMEOUT = timedelta(seconds=20)
 
+WORKER_STARTER_INTERVAL: Final[float] = 2.0
+"Maximum time (in seconds) between two consecutive checks whether a new worker can be started."
+
+MIN_COMPLETED_TASKS_FOR_SPECULATION: Final[int] = 10
+"Number of tasks that must be completed before stragglers are executed speculatively."
+
+DEFAULT_REORDER_WINDOW: Final[int] = 1000
+"Default maximum number of tasks in progress or waiting to be yielded in the ordered mode."
+
 
 D = TypeVar("D")  # Type var for task data
 R = TypeVar("R")  # Type var for task result
@@ -59,14 +77,78 @@ class Executor:
         implicit_init: bool,
         max_workers: int = 5,
         timeout: timedelta = DEFAULT_EXECUTOR_TIMEOUT,
+        autoscaling: Optional[AutoscalingPolicy] = None,
+        task_prefetch: int = DEFAULT_PREFETCH,
+        task_group_size: Optional[int] = None,
+        speculative_percentile: Optional[float] = None,
+        max_task_retries: Optional[int] = None,
+        task_retry_backoff: timedelta = timedelta(0),
+        journal: Optional[TaskJournal] = None,
+        result_cache: Optional[ResultCache] = None,
+        ordered: bool = False,
+        reorder_window: int = DEFAULT_REORDER_WINDOW,
     ):
+        """Initialize the `Executor`.
+
+        :param max_workers: maximum number of concurrent workers, ignored if `autoscaling` is given
+        :param autoscaling: optional policy adjusting the number of workers to the load,
+            between its `min_workers` and `max_workers`
+        :param task_prefetch: number of tasks taken from the input in advance, before any
+            worker requests them. Tasks are ordered by their priorities and deadlines only
+            within this window, along with the tasks to be retried
+        :param task_group_size: if given, the `worker` function receives lists of up to
+            `task_group_size` tasks instead of single tasks, so that it can compute a number
+            of tasks with a single script. Each task in a group is still accepted or rejected
+            (and retried) on its own
+        :param speculative_percentile: if given, enables speculative execution: once there are
+            no tasks waiting for a worker, the tasks that have been running for longer than this
+            percentile (between 0 and 1) of the running times of completed tasks are also given
+            to idle workers. The first accepted result is used, the other copies are cancelled
+        :param max_task_retries: optional number of times a task may be retried, after it's
+            rejected with `retry=True` or its worker fails. A task that fails once more is
+            dropped and a :class:`~yapapi.events.TaskFailed` event is emitted
+        :param task_retry_backoff: time for which a task is held back before its first retry,
+            doubled with each subsequent retry. Retried tasks are never given to a provider
+            that has already been assigned them
+        :param journal: optional :class:`TaskJournal` in which accepted tasks are recorded.
+            Tasks already recorded in it are not computed again, they're completed with
+            the recorded results instead
+        :param result_cache: optional :class:`ResultCache` in which the results of accepted
+            tasks are stored. Tasks whose results are found in it, under a key derived from
+            their data and this executor's payload, are accepted immediately
+        :param ordered: if True, completed tasks are yielded in the order in which they were
+            submitted, instead of the order of completion. Tasks that are dropped (rejected
+            without retrying or failed) are skipped
+        :param reorder_window: in the ordered mode, maximum number of tasks that are taken from
+            the input but not yet yielded. When it's reached, no new tasks are given to workers
+            until the earliest one is completed and yielded
+        """
+        if speculative_percentile is not None and not 0 <= speculative_percentile <= 1:
+            raise ValueError(
+                f"Expected speculative_percentile between 0 and 1, got {speculative_percentile}"
+            )
+        if task_group_size is not None and task_group_size < 1:
+            raise ValueError(f"Expected task_group_size >= 1, got {task_group_size}")
+        if reorder_window < 1:
+            raise ValueError(f"Expected reorder_window >= 1, got {reorder_window}")
+
         logger.debug("Creating Executor instance; parameters: %s", locals())
 
         self._engine = _engine
         self._payload = payload
         self._implicit_init = implicit_init
         self._timeout = timeout
-        self._max_workers = max_workers
+        self._autoscaling = autoscaling
+        self._task_prefetch = task_prefetch
+        self._task_group_size = task_group_size
+        self._speculative_percentile = speculative_percentile
+        self._max_task_retries = max_task_retries
+        self._task_retry_backoff = task_retry_backoff
+        self._journal = journal
+        self._result_cache = result_cache
+        self._ordered = ordered
+        self._reorder_window = reorder_window
+        self._max_workers = autoscaling.max_workers if autoscaling else max_workers
 
     @property
     def driver(self) -> str:
@@ -159,30 +241,142 @@ class Executor:
     ) -> AsyncGenerator[Task[D, R], None]:
 
         done_queue: asyncio.Queue[Task[D, R]] = asyncio.Queue()
+        reorder_buffer: Optional[ReorderBuffer[Task[D, R]]] = (
+            ReorderBuffer(done_queue.put_nowait, self._reorder_window) if self._ordered else None
+        )
+        # Running times (in seconds) of the accepted tasks, sorted
+        running_times: List[float] = []
+
+        def result_cache_key(task: Task[D, R]) -> Optional[str]:
+            """Return the key of `task` in the result cache, or None if it can't be computed."""
+            assert self._result_cache
+            try:
+                return self._result_cache.key(task.data, self._payload)
+            except Exception:
+                logger.warning(
+                    "Cannot compute the key of %s, not using the result cache for it",
+                    task,
+                    exc_info=True,
+                )
+                return None
 
         def on_task_done(task: Task[D, R], status: TaskStatus) -> None:
             """Callback run when `task` is accepted or rejected."""
             if status == TaskStatus.ACCEPTED:
+                # In the ordered mode, tasks are passed to `reorder_buffer` by `on_task_removed`
+                if not reorder_buffer:
+                    done_queue.put_nowait(task)
+                if self._autoscaling and task.running_time:
+                    self._autoscaling.observe_task(task.running_time)
+                if self._speculative_percentile is not None and task.running_time:
+                    bisect.insort(running_times, task.running_time.total_seconds())
+                if self._journal:
+                    self._journal.record(task)
+                if self._result_cache:
+                    key = result_cache_key(task)
+                    if key is not None:
+                        self._result_cache.put(key, task.result)
+
+        def is_straggler(task: Task[D, R]) -> bool:
+            """Check if `task` is running for longer than most of the completed tasks."""
+            assert self._speculative_percentile is not None
+            if len(running_times) < MIN_COMPLETED_TASKS_FOR_SPECULATION:
+                return False
+            index = min(
+                int(len(running_times) * self._speculative_percentile), len(running_times) - 1
+            )
+            running_time = task.running_time
+            return running_time is not None and running_time.total_seconds() > running_times[index]
+
+        def completed_earlier(task: Task[D, R]) -> bool:
+            """Complete `task` with a result found in the journal or in the result cache, if any.
+
+            Such tasks are accepted immediately, without entering the work queue.
+            """
+            found = self._journal.lookup(task.data) if self._journal else None
+            if found is None and self._result_cache:
+                key = result_cache_key(task)
+                found = self._result_cache.get(key) if key is not None else None
+                if found is not None:
+                    logger.debug("Result of %s found in cache", task)
+            if found is None:
+                return False
+            task._status = TaskStatus.ACCEPTED
+            task._result = found[0]
+            if reorder_buffer:
+                reorder_buffer.finish(task)
+            else:
                 done_queue.put_nowait(task)
+            return True
+
+        async def admit_task(task: Task[D, R]) -> bool:
+            """Prepare `task` for computing and check if it needs to be put in the work queue."""
+            if reorder_buffer:
+                await reorder_buffer.admit(task)
+            if completed_earlier(task):
+                return False
+            task._add_callback(on_task_done)
+            return True
 
         async def input_tasks() -> AsyncIterator[Task[D, R]]:
             if isinstance(data, AsyncIterator):
                 async for task in data:
-                    task._add_callback(on_task_done)
-                    yield task
+                    if await admit_task(task):
+                        yield task
             else:
                 for task in data:
-                    task._add_callback(on_task_done)
-                    yield task
+                    if await admit_task(task):
+                        yield task
+
+        # Buffer at least a whole group of tasks, so that workers don't get partial groups
+        # only because the input is consumed one task at a time
+        work_queue = SmartQueue(
+            input_tasks(),
+            prefetch=max(self._task_prefetch, self._task_group_size or 1),
+            key=lambda task: task._queue_key(),
+            max_retries=self._max_task_retries,
+            retry_backoff=self._task_retry_backoff.total_seconds(),
+        )
+        consumers: Set[Consumer[Task[D, R]]] = set()
 
-        work_queue = SmartQueue(input_tasks())
+        # Tasks processing the scripts of the running workers, and the workers to be stopped
+        # because they compute speculative copies of tasks that were completed elsewhere
+        processing_tasks: Dict[Consumer[Task[D, R]], asyncio.Task] = {}
+        superseded_workers: Set[Consumer[Task[D, R]]] = set()
 
-        async def run_worker(work_context: WorkContext) -> None:
-            """Run an instance of `worker` for the particular work context."""
+        def on_copy_cancelled(handle: Handle[Task[D, R]]) -> None:
+            processing = processing_tasks.get(handle.consumer)
+            if processing and not processing.done():
+                superseded_workers.add(handle.consumer)
+                processing.cancel()
+
+        work_queue.add_cancelled_copies_listener(on_copy_cancelled)
+
+        def on_task_failed(handle: Handle[Task[D, R]]) -> None:
+            handle.data.emit(events.TaskFailed, retries=handle.retries - 1)
+
+        work_queue.add_failed_items_listener(on_task_failed)
+
+        def on_task_removed(handle: Handle[Task[D, R]]) -> None:
+            """Pass a task that left the work queue, accepted or dropped, to `reorder_buffer`."""
+            assert reorder_buffer
+            task = handle.data
+            reorder_buffer.finish(task, deliver=task._status == TaskStatus.ACCEPTED)
+
+        if reorder_buffer:
+            work_queue.add_done_items_listener(on_task_removed)
+            work_queue.add_failed_items_listener(on_task_removed)
+
+        async def run_worker(work_context: WorkContext, deployed: bool = False) -> None:
+            """Run an instance of `worker` for the particular work context.
+
+            If `deployed` is True, the payload is already deployed and started on the activity.
+            """
             agreement = work_context._agreement
             activity = work_context._activity
 
-            with work_queue.new_consumer() as consumer:
+            with work_queue.new_consumer(owner=work_context.provider_id) as consumer:
+                consumers.add(consumer)
                 try:
 
                     # the `task_generator` here is passed as the `tasks` argument to the user's
@@ -214,47 +408,157 @@ class Executor:
 
                             task.emit(events.TaskFinished)
 
-                    task_gen = task_generator()
+                    async def task_group_generator() -> AsyncGenerator[List[Task[D, R]], None]:
+                        assert self._task_group_size
+                        while True:
+                            try:
+                                handles = await consumer.next_batch(self._task_group_size)
+                            except StopAsyncIteration:
+                                return
+                            tasks = [
+                                Task.for_handle(handle, work_queue, work_context.emit)
+                                for handle in handles
+                            ]
+                            for task in tasks:
+                                task.emit(events.TaskStarted)
+                            try:
+                                yield tasks
+                            except GeneratorExit:
+                                consumer.finish()
+
+                            for task in tasks:
+                                task.emit(events.TaskFinished)
+
+                    task_gen: AsyncGenerator[Any, None] = (
+                        task_group_generator() if self._task_group_size else task_generator()
+                    )
                     batch_generator = worker(work_context, task_gen)
 
-                    if self._implicit_init:
+                    if self._implicit_init and not deployed:
                         await self._perform_implicit_init(
                             work_context, job.id, agreement.id, activity
                         )
 
-                    try:
-                        await self._engine.process_batches(
+                    processing = asyncio.get_event_loop().create_task(
+                        self._engine.process_batches(
                             job.id, agreement.id, activity, batch_generator
                         )
+                    )
+                    processing_tasks[consumer] = processing
+                    try:
+                        await processing
                     except StopAsyncIteration:
                         pass
+                    except CancelledError:
+                        if consumer not in superseded_workers:
+                            raise
+                        logger.debug(
+                            "Stopping worker computing an already completed task", job_id=job.id
+                        )
+                        # Other tasks of the worker's group were stopped through no fault of
+                        # the provider, so they are rescheduled without counting a retry
+                        await work_queue.reschedule_all(consumer, retry=False)
+                    finally:
+                        processing_tasks.pop(consumer, None)
+                        superseded_workers.discard(consumer)
                     work_context.emit(events.WorkerFinished)
                 except Exception as e:
                     work_context.emit(events.WorkerFinished, exc_info=sys.exc_info())  # type: ignore
                     await task_gen.athrow(type(e), e)
                     raise
                 finally:
+                    consumers.discard(consumer)
                     await self._engine.accept_payments_for_agreement(job.id, agreement.id)
                     if consumer.finished:
                         raise StopAsyncIteration()
 
+        # Set whenever a worker could be started: when a new task is available, a worker finishes
+        # or a new proposal is confirmed
+        worker_starter_wakeup = asyncio.Event()
+        starting_workers: Set[asyncio.Task] = set()
+
+        def wake_worker_starter(*_args) -> None:
+            worker_starter_wakeup.set()
+
+        work_queue.add_new_items_listener(wake_worker_starter)
+        job.agreements_pool.add_proposal_listener(wake_worker_starter)
+
+        async def run_warm_worker(warm_worker: WarmWorker) -> None:
+            """Run an instance of `worker` with an activity claimed from a warm pool."""
+            job.emit(events.WorkerStarted, agreement=warm_worker.agreement)
+            work_context = WorkContext(
+                warm_worker.activity,
+                warm_worker.agreement,
+                self._engine.storage_manager,
+                emitter=job.emit,
+            )
+            try:
+                await run_worker(work_context, deployed=True)
+            except BaseException:
+                warm_worker.release(reuse=False)
+                raise
+            warm_worker.release()
+
+        async def start_worker() -> None:
+            new_task = None
+            start_time = datetime.now()
+            try:
+                # With implicit init disabled, `worker` deploys and starts the payload itself
+                warm_worker = (
+                    self._engine.claim_warm_worker(self._payload) if self._implicit_init else None
+                )
+                if warm_worker is not None:
+                    new_task = loop.create_task(run_warm_worker(warm_worker))
+                else:
+                    new_task = await self._engine.start_worker(job, run_worker)
+                if new_task is None:
+                    return
+                if self._autoscaling:
+                    self._autoscaling.observe_agreement(datetime.now() - start_time)
+                workers.add(new_task)
+                new_task.add_done_callback(wake_worker_starter)
+            except CancelledError:
+                raise
+            except Exception:
+                if new_task:
+                    new_task.cancel()
+                logger.debug("There was a problem during use_agreement", exc_info=True)
+
         async def worker_starter() -> None:
-            while True:
-                await asyncio.sleep(2)
-                await job.agreements_pool.cycle()
-                if len(workers) < self._max_workers and work_queue.has_unassigned_items():
-                    new_task = None
-                    try:
-                        new_task = await self._engine.start_worker(job, run_worker)
-                        if new_task is None:
-                            continue
-                        workers.add(new_task)
-                    except CancelledError:
-                        raise
-                    except Exception:
-                        if new_task:
-                            new_task.cancel()
-                        logger.debug("There was a problem during use_agreement", exc_info=True)
+            try:
+                while True:
+                    # The agreements pool needs to be cycled regularly even with no wakeups
+                    with contextlib.suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(
+                            worker_starter_wakeup.wait(), timeout=WORKER_STARTER_INTERVAL
+                        )
+                    worker_starter_wakeup.clear()
+                    await job.agreements_pool.cycle()
+
+                    if self._speculative_percentile is not None:
+                        await work_queue.duplicate_stragglers(is_straggler)
+
+                    running = sum(1 for worker in workers if not worker.done())
+                    desired = self._desired_workers(
+                        work_queue, consumers, running + len(starting_workers)
+                    )
+                    if work_queue.has_unassigned_items():
+                        for _ in range(desired - running - len(starting_workers)):
+                            starter = loop.create_task(start_worker())
+                            starting_workers.add(starter)
+                            starter.add_done_callback(starting_workers.discard)
+
+                    # Stop idle workers above the desired number, their agreements are released
+                    # by the agreements pool once the worker tasks are done
+                    idle_consumers = [c for c in consumers if c.waiting and not c.finished]
+                    if running > desired and idle_consumers:
+                        to_stop = idle_consumers[: running - desired]
+                        logger.debug("Stopping %d idle workers", len(to_stop), job_id=job.id)
+                        for consumer in to_stop:
+                            await work_queue.release_consumer(consumer)
+            finally:
+                for starter in list(starting_workers):
+                    starter.cancel()
 
         loop = asyncio.get_event_loop()
         find_offers_task = loop.create_task(job.find_offers())
@@ -311,6 +615,8 @@ class Executor:
                     yield get_done_task.result()
                     assert get_done_task not in services
                     get_done_task = None
+                    if reorder_buffer:
+                        reorder_buffer.release()
 
         except (Exception, CancelledError, KeyboardInterrupt) as e:
             #   TODO: why do we catch KeyboardInterrupt? How can we get one here?
@@ -325,6 +631,8 @@ class Executor:
         finally:
 
             await work_queue.close()
+            if self._journal:
+                self._journal.sync()
 
             # Importing this at the beginning would cause circular dependencies
             from ..log import pluralize
@@ -376,6 +684,20 @@ class Executor:
                     "Got error when waiting for services to finish", exc_info=True, job_id=job.id
                 )
 
+    def _desired_workers(
+        self, work_queue: SmartQueue, consumers: Set[Consumer], workers: int
+    ) -> int:
+        """Return the number of workers that should be running, given the current load."""
+        if self._autoscaling is None:
+            return self._max_workers
+        load = ExecutorLoad(
+            workers=workers,
+            idle_workers=sum(1 for consumer in consumers if consumer.waiting),
+            backlog=work_queue.num_unassigned_items(),
+            in_progress=work_queue.num_in_progress(),
+        )
+        return self._autoscaling.desired_workers(load)
+
     async def _perform_implicit_init(self, ctx, job_id, agreement_id, activity):
         async def implicit_init():
             script = ctx.new_script()
@@ -0,0 +1,72 @@
+""" YAPAPI internal module. This is not a part of the public API. It can change at any time.
+
+
+"""
+import asyncio
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+Item = TypeVar("Item")
+
+
+class ReorderBuffer(Generic[Item]):
+    """
+    Delivers finished items in the order in which they were admitted.
+
+    At most `window` items may be admitted and not yet released, where an item is released
+    when the receiver of the delivered item is done with it, or when the item finishes
+    without being delivered. Admitting further items waits until earlier ones are released,
+    so the number of items held by the buffer (and by the receiver) stays bounded.
+    """
+
+    def __init__(self, deliver: Callable[[Item], None], window: int):
+        """
+        :param deliver: function called with the finished items, in the order of admission
+        :param window: maximum number of admitted items that are not released yet
+        """
+        if window < 1:
+            raise ValueError(f"Expected window >= 1, got {window}")
+        self._deliver = deliver
+        self._window = window
+
+        self._sequence: Dict[Item, int] = {}
+        self._next_sequence = 0
+        # Finished items waiting for the earlier ones to finish, `None` for the dropped ones
+        self._finished: Dict[int, Optional[Item]] = {}
+        self._next_to_deliver = 0
+        self._released = 0
+        self._window_space = asyncio.Event()
+
+    def __len__(self) -> int:
+        """Return the number of admitted items that are not released yet."""
+        return self._next_sequence - self._released
+
+    async def admit(self, item: Item) -> None:
+        """Wait until there's space in the window and assign the next sequence number to `item`."""
+        while len(self) >= self._window:
+            self._window_space.clear()
+            await self._window_space.wait()
+        self._sequence[item] = self._next_sequence
+        self._next_sequence += 1
+
+    def finish(self, item: Item, deliver: bool = True) -> None:
+        """Mark an admitted `item` as finished.
+
+        If `deliver` is False, the item is dropped: it's not delivered and it's released
+        as soon as the earlier items are delivered.
+        """
+        sequence = self._sequence.pop(item, None)
+        if sequence is None:
+            return
+        self._finished[sequence] = item if deliver else None
+        while self._next_to_deliver in self._finished:
+            finished = self._finished.pop(self._next_to_deliver)
+            self._next_to_deliver += 1
+            if finished is None:
+                self.release()
+            else:
+                self._deliver(finished)
+
+    def release(self) -> None:
+        """Release a delivered item, making space for admitting another one."""
+        self._released += 1
+        self._window_space.set()
@@ -0,0 +1,33 @@
+""" YAPAPI internal module. This is not a part of the public API. It can change at any time.
+
+Default serialization of task keys and results, shared by the task journal and result caches.
+"""
+import json
+import pickle
+from typing import Any
+
+
+def default_task_key(data: Any) -> bytes:
+    """Serialize a task's data to JSON with sorted keys, so that equal data gives equal keys.
+
+    Raises `TypeError` for data that can't be serialized to JSON, as any other representation
+    (e.g. `repr`) could differ between runs for equal data.
+    """
+    try:
+        encoded = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError) as exc:
+        raise TypeError(
+            f"Cannot serialize task data of type {type(data).__name__} to JSON, "
+            "pass a `task_key` function identifying the tasks instead"
+        ) from exc
+    return encoded.encode("utf-8")
+
+
+def encode_result(result: Any) -> bytes:
+    """Serialize a task's result with pickle, so that it can be restored exactly."""
+    return pickle.dumps(result)
+
+
+def decode_result(encoded: bytes) -> Any:
+    """Deserialize a result serialized by `encode_result`."""
+    return pickle.loads(encoded)
@@ -4,8 +4,14 @@
 """
 
 from asyncio.locks import Lock, Condition
+from collections import OrderedDict
 from types import TracebackType
 from typing import (
+    Any,
+    Callable,
+    Collection,
+    FrozenSet,
+    List,
     TypeVar,
     Generic,
     AsyncIterator,
@@ -14,140 +20,544 @@ from typing import (
     ContextManager,
     Type,
     Dict,
+    Hashable,
+    Tuple,
 )
-from typing_extensions import AsyncIterable
+from typing_extensions import AsyncIterable, Final
 import asyncio
+import heapq
+import itertools
 import logging
 
 
 _logger = logging.getLogger("yapapi.executor")
 Item = TypeVar("Item")
 
+DEFAULT_PREFETCH: Final[int] = 1
+"Default number of incoming items fetched in advance by a `SmartQueue`."
+
 
 class Handle(Generic[Item]):
     """
     Handle of the queue item, iow, binding between a queue item and a specific consumer.
 
-    Additionally it keeps track of the previously used consumers of the given item
-    to prevent them from being assigned to this item again.
-    """
+    Additionally it keeps track of the previously used consumers of the given item,
+    to prevent them from being assigned to this item again, and of the owners of those
+    consumers (e.g. providers), which are assigned this item again only if no consumer
+    with another owner can process it.
 
-    __slots__ = ("_data", "_prev_consumers", "_consumer")
+    An item may have more than one handle if it's executed speculatively, see
+    :func:`SmartQueue.duplicate_stragglers`. All handles of such an item share
+    the same set of copies.
+    """
 
-    def __init__(self, data: Item, *, consumer: Optional["Consumer[Item]"] = None):
+    __slots__ = (
+        "_data",
+        "_prev_consumers",
+        "_prev_owners",
+        "_consumer",
+        "_copies",
+        "_speculative",
+        "_retries",
+    )
+
+    def __init__(
+        self,
+        data: Item,
+        *,
+        consumer: Optional["Consumer[Item]"] = None,
+        speculative: bool = False,
+    ):
         self._data = data
         self._prev_consumers: Set["Consumer[Item]"] = set()
+        self._prev_owners: Set[Hashable] = set()
+        self._consumer: Optional["Consumer[Item]"] = None
         if consumer is not None:
-            self._prev_consumers.add(consumer)
+            self.assign_consumer(consumer)
 
-        self._consumer = consumer
+        self._copies: Optional[Set["Handle[Item]"]] = None
+        self._speculative = speculative
+        self._retries = 0
+
+    @property
+    def speculative(self) -> bool:
+        """True if this handle is a speculative copy of an item that's already in progress."""
+        return self._speculative
 
     @property
     def consumer(self):
         return self._consumer
 
+    @property
+    def retries(self) -> int:
+        """Number of times the item was rescheduled after it had been assigned to a consumer."""
+        return self._retries
+
     def assign_consumer(self, consumer: "Consumer[Item]") -> None:
         self._prev_consumers.add(consumer)
+        if consumer.owner is not None:
+            self._prev_owners.add(consumer.owner)
         self._consumer = consumer
 
+    def _excludes(self, consumer: "Consumer[Item]") -> bool:
+        """Check if `consumer` or its owner has already been assigned this item."""
+        return consumer in self._prev_consumers or (
+            consumer.owner is not None and consumer.owner in self._prev_owners
+        )
+
     @property
     def data(self) -> Item:
         return self._data
 
 
+def _no_key(_item: Any) -> int:
+    return 0
+
+
+# Previous consumers and previous owners of the items in a group of rescheduled items
+_GroupId = Tuple[FrozenSet["Consumer"], FrozenSet[Hashable]]
+
+
+def _excluded_by(group_id: _GroupId, consumer: "Consumer") -> bool:
+    """Check if `consumer` or its owner has already been assigned the items in a group."""
+    prev_consumers, prev_owners = group_id
+    return consumer in prev_consumers or (
+        consumer.owner is not None and consumer.owner in prev_owners
+    )
+
+
+class _RescheduledItems(Generic[Item]):
+    """
+    Handles of the items scheduled for reassignment, grouped by their previous consumers.
+
+    Items rescheduled at the same time (e.g. when a consumer fails) usually have the same
+    previous consumers and owners, so there are few groups and a consumer finds an item it hasn't
+    processed before by checking each group rather than each item.
+    Within a group, the items are kept in a heap ordered by their sort key and then
+    by the order in which they were rescheduled.
+    """
+
+    def __init__(self, key: Callable[[Item], Any] = _no_key):
+        self._key = key
+        self._groups: Dict[_GroupId, List[Tuple[Any, int, Handle[Item]]]] = {}
+        self._size = 0
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, handle: Handle[Item]) -> None:
+        group_id = (frozenset(handle._prev_consumers), frozenset(handle._prev_owners))
+        group = self._groups.setdefault(group_id, [])
+        heapq.heappush(group, (self._key(handle.data), next(self._counter), handle))
+        self._size += 1
+
+    def peek_for(
+        self, consumer: "Consumer[Item]", live_consumers: Collection["Consumer[Item]"] = ()
+    ) -> Optional[Tuple[Any, _GroupId]]:
+        """Find the first item that hasn't been assigned to `consumer` before.
+
+        An item that has been assigned to another consumer with the same owner is skipped
+        only if any of the unfinished `live_consumers` could process it instead.
+
+        :return: the item's sort key and the group from which it can be taken with `pop`,
+            or `None` if there's no such item
+        """
+        best: Optional[Tuple[Any, int]] = None
+        best_group: Optional[_GroupId] = None
+        for group_id, group in self._groups.items():
+            prev_consumers, prev_owners = group_id
+            if consumer in prev_consumers:
+                continue
+            if (
+                consumer.owner is not None
+                and consumer.owner in prev_owners
+                and any(
+                    not other.finished and not _excluded_by(group_id, other)
+                    for other in live_consumers
+                )
+            ):
+                continue
+            if best is None or group[0][:2] < best:
+                best = group[0][:2]
+                best_group = group_id
+        if best is None or best_group is None:
+            return None
+        return best[0], best_group
+
+    def pop(self, group_id: _GroupId) -> Handle[Item]:
+        group = self._groups[group_id]
+        _key, _, handle = heapq.heappop(group)
+        if not group:
+            del self._groups[group_id]
+        self._size -= 1
+        return handle
+
+    def pop_for(
+        self, consumer: "Consumer[Item]", live_consumers: Collection["Consumer[Item]"] = ()
+    ) -> Optional[Handle[Item]]:
+        """Remove and return the first item that hasn't been assigned to `consumer` before."""
+        found = self.peek_for(consumer, live_consumers)
+        return self.pop(found[1]) if found else None
+
+
 class SmartQueue(Generic[Item]):
-    def __init__(self, items: AsyncIterator[Item]):
+    def __init__(
+        self,
+        items: AsyncIterator[Item],
+        prefetch: int = DEFAULT_PREFETCH,
+        key: Optional[Callable[[Item], Any]] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff: float = 0.0,
+    ):
         """
         :param items: the items to be iterated over
+        :param prefetch: maximum number of incoming items fetched before they're requested
+            by consumers. Higher values hide the latency of slow `items` iterators
+        :param key: optional function returning the sort key of an item. Of the items available
+            (the fetched ones and the rescheduled ones), the item with the lowest key is served
+            first. Items with equal keys are served in order, rescheduled items first.
+            Note that only the `prefetch` incoming items are ordered, not the whole input
+        :param max_retries: optional number of times an item may be rescheduled. An item
+            rescheduled once more is removed from the queue and passed to the failed items
+            listeners
+        :param retry_backoff: time (in seconds) for which an item rescheduled for the first time
+            is held back before it's available again. The time doubles with each retry
         """
+        if prefetch < 1:
+            raise ValueError(f"Expected prefetch >= 1, got {prefetch}")
+
+        self._key: Callable[[Item], Any] = key or _no_key
+        self._prefetch = prefetch
 
-        self._buffer: "asyncio.Queue[Item]" = asyncio.Queue(maxsize=1)
+        """The fetched items, in a heap ordered by the sort key and the order of arrival"""
+        self._buffer: List[Tuple[Any, int, Item]] = []
+        self._buffer_counter = itertools.count()
+        self._buffer_space = asyncio.Event()
         self._incoming_finished = False
         self._buffer_task: Optional[asyncio.Task] = asyncio.get_event_loop().create_task(
             self._fill_buffer(items)
         )
 
         """The items scheduled for reassignment to another consumer"""
-        self._rescheduled_items: Set[Handle[Item]] = set()
+        self._rescheduled_items: _RescheduledItems[Item] = _RescheduledItems(self._key)
+
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+
+        """The rescheduled items held back until their retry backoff elapses"""
+        self._backed_off: Dict[Handle[Item], asyncio.TimerHandle] = {}
 
-        """The items currently assigned to consumers"""
-        self._in_progress: Set[Handle[Item]] = set()
+        """The items currently assigned to consumers, in the order of assignment"""
+        self._in_progress: "OrderedDict[Handle[Item], None]" = OrderedDict()
+
+        """The consumers in use, i.e. entered and not exited yet"""
+        self._consumers: Set["Consumer[Item]"] = set()
 
         # Synchronization primitives
         self._lock = Lock()
-        self._new_items = Condition(lock=self._lock)
         self._eof = Condition(lock=self._lock)
 
+        """Consumers waiting for an item, in the order in which they started waiting.
+
+        Instead of waking up all consumers whenever an item becomes available, the item is
+        handed over to the first waiting consumer that hasn't processed it before.
+        A waiter's future is resolved with the item's handle or with `None`, the latter
+        meaning that the consumer should check if the queue or the consumer is finished.
+        """
+        self._waiters: Dict["Consumer[Item]", "asyncio.Future[Optional[Handle[Item]]]"] = {}
+
+        self._new_items_listeners: List[Callable[[], None]] = []
+        self._cancelled_copies_listeners: List[Callable[[Handle[Item]], None]] = []
+        self._failed_items_listeners: List[Callable[[Handle[Item]], None]] = []
+        self._done_items_listeners: List[Callable[[Handle[Item]], None]] = []
+
     async def _fill_buffer(self, incoming: AsyncIterator[Item]):
         try:
             async for item in incoming:
-                await self._buffer.put(item)
+                while len(self._buffer) >= self._prefetch:
+                    self._buffer_space.clear()
+                    await self._buffer_space.wait()
+                heapq.heappush(self._buffer, (self._key(item), next(self._buffer_counter), item))
                 async with self._lock:
-                    self._new_items.notify_all()
+                    self._dispatch_items()
+                self._call_new_items_listeners()
             self._incoming_finished = True
             async with self._lock:
                 self._eof.notify_all()
-                self._new_items.notify_all()
+                self._dispatch_items()
         except asyncio.CancelledError:
             pass
 
     async def close(self):
+        for timer in self._backed_off.values():
+            timer.cancel()
+        self._backed_off.clear()
         if self._buffer_task:
             self._buffer_task.cancel()
             await self._buffer_task
             self._buffer_task = None
 
+    def add_new_items_listener(self, listener: Callable[[], None]) -> None:
+        """Register a callable to be called whenever a new or rescheduled item becomes available."""
+        self._new_items_listeners.append(listener)
+
+    def _call_new_items_listeners(self) -> None:
+        for listener in self._new_items_listeners:
+            listener()
+
     def finished(self):
         return (
-            not self.has_unassigned_items() and not (self._in_progress) and self._incoming_finished
+            not self.has_unassigned_items()
+            and not (self._in_progress)
+            and not self._backed_off
+            and self._incoming_finished
         )
 
     def has_unassigned_items(self) -> bool:
         """Check if this queue has a new or rescheduled item immediately available."""
-        return bool(self._rescheduled_items) or bool(self._buffer.qsize())
+        return bool(self._rescheduled_items) or bool(self._buffer)
 
-    def new_consumer(self) -> "Consumer[Item]":
-        return Consumer(self)
+    def num_unassigned_items(self) -> int:
+        """Return the number of new or rescheduled items immediately available."""
+        return len(self._rescheduled_items) + len(self._buffer)
 
-    def __find_rescheduled_item(self, consumer: "Consumer[Item]") -> Optional[Handle[Item]]:
-        return next(
-            (
-                handle
-                for handle in self._rescheduled_items
-                if consumer not in handle._prev_consumers
-            ),
-            None,
-        )
+    def num_in_progress(self) -> int:
+        """Return the number of items currently assigned to consumers."""
+        return len(self._in_progress)
+
+    def new_consumer(self, owner: Optional[Hashable] = None) -> "Consumer[Item]":
+        """Create a new consumer of this queue.
+
+        :param owner: optional key (e.g. a provider id) shared by the consumers that should not
+            be assigned the items that one of them has already been assigned, unless no consumer
+            with another owner can process such an item
+        """
+        return Consumer(self, owner)
+
+    def _take_item(self, consumer: "Consumer[Item]") -> Optional[Handle[Item]]:
+        """Assign a rescheduled or a new item to `consumer`, if there's one it can process."""
+
+        rescheduled = self._rescheduled_items.peek_for(consumer, self._consumers)
+        if rescheduled and (not self._buffer or rescheduled[0] <= self._buffer[0][0]):
+            handle = self._rescheduled_items.pop(rescheduled[1])
+            handle.assign_consumer(consumer)
+        elif self._buffer:
+            _key, _, item = heapq.heappop(self._buffer)
+            self._buffer_space.set()
+            handle = Handle(item, consumer=consumer)
+        else:
+            return None
+        self._in_progress[handle] = None
+        return handle
+
+    def _dispatch_items(self) -> None:
+        """Hand over the available items to the waiting consumers.
+
+        Once the queue is finished, wake up all waiting consumers so that they can stop.
+        """
+
+        served = []
+        for consumer, waiter in self._waiters.items():
+            if not self.has_unassigned_items():
+                break
+            if waiter.done():
+                continue
+            handle = self._take_item(consumer)
+            if handle:
+                waiter.set_result(handle)
+                served.append(consumer)
+        for consumer in served:
+            del self._waiters[consumer]
+
+        if self.finished():
+            self._wake_waiters(list(self._waiters))
+
+    def _wake_waiters(self, consumers: List["Consumer[Item]"]) -> None:
+        for consumer in consumers:
+            waiter = self._waiters.pop(consumer, None)
+            if waiter and not waiter.done():
+                waiter.set_result(None)
 
     async def get(self, consumer: "Consumer[Item]") -> Handle[Item]:
         """Get a handle to the next item to be processed (either a new one or rescheduled)."""
-        async with self._lock:
-            while not self.finished():
-
-                handle = self.__find_rescheduled_item(consumer)
+        while True:
+            async with self._lock:
+                if self.finished() or consumer.finished:
+                    break
+                handle = self._take_item(consumer)
                 if handle:
-                    self._rescheduled_items.remove(handle)
-                    self._in_progress.add(handle)
-                    handle.assign_consumer(consumer)
                     return handle
+                waiter: "asyncio.Future[Optional[Handle[Item]]]" = (
+                    asyncio.get_event_loop().create_future()
+                )
+                self._waiters[consumer] = waiter
+
+            try:
+                handle = await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._return_item(waiter.result(), consumer)
+                raise
+            finally:
+                if self._waiters.get(consumer) is waiter:
+                    del self._waiters[consumer]
+            if handle:
+                return handle
+        raise StopAsyncIteration
 
-                if self._buffer.qsize():
-                    next_elem = await self._buffer.get()
-                    handle = Handle(next_elem, consumer=consumer)
-                    self._in_progress.add(handle)
-                    return handle
+    async def get_batch(self, consumer: "Consumer[Item]", max_items: int) -> List[Handle[Item]]:
+        """Get handles to up to `max_items` items to be processed.
 
-                await self._new_items.wait()
-            self._new_items.notify_all()
-        raise StopAsyncIteration
+        Waits until at least one item is available, then adds the items that are immediately
+        available, without waiting for more. Each item is assigned to `consumer` separately,
+        so it can be marked as done or rescheduled on its own.
+        """
+        handles = [await self.get(consumer)]
+        async with self._lock:
+            while len(handles) < max_items and not consumer.finished:
+                handle = self._take_item(consumer)
+                if handle is None:
+                    break
+                handles.append(handle)
+        return handles
+
+    def _return_item(self, handle: Optional[Handle[Item]], consumer: "Consumer[Item]") -> None:
+        """Put back an item handed over to a consumer that stopped waiting for it."""
+        if handle is None:
+            return
+        self._forget_consumer(handle, consumer)
+        handle._consumer = None
+        self._in_progress.pop(handle, None)
+        self._release(handle, retry=False)
+        self._dispatch_items()
+
+    @staticmethod
+    def _forget_consumer(handle: Handle[Item], consumer: "Consumer[Item]") -> None:
+        """Stop avoiding `consumer` and its owner when reassigning the item."""
+        handle._prev_consumers.discard(consumer)
+        if consumer.owner is not None and not any(
+            prev.owner == consumer.owner for prev in handle._prev_consumers
+        ):
+            handle._prev_owners.discard(consumer.owner)
+
+    def _other_copies_in_progress(self, handle: Handle[Item]) -> List[Handle[Item]]:
+        if not handle._copies:
+            return []
+        return [copy for copy in handle._copies if copy is not handle and copy in self._in_progress]
+
+    def _release(self, handle: Handle[Item], retry: bool = True) -> None:
+        """Schedule the item for reassignment, unless another copy of it is still in progress.
+
+        If `retry` is True, the reassignment counts against the item's retries and is delayed
+        by the retry backoff.
+        """
+        if self._other_copies_in_progress(handle):
+            return
+        if not retry:
+            self._rescheduled_items.add(handle)
+            return
+
+        handle._retries += 1
+        if self._max_retries is not None and handle._retries > self._max_retries:
+            _logger.debug("Item %s failed after %d retries", handle.data, self._max_retries)
+            self._eof.notify_all()
+            for listener in self._failed_items_listeners:
+                listener(handle)
+            return
+
+        backoff = self._retry_backoff * 2 ** (handle._retries - 1)
+        if backoff > 0:
+            self._backed_off[handle] = asyncio.get_event_loop().call_later(
+                backoff, self._end_backoff, handle
+            )
+        else:
+            self._rescheduled_items.add(handle)
+
+    def _end_backoff(self, handle: Handle[Item]) -> None:
+        if self._backed_off.pop(handle, None) is None:
+            return
+        self._rescheduled_items.add(handle)
+        self._dispatch_items()
+        self._call_new_items_listeners()
+
+    def add_done_items_listener(self, listener: Callable[[Handle[Item]], None]) -> None:
+        """Register a callable to be called with each handle marked as done."""
+        self._done_items_listeners.append(listener)
+
+    def add_failed_items_listener(self, listener: Callable[[Handle[Item]], None]) -> None:
+        """Register a callable to be called with each item removed after exceeding `max_retries`."""
+        self._failed_items_listeners.append(listener)
+
+    def add_cancelled_copies_listener(self, listener: Callable[[Handle[Item]], None]) -> None:
+        """Register a callable to be called with each speculative copy cancelled by the queue.
+
+        A copy is cancelled when another copy of the same item is marked as done.
+        """
+        self._cancelled_copies_listeners.append(listener)
+
+    async def duplicate_stragglers(self, is_straggler: Callable[[Item], bool]) -> int:
+        """Hand over copies of in-progress items to the waiting consumers.
+
+        Only done once there are no unassigned items. Each item for which `is_straggler`
+        returns True is copied at most once, and only to a consumer that hasn't processed
+        it before. The first copy of an item to be marked as done wins, the other ones are
+        cancelled and passed to the cancelled copies listeners.
+
+        :return: the number of copies handed over to consumers
+        """
+        async with self._lock:
+            if self.has_unassigned_items() or not self._waiters:
+                return 0
+            stragglers = [
+                handle
+                for handle in self._in_progress
+                if handle._copies is None and is_straggler(handle.data)
+            ]
+            served = []
+            for consumer, waiter in self._waiters.items():
+                if not stragglers:
+                    break
+                if waiter.done():
+                    continue
+                for handle in stragglers:
+                    if not handle._excludes(consumer):
+                        stragglers.remove(handle)
+                        copy = Handle(handle.data, consumer=consumer, speculative=True)
+                        copy._prev_consumers.update(handle._prev_consumers)
+                        copy._prev_owners.update(handle._prev_owners)
+                        handle._copies = copy._copies = {handle, copy}
+                        self._in_progress[copy] = None
+                        waiter.set_result(copy)
+                        served.append(consumer)
+                        break
+            for consumer in served:
+                del self._waiters[consumer]
+        if served:
+            _logger.debug("Started speculative execution of %d items", len(served))
+        return len(served)
+
+    async def release_consumer(self, consumer: "Consumer[Item]") -> None:
+        """Finish `consumer`, stopping its iteration even if it's waiting for an item."""
+        consumer.finish()
+        async with self._lock:
+            self._wake_waiters([consumer])
 
     async def mark_done(self, handle: Handle[Item]) -> None:
         """Mark an item, referred to by `handle`, as done."""
         assert handle in self._in_progress, "handle is not in progress"
         async with self._lock:
-            self._in_progress.remove(handle)
+            del self._in_progress[handle]
+            cancelled = self._other_copies_in_progress(handle)
+            for copy in cancelled:
+                del self._in_progress[copy]
             self._eof.notify_all()
-            self._new_items.notify_all()
+            self._dispatch_items()
+        for listener in self._done_items_listeners:
+            listener(handle)
+        for copy in cancelled:
+            for listener in self._cancelled_copies_listeners:
+                listener(copy)
         if _logger.isEnabledFor(logging.DEBUG):
             stats = self.stats()
             _logger.debug("status: " + ", ".join(f"{key}: {val}" for key, val in stats.items()))
@@ -156,25 +566,37 @@ class SmartQueue(Generic[Item]):
         """Free the item for reassignment to another consumer."""
         assert handle in self._in_progress, "handle is not in progress"
         async with self._lock:
-            self._in_progress.remove(handle)
-            self._rescheduled_items.add(handle)
-            self._new_items.notify_all()
+            del self._in_progress[handle]
+            self._release(handle)
+            self._dispatch_items()
+        self._call_new_items_listeners()
+
+    async def reschedule_all(self, consumer: "Consumer[Item]", retry: bool = True):
+        """Make all items currently assigned to the consumer available for reassignment.
 
-    async def reschedule_all(self, consumer: "Consumer[Item]"):
-        """Make all items currently assigned to the consumer available for reassignment."""
+        If `retry` is False, the items weren't given up because of the consumer's failure,
+        so they don't count against their retries and may be reassigned to any consumer.
+        """
         async with self._lock:
+            self._consumers.discard(consumer)
             handles = [handle for handle in self._in_progress if handle.consumer == consumer]
             for handle in handles:
-                self._in_progress.remove(handle)
-                self._rescheduled_items.add(handle)
-            self._new_items.notify_all()
+                del self._in_progress[handle]
+                if not retry:
+                    self._forget_consumer(handle, consumer)
+                self._release(handle, retry=retry)
+            # Items avoided by other consumers with the same owner may be available to them now
+            self._dispatch_items()
+        if handles:
+            self._call_new_items_listeners()
 
     def stats(self) -> Dict:
         return {
             "locked": self._lock.locked(),
             "in progress": len(self._in_progress),
             "rescheduled": len(self._rescheduled_items),
-            "in buffer": self._buffer.qsize(),
+            "waiting consumers": len(self._waiters),
+            "in buffer": len(self._buffer),
             "incoming finished": self._incoming_finished,
         }
 
@@ -196,12 +618,15 @@ class Consumer(
     while cooperating with other consumers attached to this queue.
     """
 
-    def __init__(self, queue: SmartQueue[Item]):
+    def __init__(self, queue: SmartQueue[Item], owner: Optional[Hashable] = None):
         self._queue = queue
+        self._owner = owner
         self._fetched: Optional[Handle[Item]] = None
         self._finished = False
+        self._waiting = False
 
     def __enter__(self) -> "Consumer[Item]":
+        self._queue._consumers.add(self)
         return self
 
     def __exit__(
@@ -218,6 +643,11 @@ class Consumer(
         """The most-recent queue item that has been fetched to be processed by this consumer."""
         return self._fetched.data if self._fetched else None
 
+    @property
+    def owner(self) -> Optional[Hashable]:
+        """The key shared by the consumers that shouldn't process the same items, if any."""
+        return self._owner
+
     def finish(self):
         self._finished = True
 
@@ -225,9 +655,30 @@ class Consumer(
     def finished(self):
         return self._finished
 
+    @property
+    def waiting(self) -> bool:
+        """True if this consumer is waiting for an item to become available."""
+        return self._waiting
+
+    async def next_batch(self, max_items: int) -> List[Handle[Item]]:
+        """Fetch up to `max_items` items available in the queue, waiting for at least one of them."""
+        if self._finished:
+            raise StopAsyncIteration()
+        self._waiting = True
+        try:
+            handles = await self._queue.get_batch(self, max_items)
+        finally:
+            self._waiting = False
+        self._fetched = handles[-1]
+        return handles
+
     async def __anext__(self) -> Handle[Item]:
         if self._finished:
             raise StopAsyncIteration()
-        val = await self._queue.get(self)
+        self._waiting = True
+        try:
+            val = await self._queue.get(self)
+        finally:
+            self._waiting = False
         self._fetched = val
         return val
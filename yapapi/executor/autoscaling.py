@@ -0,0 +1,116 @@
+"""Policies deciding how many workers an :class:`~yapapi.executor.Executor` runs."""
+from dataclasses import dataclass
+from datetime import timedelta
+import time
+from typing import Optional
+
+from typing_extensions import Final
+
+DEFAULT_SCALE_DOWN_DELAY: Final[timedelta] = timedelta(seconds=30)
+"Default time for which the executor's backlog must stay empty before idle workers are stopped."
+
+
+@dataclass
+class ExecutorLoad:
+    """A snapshot of an executor's load, passed to :func:`AutoscalingPolicy.desired_workers`."""
+
+    workers: int
+    """Number of running workers, including the ones being started."""
+
+    idle_workers: int
+    """Number of running workers waiting for a task."""
+
+    backlog: int
+    """Number of tasks that are available but not assigned to any worker."""
+
+    in_progress: int
+    """Number of tasks assigned to workers."""
+
+
+class AutoscalingPolicy:
+    """Grows and shrinks the number of an executor's workers between `min_workers` and `max_workers`.
+
+    While there's a backlog of unassigned tasks and no idle workers, the number of workers
+    is doubled, or increased by one if getting an agreement takes longer than computing
+    a task (so that new workers wouldn't pay off). Once the backlog stays empty for
+    `scale_down_delay`, the idle workers are stopped and their agreements released.
+
+    Subclasses may override :func:`desired_workers` to implement a different policy,
+    using the task running times and agreement acquisition times observed by this class.
+
+    example usage::
+
+        async for completed in golem.execute_tasks(
+            worker, tasks, payload, autoscaling=AutoscalingPolicy(min_workers=2, max_workers=50)
+        ):
+            ...
+    """
+
+    def __init__(
+        self,
+        min_workers: int = 1,
+        max_workers: int = 10,
+        scale_down_delay: timedelta = DEFAULT_SCALE_DOWN_DELAY,
+    ):
+        """
+        :param min_workers: number of workers below which the policy doesn't shrink the executor
+        :param max_workers: maximum number of concurrent workers
+        :param scale_down_delay: time for which the backlog must stay empty
+            before idle workers are stopped
+        """
+        if not 0 <= min_workers <= max_workers or max_workers < 1:
+            raise ValueError(
+                f"Expected 0 <= min_workers <= max_workers and max_workers >= 1, "
+                f"got min_workers={min_workers}, max_workers={max_workers}"
+            )
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.scale_down_delay = scale_down_delay
+
+        self.task_time: Optional[float] = None
+        """Moving average of the time (in seconds) it takes to compute a task."""
+
+        self.agreement_time: Optional[float] = None
+        """Moving average of the time (in seconds) it takes to get an agreement for a worker."""
+
+        self._drained_since: Optional[float] = None
+
+    @staticmethod
+    def _update_average(average: Optional[float], value: float) -> float:
+        return value if average is None else 0.8 * average + 0.2 * value
+
+    def observe_task(self, running_time: timedelta) -> None:
+        """Record the running time of a computed task."""
+        self.task_time = self._update_average(self.task_time, running_time.total_seconds())
+
+    def observe_agreement(self, acquisition_time: timedelta) -> None:
+        """Record the time it took to get an agreement and start a worker."""
+        self.agreement_time = self._update_average(
+            self.agreement_time, acquisition_time.total_seconds()
+        )
+
+    def desired_workers(self, load: ExecutorLoad) -> int:
+        """Return the number of workers the executor should run given its current `load`."""
+
+        now = time.monotonic()
+        if load.backlog:
+            self._drained_since = None
+        elif self._drained_since is None:
+            self._drained_since = now
+
+        if load.backlog and not load.idle_workers:
+            slow_agreements = (
+                self.agreement_time is not None
+                and self.task_time is not None
+                and self.agreement_time > self.task_time
+            )
+            target = load.workers + (1 if slow_agreements else max(load.workers, 1))
+        elif (
+            self._drained_since is not None
+            and now - self._drained_since >= self.scale_down_delay.total_seconds()
+        ):
+            target = max(load.workers - load.idle_workers, self.min_workers)
+        else:
+            target = load.workers
+
+        return min(target, self.max_workers)
@@ -0,0 +1,271 @@
+"""An append-only journal of accepted tasks, used to resume interrupted computations."""
+from array import array
+import bisect
+import hashlib
+import heapq
+import logging
+import os
+from pathlib import Path
+import struct
+import time
+from typing import Any, Callable, List, Optional, Tuple, Union
+import zlib
+
+from typing_extensions import Final
+
+from . import _serialization
+from .task import Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYNC_EVERY: Final[int] = 100
+"Default number of records after which the journal is flushed and synced to disk."
+
+DEFAULT_SYNC_INTERVAL: Final[float] = 1.0
+"Default maximum time (in seconds) for which a record can stay unsynced, checked on each write."
+
+_MAGIC: Final[bytes] = b"YAPJ\x01"
+
+# crc32 of the rest of the record, key hash, length of the task id, length of the result
+_RECORD_HEADER: Final[struct.Struct] = struct.Struct("<IQHI")
+
+_SORT_CHUNK: Final[int] = 1 << 16
+"Number of records sorted at a time when a journal is loaded, bounding the temporary memory."
+
+
+def _sort_run(keys: "array[int]", offsets: "array[int]") -> Tuple["array[int]", "array[int]"]:
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    return array("Q", (keys[i] for i in order)), array("Q", (offsets[i] for i in order))
+
+
+class TaskJournal:
+    """An append-only file recording the tasks accepted by an :class:`~yapapi.executor.Executor`.
+
+    For each accepted task, the journal stores a hash of a stable key derived from the task's
+    data, the task's id and the task's encoded result, as a compact binary record. When the
+    journal is reopened (e.g. after the requestor process crashed), the tasks with keys found
+    in the journal are not computed again: they are completed with their recorded results.
+
+    Writes are buffered and synced to disk every `sync_every` records or `sync_interval`
+    seconds, whichever comes first, so a crash loses at most that many records. A record that
+    was only partially written is detected with a checksum and dropped when the journal is
+    reopened.
+
+    Only the 64-bit hashes of the keys and the offsets of the records are kept in memory,
+    in sorted arrays, so a journal with millions of entries takes some tens of megabytes.
+    Recorded results are read from the file when needed.
+
+    Results are pickled by default, so that they're restored exactly. Don't open journals
+    from untrusted sources, or pass `encode_result` and `decode_result` using a safe format.
+    If a result can't be encoded, the task isn't recorded. If writing to the journal fails,
+    e.g. because the disk is full, recording stops for the rest of the run.
+
+    example usage::
+
+        journal = TaskJournal("tasks.journal", task_key=lambda data: data["frame"])
+        async for task in golem.execute_tasks(worker, tasks, payload, journal=journal):
+            ...
+        journal.close()
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        task_key: Callable[[Any], Union[bytes, str, int]] = _serialization.default_task_key,
+        encode_result: Callable[[Any], bytes] = _serialization.encode_result,
+        decode_result: Callable[[bytes], Any] = _serialization.decode_result,
+        sync_every: int = DEFAULT_SYNC_EVERY,
+        sync_interval: float = DEFAULT_SYNC_INTERVAL,
+    ):
+        """
+        :param path: path of the journal file, created if it doesn't exist
+        :param task_key: function returning a key that identifies a task across runs, given
+            the task's data. By default, the data is serialized to JSON. Tasks for which
+            the key can't be computed are neither looked up nor recorded
+        :param encode_result: function serializing a task's result, pickle by default
+        :param decode_result: function deserializing a result serialized by `encode_result`
+        :param sync_every: number of records after which the journal is synced to disk
+        :param sync_interval: maximum time (in seconds) between syncing the journal to disk,
+            checked whenever a record is written
+        """
+        self._path = Path(path)
+        self._task_key = task_key
+        self._encode_result = encode_result
+        self._decode_result = decode_result
+        self._sync_every = sync_every
+        self._sync_interval = sync_interval
+
+        # Sorted key hashes of the records found when the journal was opened,
+        # and the offsets of the corresponding records
+        self._keys = array("Q")
+        self._offsets = array("Q")
+
+        self._load()
+        self._reader = open(self._path, "rb") if self._keys else None
+        self._file = open(self._path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(_MAGIC)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._failed = False
+
+    def __len__(self) -> int:
+        """Return the number of tasks found in the journal when it was opened."""
+        return len(self._keys)
+
+    def _hash_key(self, data: Any) -> int:
+        key = self._task_key(data)
+        if isinstance(key, int):
+            key = str(key)
+        if isinstance(key, str):
+            key = key.encode("utf-8")
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+    def _try_hash_key(self, data: Any, task_desc: str) -> Optional[int]:
+        try:
+            return self._hash_key(data)
+        except Exception:
+            logger.warning(
+                "Cannot compute the key of %s, not using task journal %s for it",
+                task_desc,
+                self._path,
+                exc_info=True,
+            )
+            return None
+
+    def _load(self) -> None:
+        if not self._path.exists() or self._path.stat().st_size == 0:
+            return
+
+        # Records are sorted in runs of `_SORT_CHUNK`, merged once the whole file is read
+        runs: List[Tuple["array[int]", "array[int]"]] = []
+        keys = array("Q")
+        offsets = array("Q")
+        num_records = 0
+        valid_size = 0
+        with open(self._path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{self._path} is not a task journal")
+            valid_size = f.tell()
+            while True:
+                offset = f.tell()
+                header = f.read(_RECORD_HEADER.size)
+                if len(header) < _RECORD_HEADER.size:
+                    break
+                crc, key_hash, id_len, result_len = _RECORD_HEADER.unpack(header)
+                body = f.read(id_len + result_len)
+                if len(body) < id_len + result_len or zlib.crc32(header[4:] + body) != crc:
+                    break
+                keys.append(key_hash)
+                offsets.append(offset)
+                num_records += 1
+                valid_size = f.tell()
+                if len(keys) == _SORT_CHUNK:
+                    runs.append(_sort_run(keys, offsets))
+                    keys, offsets = array("Q"), array("Q")
+        if keys:
+            runs.append(_sort_run(keys, offsets))
+
+        if valid_size < self._path.stat().st_size:
+            logger.warning(
+                "Dropping an incomplete record at the end of task journal %s", self._path
+            )
+            os.truncate(self._path, valid_size)
+
+        if len(runs) == 1:
+            self._keys, self._offsets = runs[0]
+        else:
+            for key_hash, offset in heapq.merge(*(zip(*run) for run in runs)):
+                self._keys.append(key_hash)
+                self._offsets.append(offset)
+        logger.debug("Loaded %d records from task journal %s", num_records, self._path)
+
+    def lookup(self, data: Any) -> Optional[Tuple[Any]]:
+        """Find a task with `data` among the tasks recorded before the journal was opened.
+
+        :return: a one-element tuple with the task's recorded result, or None if not found
+            or if the task's key can't be computed
+        """
+        key_hash = self._try_hash_key(data, "a task")
+        if key_hash is None:
+            return None
+        index = bisect.bisect_left(self._keys, key_hash)
+        if index == len(self._keys) or self._keys[index] != key_hash:
+            return None
+
+        assert self._reader
+        self._reader.seek(self._offsets[index])
+        _crc, _key_hash, id_len, result_len = _RECORD_HEADER.unpack(
+            self._reader.read(_RECORD_HEADER.size)
+        )
+        self._reader.seek(id_len, os.SEEK_CUR)
+        return (self._decode_result(self._reader.read(result_len)),)
+
+    def record(self, task: Task) -> None:
+        """Append a record of an accepted `task`.
+
+        Errors are logged rather than raised, so that they don't fail accepting the task.
+        """
+        if self._failed:
+            return
+        key_hash = self._try_hash_key(task.data, f"task {task.id}")
+        if key_hash is None:
+            return
+        try:
+            task_id = task.id.encode("utf-8")
+            result = self._encode_result(task.result)
+        except Exception:
+            logger.warning(
+                "Cannot encode the result of task %s, not recording it in journal %s",
+                task.id,
+                self._path,
+                exc_info=True,
+            )
+            return
+        header = _RECORD_HEADER.pack(0, key_hash, len(task_id), len(result))
+        crc = zlib.crc32(header[4:] + task_id + result)
+        try:
+            self._file.write(struct.pack("<I", crc) + header[4:] + task_id + result)
+        except OSError:
+            self._fail()
+            return
+
+        self._unsynced += 1
+        if (
+            self._unsynced >= self._sync_every
+            or time.monotonic() - self._last_sync >= self._sync_interval
+        ):
+            self.sync()
+
+    def _fail(self) -> None:
+        # A partially written record would hide the records appended after it
+        logger.error(
+            "Cannot write to task journal %s, not recording further tasks",
+            self._path,
+            exc_info=True,
+        )
+        self._failed = True
+
+    def sync(self) -> None:
+        """Flush the buffered records and sync the journal file to disk."""
+        if self._file.closed or self._failed:
+            return
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError:
+            self._fail()
+            return
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        """Sync and close the journal file."""
+        self.sync()
+        try:
+            self._file.close()
+        except OSError:
+            # Flushing the remaining buffered records failed
+            logger.debug("Cannot close task journal %s", self._path, exc_info=True)
+        if self._reader:
+            self._reader.close()
@@ -0,0 +1,210 @@
+"""Caches of task results, used to skip computing tasks identical to ones computed before."""
+import abc
+from collections import OrderedDict
+import contextlib
+import hashlib
+import logging
+import os
+from pathlib import Path
+import tempfile
+from typing import Any, Callable, Optional, Tuple, Union
+
+from typing_extensions import Final
+
+from yapapi.payload import Payload
+
+from . import _serialization
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_CACHE_SIZE: Final[int] = 1000
+"Default maximum number of results kept by `MemoryResultCache`."
+
+DEFAULT_DISK_CACHE_BYTES: Final[int] = 1 << 30
+"Default maximum total size (in bytes, 1 GiB) of the results stored by `DiskResultCache`."
+
+
+def _payload_key(payload: Payload) -> str:
+    """Return a string identifying the code run by `payload`, e.g. the hash of its VM image."""
+    image_hash = getattr(payload, "image_hash", None)
+    return f"image:{image_hash}" if image_hash else repr(payload)
+
+
+class ResultCache(abc.ABC):
+    """Base class for the caches of task results used by :class:`~yapapi.executor.Executor`.
+
+    Results are stored under keys derived from the task's data and the payload the task
+    is computed with, see :func:`key`. Subclasses implement :func:`get` and :func:`put`.
+    """
+
+    def __init__(
+        self, task_key: Callable[[Any], Union[bytes, str]] = _serialization.default_task_key
+    ):
+        """
+        :param task_key: function returning a key that identifies a task's computation, given
+            the task's data. By default, the data is serialized to JSON. Tasks for which
+            the key can't be computed aren't cached
+        """
+        self._task_key = task_key
+
+    def key(self, data: Any, payload: Payload) -> str:
+        """Return the cache key of a task with `data`, computed with `payload`."""
+        task_key = self._task_key(data)
+        if isinstance(task_key, str):
+            task_key = task_key.encode("utf-8")
+        digest = hashlib.sha256(_payload_key(payload).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(task_key)
+        return digest.hexdigest()
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[Tuple[Any]]:
+        """Return a one-element tuple with the result stored under `key`, or None if not found."""
+
+    @abc.abstractmethod
+    def put(self, key: str, result: Any) -> None:
+        """Store `result` under `key`."""
+
+
+class MemoryResultCache(ResultCache):
+    """A cache of task results kept in memory, evicting the least recently used ones."""
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_MEMORY_CACHE_SIZE,
+        task_key: Callable[[Any], Union[bytes, str]] = _serialization.default_task_key,
+    ):
+        """
+        :param maxsize: maximum number of cached results
+        :param task_key: function returning a key that identifies a task's computation
+        """
+        super().__init__(task_key)
+        self._maxsize = maxsize
+        self._results: "OrderedDict[str, Any]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[Any]]:
+        if key not in self._results:
+            return None
+        self._results.move_to_end(key)
+        return (self._results[key],)
+
+    def put(self, key: str, result: Any) -> None:
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self._maxsize:
+            self._results.popitem(last=False)
+
+
+class DiskResultCache(ResultCache):
+    """A cache of task results stored in files in a local directory, with an in-memory tier.
+
+    When the total size of the stored results exceeds `max_bytes`, the least recently used
+    ones are deleted. The recency of results is persisted as the files' modification times,
+    so the cache can be shared by subsequent runs of the requestor.
+
+    Results are pickled by default, so don't use a directory writable by untrusted users,
+    or pass `encode_result` and `decode_result` using a safe format. Results that can't be
+    encoded or written (e.g. because the disk is full) are only kept in memory.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        max_bytes: int = DEFAULT_DISK_CACHE_BYTES,
+        memory_size: int = DEFAULT_MEMORY_CACHE_SIZE,
+        task_key: Callable[[Any], Union[bytes, str]] = _serialization.default_task_key,
+        encode_result: Callable[[Any], bytes] = _serialization.encode_result,
+        decode_result: Callable[[bytes], Any] = _serialization.decode_result,
+    ):
+        """
+        :param directory: directory in which the results are stored, created if needed
+        :param max_bytes: maximum total size of the stored results
+        :param memory_size: maximum number of results also kept in memory
+        :param task_key: function returning a key that identifies a task's computation
+        :param encode_result: function serializing a task's result, pickle by default
+        :param decode_result: function deserializing a result serialized by `encode_result`
+        """
+        super().__init__(task_key)
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._memory = MemoryResultCache(memory_size)
+        self._encode_result = encode_result
+        self._decode_result = decode_result
+
+        # Sizes of the stored results, from the least to the most recently used
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+
+        stored = []
+        for path in self._directory.glob("*/*"):
+            if path.name.startswith("."):
+                continue
+            stat = path.stat()
+            stored.append((stat.st_mtime, path.name, stat.st_size))
+        for _mtime, key, size in sorted(stored):
+            self._sizes[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _path(self, key: str) -> Path:
+        return self._directory / key[:2] / key
+
+    def _evict(self) -> None:
+        while self._total_bytes > self._max_bytes and self._sizes:
+            key, size = self._sizes.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def _forget(self, key: str) -> None:
+        size = self._sizes.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def get(self, key: str) -> Optional[Tuple[Any]]:
+        found = self._memory.get(key)
+        if found is None and key in self._sizes:
+            path = self._path(key)
+            try:
+                found = (self._decode_result(path.read_bytes()),)
+                os.utime(path)
+            except Exception:
+                logger.debug("Cannot read cached result %s", path, exc_info=True)
+                self._forget(key)
+                return None
+            self._memory.put(key, found[0])
+        if found is not None and key in self._sizes:
+            self._sizes.move_to_end(key)
+        return found
+
+    def put(self, key: str, result: Any) -> None:
+        self._memory.put(key, result)
+        try:
+            encoded = self._encode_result(result)
+        except Exception:
+            logger.debug("Cannot encode result for %s, not storing it on disk", key, exc_info=True)
+            return
+
+        path = self._path(key)
+        tmp_name = None
+        try:
+            path.parent.mkdir(exist_ok=True)
+            # Write to a temporary file first, so that other processes never see a partial result
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".")
+            with os.fdopen(fd, "wb") as f:
+                f.write(encoded)
+            os.replace(tmp_name, path)
+        except OSError:
+            logger.warning("Cannot store result for %s on disk", key, exc_info=True)
+            if tmp_name is not None:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp_name)
+            return
+
+        self._forget(key)
+        self._sizes[key] = len(encoded)
+        self._total_bytes += len(encoded)
+        self._evict()
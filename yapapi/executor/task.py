@@ -42,12 +42,23 @@ class Task(Generic[TaskData, TaskResult]):
     def __init__(
         self,
         data: TaskData,
+        priority: int = 0,
+        deadline: Optional[datetime] = None,
     ):
         """Create a new :class:`Task` object.
 
         :param data: contains information needed to prepare command list for the provider
+        :param priority: tasks with higher priority are given to workers first
+        :param deadline: optional timezone-aware time by which the task should be completed.
+            Among tasks with the same priority, the ones with earlier deadlines are given
+            to workers first. A :class:`~yapapi.events.TaskDeadlineMissed` event is emitted
+            if the task is accepted after its deadline
         """
+        if deadline is not None and deadline.tzinfo is None:
+            raise ValueError("Task deadline must be a timezone-aware datetime")
         self.id: str = str(next(Task.ids))
+        self.priority = priority
+        self.deadline = deadline
         self._started: Optional[datetime] = None
         self._finished: Optional[datetime] = None
         self._emit: Optional[TaskEmitter] = None
@@ -60,6 +71,12 @@ class Task(Generic[TaskData, TaskResult]):
         self._data = data
         self._status: TaskStatus = TaskStatus.WAITING
 
+        # For a speculative copy: the task it's a copy of
+        self._original: Optional["Task[TaskData, TaskResult]"] = None
+        # For the original task: the task (the original or one of its copies) whose result
+        # was accepted first
+        self._accepted_copy: Optional["Task[TaskData, TaskResult]"] = None
+
     def emit(self, event_class: Type[events.TaskEventType], **kwargs) -> events.TaskEventType:
         if self._emit is None:
             raise RuntimeError("Task {self} haven't started yet, so it can't emit")
@@ -89,6 +106,26 @@ class Task(Generic[TaskData, TaskResult]):
             else:
                 loop.create_task(queue.mark_done(handle))
 
+    def _speculative_copy(self) -> "Task[TaskData, TaskResult]":
+        """Create a copy of this task to be computed while the task itself is still in progress.
+
+        The copy has the same id and data. If its result is accepted before the result of
+        the original task, the original task is completed with that result.
+        """
+        copy: Task[TaskData, TaskResult] = Task(self._data, self.priority, self.deadline)
+        copy.id = self.id
+        copy._original = self
+        return copy
+
+    def _queue_key(self) -> Tuple[int, bool, Union[datetime, int]]:
+        """Return the key by which tasks are ordered in the executor's queue, lowest first."""
+        return (-self.priority, self.deadline is None, self.deadline or 0)
+
+    def _superseded(self) -> bool:
+        """Return True if the result of another copy of this task has already been accepted."""
+        original = self._original or self
+        return original._accepted_copy is not None and original._accepted_copy is not self
+
     @staticmethod
     def for_handle(
         handle: Handle["Task[TaskData, TaskResult]"],
@@ -96,6 +133,8 @@ class Task(Generic[TaskData, TaskResult]):
         emitter: TaskEmitter,
     ) -> "Task[TaskData, TaskResult]":
         task = handle.data
+        if handle.speculative:
+            task = task._speculative_copy()
         task._handle = (handle, queue)
         task._start(emitter)
         return task
@@ -126,13 +165,25 @@ class Task(Generic[TaskData, TaskResult]):
 
         :param result: task computation result (optional)
         """
+        if self._superseded():
+            # Another copy of this task was computed first, this result is dropped
+            return
         assert self._status == TaskStatus.RUNNING, "Accepted task not running"
         self._status = TaskStatus.ACCEPTED
         self._result = result
         self.emit(events.TaskAccepted)
         self._stop()
-        for cb in self._callbacks:
-            cb(self, TaskStatus.ACCEPTED)
+        if self.deadline and self._finished and self._finished > self.deadline:
+            self.emit(events.TaskDeadlineMissed, deadline=self.deadline)
+
+        original = self._original or self
+        original._accepted_copy = self
+        if original is not self:
+            original._status = TaskStatus.ACCEPTED
+            original._result = result
+            original._finished = self._finished
+        for cb in original._callbacks:
+            cb(original, TaskStatus.ACCEPTED)
 
     def reject_result(self, reason: Optional[str] = None, retry: bool = False) -> None:
         """Reject the result of this task.
@@ -142,10 +193,13 @@ class Task(Generic[TaskData, TaskResult]):
 
         :param reason: task rejection description (optional)
         """
+        if self._superseded():
+            return
         self.emit(events.TaskRejected, reason=reason)
         assert self._status == TaskStatus.RUNNING, "Rejected task not running"
         self._status = TaskStatus.REJECTED
         self._stop(retry)
 
-        for cb in self._callbacks:
-            cb(self, TaskStatus.REJECTED)
+        if self._original is None:
+            for cb in self._callbacks:
+                cb(self, TaskStatus.REJECTED)
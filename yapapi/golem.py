@@ -30,14 +30,17 @@ from yapapi import events
 from yapapi.event_dispatcher import AsyncEventDispatcher
 from yapapi.ctx import WorkContext
 from yapapi.engine import _Engine
-from yapapi.executor import Executor
+from yapapi.executor import AutoscalingPolicy, Executor, ResultCache, TaskJournal
 from yapapi.executor.task import Task
 from yapapi.network import Network
 from yapapi.payload import Payload
 from yapapi.props import com
+from yapapi.proposal_handling import DEFAULT_MAX_PROPOSAL_HANDLERS
+from yapapi.provider_stats import ProviderStats
 from yapapi.script import Script
 from yapapi.services import Cluster, ServiceType
 from yapapi.strategy import DecreaseScoreForUnconfirmedAgreement, LeastExpensiveLinearPayuMS
+from yapapi.warm_pool import DEFAULT_WARM_POOL_TIMEOUT, WarmPool
 
 
 if TYPE_CHECKING:
@@ -57,6 +60,12 @@ class _EngineKwargs(TypedDict):
     payment_network: Optional[str]
     stream_output: bool
     app_key: Optional[str]
+    max_proposal_handlers: int
+    offer_ttl: Optional[timedelta]
+    offer_score_half_life: Optional[timedelta]
+    provider_stats: Optional[ProviderStats]
+    agreement_race_extra: int
+    pipeline_depth: Optional[int]
 
 
 class Golem:
@@ -103,6 +112,12 @@ class Golem:
         event_consumer: Optional[Callable[[events.Event], None]] = None,
         stream_output: bool = False,
         app_key: Optional[str] = None,
+        max_proposal_handlers: int = DEFAULT_MAX_PROPOSAL_HANDLERS,
+        offer_ttl: Optional[timedelta] = None,
+        offer_score_half_life: Optional[timedelta] = None,
+        provider_stats: Optional[ProviderStats] = None,
+        agreement_race_extra: int = 0,
+        pipeline_depth: Optional[int] = None,
     ):
         """Initialize Golem engine.
 
@@ -122,10 +137,33 @@ class Golem:
         :param stream_output: stream computation output from providers
         :param app_key: optional Yagna application key. If not provided, the default is to
                         get the value from `YAGNA_APPKEY` environment variable
+        :param max_proposal_handlers: maximum number of offer proposals handled concurrently
+            within a single job. The actual number adapts to the response times of the market API
+            and never exceeds this value
+        :param offer_ttl: time after which an offer that is still waiting for an agreement
+            is evicted and negotiated again, so that agreements aren't created with
+            expired drafts. If `None`, offers wait until they're used
+        :param offer_score_half_life: if given, the scores of offers waiting for an agreement
+            are halved every `offer_score_half_life`, so that fresh offers are preferred
+        :param provider_stats: optional :class:`~yapapi.provider_stats.ProviderStats`, updated
+            with the events emitted by this engine. When an agreement is reused, the one with
+            the provider with the best statistics is chosen. Pass the same instance to
+            :class:`~yapapi.strategy.BoostFastProviders` to prefer such providers' offers as well
+        :param agreement_race_extra: number of agreement proposals sent to the best offers
+            in addition to the number of agreements needed. The first agreements confirmed
+            are kept and the other proposals are cancelled (or the agreements terminated,
+            if confirmed in excess), which cuts the wait for providers slow to respond
+            at the cost of a few more market API calls
+        :param pipeline_depth: if given, scripts created with `wait_for_results=False` are
+            pipelined: the next script is uploaded and sent to the provider while the previous
+            ones are still executing, with at most `pipeline_depth` scripts in flight on
+            a single activity. Their results are processed in the order of sending
         """
         self._event_dispatcher = AsyncEventDispatcher()
 
         self.add_event_consumer(event_consumer or self._default_event_consumer())
+        if provider_stats is not None:
+            self.add_event_consumer(provider_stats.on_event)
 
         if not strategy:
             strategy = self._initialize_default_strategy()
@@ -139,6 +177,12 @@ class Golem:
             "payment_network": payment_network,
             "stream_output": stream_output,
             "app_key": app_key,
+            "max_proposal_handlers": max_proposal_handlers,
+            "offer_ttl": offer_ttl,
+            "offer_score_half_life": offer_score_half_life,
+            "provider_stats": provider_stats,
+            "agreement_race_extra": agreement_race_extra,
+            "pipeline_depth": pipeline_depth,
         }
 
         self._engine: _Engine = self._get_new_engine()
@@ -303,6 +347,16 @@ class Golem:
         timeout: Optional[timedelta] = None,
         job_id: Optional[str] = None,
         implicit_init: bool = True,
+        autoscaling: Optional[AutoscalingPolicy] = None,
+        task_group_size: Optional[int] = None,
+        speculative_percentile: Optional[float] = None,
+        task_prefetch: Optional[int] = None,
+        max_task_retries: Optional[int] = None,
+        task_retry_backoff: Optional[timedelta] = None,
+        journal: Optional[TaskJournal] = None,
+        result_cache: Optional[ResultCache] = None,
+        ordered: bool = False,
+        reorder_window: Optional[int] = None,
     ) -> AsyncIterator[Task[D, R]]:
         """Submit a sequence of tasks to be executed on providers.
 
@@ -322,6 +376,35 @@ class Golem:
             Passed as the value of the `id` parameter to :class:`yapapi.engine.Job`.
         :param implicit_init: True -> :func:`~yapapi.script.Script.deploy()` and :func:`~yapapi.script.Script.start()`
             will be called internally by the :class:`Executor`. False -> those calls must be in the `worker` function
+        :param autoscaling: an optional :class:`~yapapi.executor.AutoscalingPolicy` that grows
+            and shrinks the number of workers with the backlog of tasks. If given, `max_workers`
+            is ignored in favour of the policy's own bounds
+        :param task_group_size: if given, `worker` receives lists of up to `task_group_size`
+            tasks instead of single tasks, so that a number of small tasks can be computed with
+            a single script. Tasks in a group are accepted or rejected separately, and a rejected
+            task is retried on its own
+        :param speculative_percentile: if given, once all tasks are assigned to workers, the ones
+            running longer than this percentile (between 0 and 1) of the completed tasks' running
+            times are also computed by idle workers. The first accepted result wins and the other
+            copies are cancelled
+        :param task_prefetch: number of tasks taken from `data` in advance. Tasks are given
+            to workers according to their priorities and deadlines within this window
+        :param max_task_retries: optional number of times a task may be retried. A task failing
+            once more is dropped and a :class:`~yapapi.events.TaskFailed` event is emitted
+        :param task_retry_backoff: optional time for which a task is held back before it's
+            retried, doubled with each subsequent retry
+        :param journal: an optional :class:`~yapapi.executor.TaskJournal` recording accepted
+            tasks. Tasks found in the journal are completed with the recorded results instead
+            of being computed again, so that an interrupted computation can be resumed
+        :param result_cache: an optional :class:`~yapapi.executor.ResultCache`
+            (e.g. :class:`~yapapi.executor.DiskResultCache`) storing the results of accepted
+            tasks. Tasks with the same data and payload as a cached one are accepted with
+            the cached result instead of being computed
+        :param ordered: if True, completed tasks are yielded in the order of `data` instead
+            of the order of completion. Dropped tasks are skipped
+        :param reorder_window: in the ordered mode, maximum number of tasks taken from `data`
+            and not yet yielded. When it's reached, no more tasks are given to workers until
+            the earliest one is yielded
 
         :return: an async iterator that yields completed `Task` objects
 
@@ -349,6 +432,26 @@ class Golem:
             kwargs["max_workers"] = max_workers
         if timeout:
             kwargs["timeout"] = timeout
+        if autoscaling:
+            kwargs["autoscaling"] = autoscaling
+        if task_group_size:
+            kwargs["task_group_size"] = task_group_size
+        if speculative_percentile is not None:
+            kwargs["speculative_percentile"] = speculative_percentile
+        if task_prefetch:
+            kwargs["task_prefetch"] = task_prefetch
+        if max_task_retries is not None:
+            kwargs["max_task_retries"] = max_task_retries
+        if task_retry_backoff:
+            kwargs["task_retry_backoff"] = task_retry_backoff
+        if journal:
+            kwargs["journal"] = journal
+        if result_cache:
+            kwargs["result_cache"] = result_cache
+        if ordered:
+            kwargs["ordered"] = ordered
+        if reorder_window:
+            kwargs["reorder_window"] = reorder_window
 
         executor = Executor(_engine=self._engine, **kwargs)
         async for t in executor.submit(worker, data, job_id=job_id):
@@ -472,6 +575,36 @@ class Golem:
 
         return cluster
 
+    async def warm_up(
+        self, payload: Payload, size: int, timeout: timedelta = DEFAULT_WARM_POOL_TIMEOUT
+    ) -> WarmPool:
+        """Keep `size` activities with `payload` deployed and started, ready for computations.
+
+        Agreements are negotiated and activities are prepared in the background. Workers
+        started by :func:`execute_tasks` with the same `payload` (and implicit init enabled)
+        claim the ready activities first, so that they can compute tasks right away. Once
+        a claimed activity is done with, another one is prepared in its place.
+
+        The pool is stopped when this :class:`Golem` is stopped, or with
+        :func:`~yapapi.warm_pool.WarmPool.stop`.
+
+        :param payload: specification of the payload to deploy on the activities
+        :param size: number of activities kept ready or being prepared
+        :param timeout: time after which the agreements negotiated for the pool expire
+        :return: the started :class:`~yapapi.warm_pool.WarmPool`
+
+        example usage::
+
+            async with Golem(budget=1.0, subnet_tag="devnet-beta") as golem:
+                await golem.warm_up(package, size=5)
+                ...
+                async for completed in golem.execute_tasks(worker, tasks, payload=package):
+                    print(completed.result)
+        """
+        pool = WarmPool(self._engine, payload, size, timeout)
+        await pool.start()
+        return pool
+
     async def create_network(
         self,
         ip: str,
@@ -147,6 +147,7 @@ event_type_to_string = {
     events.ProposalResponded: "Responded to a proposal",
     events.ProposalFailed: "Failed to respond to proposal",
     events.ProposalConfirmed: "Proposal confirmed by provider",
+    events.ProposalHandlersAdjusted: "Number of concurrent proposal handlers changed",
     events.AgreementCreated: "Agreement proposal sent to provider",
     events.AgreementConfirmed: "Agreement approved by provider",
     events.AgreementRejected: "Agreement rejected by provider",
@@ -172,6 +173,8 @@ event_type_to_string = {
     events.ScriptFinished: "Script finished",
     events.TaskAccepted: "Task accepted",
     events.TaskRejected: "Task rejected",
+    events.TaskDeadlineMissed: "Task completed after its deadline",
+    events.TaskFailed: "Task failed after exhausting its retries",
     events.WorkerFinished: "Worker finished",
     events.DownloadStarted: "Download started",
     events.DownloadFinished: "Download finished",
@@ -285,6 +288,9 @@ class SummaryLogger:
     # Last number of confirmed providers
     prev_confirmed_providers: int
 
+    # Current number of concurrent proposal handlers, indexed by job id
+    proposal_handlers_limit: Dict[JobId, int]
+
     # Maps agreement ids to provider infos
     agreement_provider_info: Dict[AgreementId, ProviderInfo]
 
@@ -338,6 +344,7 @@ class SummaryLogger:
         self.error_occurred = False
         self.time_waiting_for_proposals = timedelta(0)
         self.prev_confirmed_providers = 0
+        self.proposal_handlers_limit = {}
 
     def _register_job(self, job_id: str) -> None:
         """Initialize counters for a new job."""
@@ -431,6 +438,19 @@ class SummaryLogger:
         elif isinstance(event, events.ProposalConfirmed):
             self.confirmed_proposals.add(event.prop_id)
 
+        elif isinstance(event, events.ProposalHandlersAdjusted):
+            prev_limit = self.proposal_handlers_limit.get(event.job_id)
+            self.proposal_handlers_limit[event.job_id] = event.limit
+            if prev_limit is not None and event.limit < prev_limit:
+                self.logger.info(
+                    "Market API is slow, handling up to %d proposals at a time; "
+                    "%d proposals waiting, %.1f handled per second",
+                    event.limit,
+                    event.queue_depth,
+                    event.throughput,
+                    job_id=event.job_id,
+                )
+
         elif isinstance(event, events.NoProposalsConfirmed):
             self.time_waiting_for_proposals += event.timeout
             offers_collected = event.job.offers_collected
@@ -0,0 +1,309 @@
+"""A pool of coroutines handling the offer proposals collected from the market."""
+import asyncio
+from collections import deque, OrderedDict
+import logging
+import time
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple, TypeVar
+
+from typing_extensions import Final
+
+from yapapi.rest.market import OfferProposal
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PROPOSAL_HANDLERS: Final[int] = 50
+"Default upper bound on the number of proposals handled concurrently."
+
+INITIAL_PROPOSAL_HANDLERS: Final[int] = 5
+"Number of concurrent proposal handlers the pool starts with."
+
+DEFAULT_LATENCY_THRESHOLD: Final[float] = 2.0
+"Market API round-trip time (in seconds) above which the pool considers the API congested."
+
+MAX_OFFER_SCORING_BATCH_SIZE: Final[int] = 50
+"Maximum number of collected offers passed to the market strategy to be scored at once."
+
+THROUGHPUT_WINDOW: Final[float] = 60.0
+"Length of the time window (in seconds) over which the pool's throughput is measured."
+
+DEFAULT_MAX_PENDING_PROPOSALS: Final[int] = 1000
+"Default maximum number of collected proposals waiting to be handled by a single job."
+
+T = TypeVar("T")
+
+
+class ProposalIntake:
+    """A bounded queue of collected proposals that keeps only the newest proposal per provider.
+
+    Proposals are served in the order in which their providers first appeared in the queue.
+    A proposal from a provider that already has a pending proposal replaces the pending one
+    in place, and the replaced proposal is counted in :attr:`dropped`.
+    When the queue is full, :func:`put` waits until there is free space, which stops the
+    producer (e.g. a subscription's event loop) from collecting more proposals.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAX_PENDING_PROPOSALS):
+        """
+        :param maxsize: maximum number of pending proposals, i.e. of distinct providers
+        """
+        if maxsize < 1:
+            raise ValueError(f"Expected maxsize >= 1, got {maxsize}")
+        self._maxsize = maxsize
+        self._pending: "OrderedDict[str, OfferProposal]" = OrderedDict()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+        self.dropped: int = 0
+        """Number of pending proposals replaced by newer proposals from the same provider."""
+
+    @staticmethod
+    def _key(proposal: OfferProposal) -> str:
+        #   Proposals with no issuer are never considered duplicates
+        return proposal.issuer or f"proposal:{proposal.id}"
+
+    def qsize(self) -> int:
+        return len(self._pending)
+
+    def empty(self) -> bool:
+        return not self._pending
+
+    def full(self) -> bool:
+        return len(self._pending) >= self._maxsize
+
+    def _update_events(self) -> None:
+        if self._pending:
+            self._not_empty.set()
+        else:
+            self._not_empty.clear()
+        if self.full():
+            self._not_full.clear()
+        else:
+            self._not_full.set()
+
+    def put_nowait(self, proposal: OfferProposal) -> None:
+        """Add `proposal` to the queue, raise `asyncio.QueueFull` if there's no space for it."""
+        key = self._key(proposal)
+        if key in self._pending:
+            logger.debug(
+                "Dropping proposal %s superseded by %s, provider: %s",
+                self._pending[key].id,
+                proposal.id,
+                proposal.issuer,
+            )
+            self._pending[key] = proposal
+            self.dropped += 1
+            return
+        if self.full():
+            raise asyncio.QueueFull()
+        self._pending[key] = proposal
+        self._update_events()
+
+    async def put(self, proposal: OfferProposal) -> None:
+        """Add `proposal` to the queue, waiting for free space if necessary."""
+        while self.full() and self._key(proposal) not in self._pending:
+            await self._not_full.wait()
+        self.put_nowait(proposal)
+
+    def get_nowait(self) -> OfferProposal:
+        """Remove and return the oldest pending proposal, raise `asyncio.QueueEmpty` if none."""
+        if not self._pending:
+            raise asyncio.QueueEmpty()
+        _, proposal = self._pending.popitem(last=False)
+        self._update_events()
+        return proposal
+
+    async def get(self) -> OfferProposal:
+        """Remove and return the oldest pending proposal, waiting for one if necessary."""
+        while not self._pending:
+            await self._not_empty.wait()
+        return self.get_nowait()
+
+
+class ProposalHandlerPool:
+    """Handles offer proposals with a number of long-lived coroutines.
+
+    The pool takes proposals from the `proposals` intake in batches, scores each batch with
+    `score_proposals` and passes the scored proposals to `handle_proposal`, running up to
+    `limit` handlers concurrently.
+
+    The `limit` is adjusted using the AIMD (additive increase, multiplicative decrease) rule
+    based on market API round-trip times reported with :func:`timed`: it grows by about one
+    handler per `limit` fast calls and is halved when a call is slower than `latency_threshold`
+    or fails. It always stays between `min_handlers` and `max_handlers`.
+    """
+
+    def __init__(
+        self,
+        proposals: ProposalIntake,
+        score_proposals: Callable[[List[OfferProposal]], Awaitable[List[Optional[float]]]],
+        handle_proposal: Callable[[OfferProposal, Optional[float]], Awaitable[None]],
+        max_handlers: int = DEFAULT_MAX_PROPOSAL_HANDLERS,
+        min_handlers: int = 1,
+        latency_threshold: float = DEFAULT_LATENCY_THRESHOLD,
+        on_limit_changed: Optional[Callable[[], None]] = None,
+    ):
+        """
+        :param proposals: intake of proposals waiting to be scored and handled
+        :param score_proposals: coroutine function scoring a batch of proposals
+        :param handle_proposal: coroutine function handling a single, already scored proposal
+        :param max_handlers: maximum number of proposals handled concurrently
+        :param min_handlers: minimum number of proposals handled concurrently
+        :param latency_threshold: market API round-trip time (in seconds) above which
+            the number of concurrent handlers is decreased
+        :param on_limit_changed: function called after each change of the pool's `limit`
+        """
+        if not 1 <= min_handlers <= max_handlers:
+            raise ValueError(
+                f"Expected 1 <= min_handlers <= max_handlers, "
+                f"got min_handlers={min_handlers}, max_handlers={max_handlers}"
+            )
+
+        self._proposals = proposals
+        self._score_proposals = score_proposals
+        self._handle_proposal = handle_proposal
+        self._max_handlers = max_handlers
+        self._min_handlers = min_handlers
+        self._latency_threshold = latency_threshold
+        self._on_limit_changed = on_limit_changed
+
+        self._limit: float = float(min(max(INITIAL_PROPOSAL_HANDLERS, min_handlers), max_handlers))
+        self._last_decrease: float = float("-inf")
+        self._running = False
+
+        #   Scored proposals waiting for a free handler
+        self._scored: "asyncio.Queue[Tuple[OfferProposal, Optional[float]]]" = asyncio.Queue(
+            maxsize=max_handlers
+        )
+        self._handlers: Set[asyncio.Task] = set()
+        self._num_handlers = 0
+        self._busy_handlers = 0
+
+        self._handled_timestamps: Deque[float] = deque()
+        self._handled_total = 0
+        self._latency_ewma: Optional[float] = None
+
+    @property
+    def limit(self) -> int:
+        """Current upper bound on the number of concurrently handled proposals."""
+        return int(self._limit)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of proposals waiting to be handled, including the ones not yet scored."""
+        return self._proposals.qsize() + self._scored.qsize()
+
+    @property
+    def throughput(self) -> float:
+        """Number of proposals handled per second, measured over the last `THROUGHPUT_WINDOW`."""
+        self._expire_handled_timestamps()
+        return len(self._handled_timestamps) / THROUGHPUT_WINDOW
+
+    def stats(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "handlers": self._num_handlers,
+            "busy handlers": self._busy_handlers,
+            "queue depth": self.queue_depth,
+            "dropped": self._proposals.dropped,
+            "throughput": self.throughput,
+            "handled": self._handled_total,
+            "latency": self._latency_ewma,
+        }
+
+    async def timed(self, market_call: Awaitable[T]) -> T:
+        """Await `market_call` and use its round-trip time to adjust the pool's `limit`."""
+        start = time.monotonic()
+        try:
+            result = await market_call
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.record_latency(time.monotonic() - start, success=False)
+            raise
+        self.record_latency(time.monotonic() - start)
+        return result
+
+    def record_latency(self, latency: float, success: bool = True) -> None:
+        """Adjust the pool's `limit` given a market API round-trip time."""
+
+        self._latency_ewma = (
+            latency if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * latency
+        )
+        previous_limit = self.limit
+
+        if success and latency <= self._latency_threshold:
+            self._limit = min(self._limit + 1.0 / self._limit, float(self._max_handlers))
+        else:
+            # Decrease at most once per `latency_threshold`, so that a single burst of slow calls,
+            # all started before the previous decrease, does not collapse the limit to the minimum
+            now = time.monotonic()
+            if now - self._last_decrease >= self._latency_threshold:
+                self._last_decrease = now
+                self._limit = max(self._limit / 2, float(self._min_handlers))
+
+        if self.limit != previous_limit:
+            logger.debug(
+                "Proposal handler limit changed from %d to %d, stats: %s",
+                previous_limit,
+                self.limit,
+                self.stats(),
+            )
+            self._spawn_handlers()
+            if self._on_limit_changed:
+                self._on_limit_changed()
+
+    async def run(self) -> None:
+        """Score and handle incoming proposals until cancelled."""
+
+        self._running = True
+        self._spawn_handlers()
+        try:
+            while True:
+                # Wait for a proposal and then drain all the other ones that are already
+                # available, so that they're scored in a single batch
+                proposals = [await self._proposals.get()]
+                while len(proposals) < MAX_OFFER_SCORING_BATCH_SIZE and not self._proposals.empty():
+                    proposals.append(self._proposals.get_nowait())
+
+                scores = await self._score_proposals(proposals)
+                for proposal, score in zip(proposals, scores):
+                    await self._scored.put((proposal, score))
+        finally:
+            self._running = False
+            for handler in list(self._handlers):
+                handler.cancel()
+
+    def _spawn_handlers(self) -> None:
+        while self._running and self._num_handlers < self.limit:
+            self._num_handlers += 1
+            handler = asyncio.get_event_loop().create_task(self._handler())
+            self._handlers.add(handler)
+            handler.add_done_callback(self._handlers.discard)
+
+    async def _handler(self) -> None:
+        try:
+            while True:
+                # Exit when there are more handlers than the current limit allows
+                if self._num_handlers > self.limit:
+                    return
+                proposal, score = await self._scored.get()
+                self._busy_handlers += 1
+                try:
+                    await self._handle_proposal(proposal, score)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.debug("Error when handling proposal %s", proposal.id, exc_info=True)
+                finally:
+                    self._busy_handlers -= 1
+                    self._handled_total += 1
+                    self._handled_timestamps.append(time.monotonic())
+                    self._expire_handled_timestamps()
+        finally:
+            self._num_handlers -= 1
+
+    def _expire_handled_timestamps(self) -> None:
+        deadline = time.monotonic() - THROUGHPUT_WINDOW
+        while self._handled_timestamps and self._handled_timestamps[0] < deadline:
+            self._handled_timestamps.popleft()
@@ -0,0 +1,198 @@
+"""Performance statistics of providers, collected from the events emitted by the engine."""
+from collections import deque
+from dataclasses import dataclass, field
+import json
+import logging
+import os
+from pathlib import Path
+import statistics
+import time
+from typing import Deque, Dict, Iterator, Optional, Union
+
+from typing_extensions import Final
+
+from yapapi import events
+from yapapi.script.command import Deploy, Start
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATS_WINDOW: Final[int] = 100
+"Default number of the most recent samples of each kind kept for each provider."
+
+MAX_SPEED_FACTOR: Final[float] = 2.0
+"Bound on the factor by which :func:`ProviderStats.score` boosts or penalizes a provider's speed."
+
+
+def _percentile(samples: Deque[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+@dataclass
+class _ProviderRecord:
+    """Rolling samples collected for a single provider."""
+
+    window: int
+    running_times: Deque[float] = field(init=False)
+    deploy_times: Deque[float] = field(init=False)
+    #   True for each failure, False for each success
+    outcomes: Deque[bool] = field(init=False)
+
+    def __post_init__(self):
+        self.running_times = deque(maxlen=self.window)
+        self.deploy_times = deque(maxlen=self.window)
+        self.outcomes = deque(maxlen=self.window)
+
+
+class ProviderStats:
+    """Rolling performance statistics of providers, by provider id.
+
+    For each provider, the running times of its accepted tasks, the times it took to deploy
+    and start the payload and the outcomes of its tasks and activities are kept, up to `window`
+    most recent samples of each kind. A rejected task or a failure to create an activity
+    counts as a failure.
+
+    The statistics are updated by :func:`on_event`, which needs to be registered as an event
+    consumer, e.g. by passing a `ProviderStats` instance as `provider_stats` to
+    :class:`~yapapi.Golem`. They can be persisted with :func:`save` and loaded again by passing
+    the same `path`, so that subsequent runs of the requestor benefit from them.
+
+    example usage::
+
+        stats = ProviderStats(path="provider_stats.json")
+        strategy = BoostFastProviders(LeastExpensiveLinearPayuMS(), stats)
+        async with Golem(budget=1.0, strategy=strategy, provider_stats=stats) as golem:
+            ...
+        stats.save()
+    """
+
+    def __init__(self, window: int = DEFAULT_STATS_WINDOW, path: Optional[Union[str, Path]] = None):
+        """
+        :param window: number of the most recent samples of each kind kept for each provider
+        :param path: optional path of a JSON file from which the statistics are loaded,
+            if it exists, and to which they're saved by :func:`save`
+        """
+        if window < 1:
+            raise ValueError(f"Expected window >= 1, got {window}")
+        self._window = window
+        self._path = Path(path) if path is not None else None
+        self._records: Dict[str, _ProviderRecord] = {}
+        #   Start times of the scripts that deploy or start the payload, by script id
+        self._deploys_started: Dict[int, float] = {}
+        #   Median task running time of all providers, computed when needed
+        self._overall_running_time: Optional[float] = None
+
+        if self._path is not None and self._path.exists():
+            self._load(self._path)
+
+    def __contains__(self, provider_id: str) -> bool:
+        return provider_id in self._records
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the ids of the providers with any statistics."""
+        return iter(self._records)
+
+    def _record(self, provider_id: str) -> _ProviderRecord:
+        record = self._records.get(provider_id)
+        if record is None:
+            record = self._records[provider_id] = _ProviderRecord(self._window)
+        return record
+
+    def on_event(self, event: events.Event) -> None:
+        """Update the statistics of the provider the event is related to."""
+        if isinstance(event, events.TaskAccepted):
+            record = self._record(event.provider_id)
+            record.outcomes.append(False)
+            running_time = event.task.running_time
+            if running_time is not None:
+                record.running_times.append(running_time.total_seconds())
+                self._overall_running_time = None
+        elif isinstance(event, (events.TaskRejected, events.ActivityCreateFailed)):
+            self._record(event.provider_id).outcomes.append(True)
+        elif isinstance(event, events.ScriptSent):
+            if any(isinstance(cmd, (Deploy, Start)) for cmd in event.script._commands):
+                self._deploys_started[event.script_id] = time.monotonic()
+        elif isinstance(event, events.ScriptFinished):
+            started = self._deploys_started.pop(event.script_id, None)
+            if started is not None:
+                self._record(event.provider_id).deploy_times.append(time.monotonic() - started)
+
+    def running_time(self, provider_id: str, q: float = 0.5) -> Optional[float]:
+        """Return the `q`-th percentile (between 0 and 1) of the provider's task running times.
+
+        :return: running time in seconds, or None if no task was accepted from the provider
+        """
+        record = self._records.get(provider_id)
+        return _percentile(record.running_times, q) if record else None
+
+    def deploy_time(self, provider_id: str, q: float = 0.5) -> Optional[float]:
+        """Return the `q`-th percentile of the times (in seconds) the provider took to deploy."""
+        record = self._records.get(provider_id)
+        return _percentile(record.deploy_times, q) if record else None
+
+    def failure_rate(self, provider_id: str) -> Optional[float]:
+        """Return the fraction of the provider's recent tasks and activities that failed."""
+        record = self._records.get(provider_id)
+        if not record or not record.outcomes:
+            return None
+        return sum(record.outcomes) / len(record.outcomes)
+
+    def score(self, provider_id: str) -> float:
+        """Return a factor reflecting the provider's speed and reliability.
+
+        The factor is 1.0 for a provider with no statistics. It's the provider's success rate,
+        smoothed so that a single failure doesn't bring it down to zero, multiplied by the ratio
+        of the median task running time of all providers to that of this provider, bounded by
+        :const:`MAX_SPEED_FACTOR` both ways.
+        """
+        record = self._records.get(provider_id)
+        if record is None:
+            return 1.0
+
+        failures = sum(record.outcomes)
+        factor = (len(record.outcomes) - failures + 1) / (len(record.outcomes) + 1)
+        if record.running_times:
+            if self._overall_running_time is None:
+                self._overall_running_time = statistics.median(
+                    t for r in self._records.values() for t in r.running_times
+                )
+            overall = self._overall_running_time
+            own = statistics.median(record.running_times)
+            speed = overall / own if own > 0 else MAX_SPEED_FACTOR
+            factor *= min(max(speed, 1 / MAX_SPEED_FACTOR), MAX_SPEED_FACTOR)
+        return factor
+
+    def _load(self, path: Path) -> None:
+        try:
+            with open(path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            logger.warning("Cannot load provider statistics from %s", path, exc_info=True)
+            return
+        for provider_id, samples in stored.items():
+            record = self._record(provider_id)
+            record.running_times.extend(samples.get("running_times", ()))
+            record.deploy_times.extend(samples.get("deploy_times", ()))
+            record.outcomes.extend(samples.get("outcomes", ()))
+        self._overall_running_time = None
+        logger.debug("Loaded statistics of %d providers from %s", len(stored), path)
+
+    def save(self, path: Optional[Union[str, Path]] = None) -> None:
+        """Save the statistics as JSON to `path`, by default the one given to the constructor."""
+        target = Path(path) if path is not None else self._path
+        if target is None:
+            raise ValueError("No path to save the provider statistics to")
+        stored = {
+            provider_id: {
+                "running_times": list(record.running_times),
+                "deploy_times": list(record.deploy_times),
+                "outcomes": list(record.outcomes),
+            }
+            for provider_id, record in self._records.items()
+        }
+        tmp_path = target.with_name(target.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(stored, f)
+        os.replace(tmp_path, target)
@@ -4,11 +4,18 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 import json
 import logging
-from typing import AsyncIterator, List, Optional, Tuple, Type, Any, Dict
+from typing import AsyncIterator, List, Optional, Set, Tuple, Type, Union, Any, Dict
 
 from typing_extensions import AsyncContextManager, AsyncIterable
 
-from aiohttp import ClientPayloadError
+from aiohttp import (
+    hdrs,
+    ClientConnectionError,
+    ClientPayloadError,
+    ClientResponse,
+    ClientSession,
+    ClientTimeout,
+)
 from aiohttp_sse_client.client import MessageEvent  # type: ignore
 
 from ya_activity import (
@@ -62,6 +69,7 @@ class Activity(AsyncContextManager["Activity"]):
         self._state: RequestorStateApi = _state
         self._id: str = activity_id
         self._stream_events = stream_events
+        self._event_stream: Optional["_ActivityEventStream"] = None
 
     @property
     def id(self) -> str:
@@ -86,7 +94,11 @@ class Activity(AsyncContextManager["Activity"]):
         batch_id = await self._api.call_exec(self._id, yaa.ExeScriptRequest(text=script_txt))
 
         if self._stream_events:
-            return StreamingBatch(self, batch_id, len(script), deadline)
+            if self._event_stream is None:
+                self._event_stream = _ActivityEventStream(self)
+            batch = StreamingBatch(self, batch_id, len(script), deadline)
+            self._event_stream.listen(batch)
+            return batch
         return PollingBatch(self, batch_id, len(script), deadline)
 
     async def __aenter__(self) -> "Activity":
@@ -100,6 +112,8 @@ class Activity(AsyncContextManager["Activity"]):
             )
         else:
             _log.debug("Destroying activity %s", self._id)
+        if self._event_stream is not None:
+            await self._event_stream.close()
         try:
             await self._api.destroy_activity(self._id)
             _log.debug("Activity %s destroyed successfully", self._id)
@@ -203,7 +217,23 @@ def _is_gsb_endpoint_not_found_error(err: ApiException) -> bool:
 
 
 class PollingBatch(Batch):
-    """A `Batch` implementation that polls the server repeatedly for command status."""
+    """A `Batch` implementation that polls the server repeatedly for command status.
+
+    Each call to GetExecBatchResults asks the server to wait until the next command
+    of the batch finishes (the `command_index` long-polling parameter), for up to
+    `LONG_POLL_TIMEOUT` seconds. If the server returns without new results and without
+    waiting, e.g. because it doesn't support long-polling, the next calls are delayed
+    by an interval growing from `MIN_POLL_INTERVAL` to `MAX_POLL_INTERVAL`.
+    """
+
+    LONG_POLL_TIMEOUT = 5.0
+    """Max time in seconds for which the server is asked to wait for new results."""
+
+    MIN_POLL_INTERVAL = 0.02
+    """Initial delay in seconds between calls that returned no new results without waiting."""
+
+    MAX_POLL_INTERVAL = 1.0
+    """Max delay in seconds between calls that returned no new results without waiting."""
 
     GET_EXEC_BATCH_RESULTS_MAX_TRIES = 3
     """Max number of attempts to call GetExecBatchResults if a GSB error occurs."""
@@ -220,16 +250,26 @@ class PollingBatch(Batch):
             _log.debug("Cannot query activity state", exc_info=True)
             return False, None, None
 
-    async def _get_results(self, timeout: float) -> List[yaa.ExeScriptCommandResult]:
-        """Call GetExecBatchResults with re-trying on "Endpoint address not found" GSB error."""
+    async def _get_results(
+        self, timeout: float, command_index: Optional[int] = None
+    ) -> List[yaa.ExeScriptCommandResult]:
+        """Call GetExecBatchResults with re-trying on "Endpoint address not found" GSB error.
+
+        If `command_index` is given, the server waits until the command with that index
+        finishes, for up to `timeout` seconds. Servers that don't support it ignore it.
+        """
 
         for n in range(self.GET_EXEC_BATCH_RESULTS_MAX_TRIES, 0, -1):
+            kwargs: Dict[str, Any] = {}
+            if command_index is not None:
+                kwargs["command_index"] = command_index
             try:
                 results = await self._activity._api.get_exec_batch_results(
                     self._activity._id,
                     self._batch_id,
-                    timeout=min(timeout, 5),
-                    _request_timeout=min(timeout, 5) + 0.5,
+                    timeout=timeout,
+                    _request_timeout=timeout + 0.5,
+                    **kwargs,
                 )
                 return results
             except ApiException as err:
@@ -255,7 +295,9 @@ class PollingBatch(Batch):
         return []
 
     async def __aiter__(self) -> AsyncIterator[CommandEventData]:
+        loop = asyncio.get_event_loop()
         last_idx = 0
+        poll_interval = self.MIN_POLL_INTERVAL
 
         while last_idx < self._size:
             timeout = self.seconds_left()
@@ -263,11 +305,14 @@ class PollingBatch(Batch):
                 raise BatchTimeoutError()
 
             results: List[yaa.ExeScriptCommandResult] = []
+            wait = min(timeout, self.LONG_POLL_TIMEOUT)
+            poll_started = loop.time()
             async with SuppressedExceptions(is_intermittent_error):
-                results = await self._get_results(timeout=min(timeout, 5))
+                results = await self._get_results(timeout=wait, command_index=last_idx)
 
             any_new: bool = False
-            results = results[last_idx:]
+            # The server returns the results of all finished commands, skip the ones seen before
+            results = [result for result in results if result.index >= last_idx]
             for result in results:
                 any_new = True
                 assert last_idx == result.index, f"Expected {last_idx}, got {result.index}"
@@ -284,54 +329,232 @@ class PollingBatch(Batch):
                 last_idx = result.index + 1
                 if result.is_batch_finished:
                     break
-            if not any_new:
-                delay = min(3, max(0, self.seconds_left()))
-                await asyncio.sleep(delay)
+            if any_new:
+                poll_interval = self.MIN_POLL_INTERVAL
+            elif loop.time() - poll_started < wait / 2:
+                # The server didn't wait for new results, back off before asking again
+                await asyncio.sleep(min(poll_interval, max(0, self.seconds_left())))
+                poll_interval = min(2 * poll_interval, self.MAX_POLL_INTERVAL)
+
+
+class _ActivityEventStream:
+    """A long-lived source of runtime events of an activity, shared by its `StreamingBatch`es.
+
+    The activity API streams the events of each batch from a separate endpoint, so instead
+    of a single HTTP response, the stream keeps one client session (and with it the pooled
+    keep-alive connections and the authorization headers) for all batches of the activity.
+    Events are read by a listener started as soon as a batch is sent and are routed
+    by batch id to the batch waiting for them. When the connection drops before the batch
+    finishes, the listener reconnects.
+
+    The activity API doesn't define from which event a reconnected stream starts. Events of
+    the commands already executed and a repeated start of the command in progress are skipped,
+    as they can be told apart by command index and state. Output events can't, so output of
+    the command in progress at the time of the drop may be delivered again.
+    """
 
+    RECONNECT_DELAY = 0.5
+    """Time in seconds before reconnecting after the connection dropped."""
 
-class StreamingBatch(Batch):
-    """A `Batch` implementation that uses event streaming to return command status."""
+    MAX_RECONNECTS = 5
+    """Max number of subsequent reconnects without receiving any events."""
 
-    async def __aiter__(self) -> AsyncIterator[CommandEventData]:
-        from aiohttp_sse_client import client as sse_client  # type: ignore
+    DRAIN_TIMEOUT = 1.0
+    """Max time in seconds to wait for the end of a finished batch's stream.
 
-        api_client = self._activity._api.api_client
-        host = api_client.configuration.host
-        headers = api_client.default_headers
+    Connections whose response was read to the end are reused for the subsequent batches.
+    """
 
-        api_client.update_params_for_auth(headers, None, ["app_key"])
+    def __init__(self, activity: Activity):
+        self._activity = activity
+        self._session: Optional[ClientSession] = None
+        self._headers: Dict[str, str] = {}
+        self._batches: Dict[str, "StreamingBatch"] = {}
+        self._listeners: Set[asyncio.Task] = set()
+
+    def _get_session(self) -> ClientSession:
+        if self._session is None:
+            api_client = self._activity._api.api_client
+            headers = dict(api_client.default_headers)
+            api_client.update_params_for_auth(headers, None, ["app_key"])
+            headers[hdrs.ACCEPT] = "text/event-stream"
+            headers[hdrs.CACHE_CONTROL] = "no-cache"
+            self._headers = headers
+            self._session = ClientSession()
+        return self._session
+
+    def listen(self, batch: "StreamingBatch") -> None:
+        """Start receiving the events of `batch`."""
+        self._get_session()
+        self._batches[batch.id] = batch
+        listener = asyncio.get_event_loop().create_task(self._listen(batch))
+        self._listeners.add(listener)
+        listener.add_done_callback(self._listeners.discard)
+
+    def _dispatch(self, batch_id: str, item: Union[CommandEventData, Exception, None]) -> None:
+        batch = self._batches.get(batch_id)
+        if batch is not None:
+            batch._events.put_nowait(item)
+
+    async def _listen(self, batch: "StreamingBatch") -> None:
+        try:
+            async for event_data in self._read_events(batch):
+                self._dispatch(batch.id, event_data)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._dispatch(batch.id, BatchTimeoutError())
+        except Exception as exc:
+            self._dispatch(batch.id, exc)
+        finally:
+            self._dispatch(batch.id, None)
+            self._batches.pop(batch.id, None)
+
+    async def _read_events(self, batch: "StreamingBatch") -> AsyncIterator[CommandEventData]:
+        session = self._get_session()
+        host = self._activity._api.api_client.configuration.host
+        evt_src_endpoint = f"{host}/activity/{self._activity._id}/exec/{batch.id}"
+
+        #   Index of the first command for which `CommandExecuted` wasn't delivered yet
+        next_idx = 0
+        #   Whether `CommandStarted` was delivered for the command `next_idx`
+        started = False
+        reconnects = 0
+
+        while True:
+            timeout = batch.seconds_left()
+            if timeout <= 0:
+                raise BatchTimeoutError()
+            try:
+                async with session.get(
+                    evt_src_endpoint, headers=self._headers, timeout=ClientTimeout(total=timeout)
+                ) as response:
+                    if response.status != 200:
+                        raise ConnectionError(f"fetch {evt_src_endpoint} failed: {response.status}")
+
+                    async for msg_event in _read_message_events(response):
+                        try:
+                            event_class, kwargs = _message_event_to_event_data(msg_event)
+                        except Exception as exc:  # noqa
+                            _log.error(f"Event stream exception (batch {batch.id}): {exc}")
+                            continue
+                        reconnects = 0
+
+                        # Skip the events of executed commands and the repeated start of the current
+                        # one, which may be sent again after reconnecting
+                        idx = kwargs["cmd_idx"]
+                        if idx < next_idx:
+                            continue
+                        if event_class is events.CommandStarted:
+                            if started:
+                                continue
+                            started = True
+                        yield event_class, kwargs
 
-        activity_id = self._activity._id
-        batch_id = self._batch_id
-        last_idx = self._size - 1
+                        if event_class is events.CommandExecuted:
+                            if _is_last_event(batch, event_class, kwargs):
+                                await self._drain(response)
+                                return
+                            next_idx = idx + 1
+                            started = False
+                error: Exception = ConnectionError("Event stream ended before the batch finished")
+
+            except (ClientPayloadError, ClientConnectionError) as exc:
+                error = exc
+            if reconnects >= self.MAX_RECONNECTS:
+                _log.error(f"Event stream lost (batch {batch.id}): {error}")
+                raise BatchError("Event stream lost") from error
+            reconnects += 1
+            _log.debug(
+                "Event stream dropped (batch %s): %s, reconnecting in %s s",
+                batch.id,
+                error,
+                self.RECONNECT_DELAY,
+            )
+            await asyncio.sleep(self.RECONNECT_DELAY)
 
-        evt_src_endpoint = f"{host}/activity/{activity_id}/exec/{batch_id}"
+    async def _drain(self, response: ClientResponse) -> None:
+        try:
+            await asyncio.wait_for(response.read(), timeout=self.DRAIN_TIMEOUT)
+        except (asyncio.TimeoutError, ClientPayloadError, ClientConnectionError):
+            _log.debug("Couldn't read the end of the event stream", exc_info=True)
+
+    async def close(self) -> None:
+        """Stop receiving events and close the client session."""
+        listeners = list(self._listeners)
+        for listener in listeners:
+            listener.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+async def _read_message_events(response: ClientResponse) -> AsyncIterator[MessageEvent]:
+    """Parse the server-sent events received in `response`."""
+
+    origin = str(response.real_url.origin())
+    event_type = ""
+    data: List[str] = []
+    async for line_in_bytes in response.content:
+        line = line_in_bytes.decode("utf8").rstrip("\n").rstrip("\r")
+        if not line:
+            if data:
+                yield MessageEvent(
+                    type=event_type or None,
+                    message=event_type,
+                    data="\n".join(data),
+                    origin=origin,
+                    last_event_id="",
+                )
+            event_type = ""
+            data = []
+        elif not line.startswith(":"):
+            field_name, _, field_value = line.partition(":")
+            if field_value.startswith(" "):
+                field_value = field_value[1:]
+            if field_name == "event":
+                event_type = field_value
+            elif field_name == "data":
+                data.append(field_value)
 
-        async with sse_client.EventSource(
-            evt_src_endpoint,
-            headers=headers,
-            timeout=self.seconds_left(),
-        ) as event_source:
-            try:
-                async for msg_event in event_source:
-                    try:
-                        event_class, kwargs = _message_event_to_event_data(msg_event)
-                    except Exception as exc:  # noqa
-                        _log.error(f"Event stream exception (batch {batch_id}): {exc}")
-                    else:
-                        yield event_class, kwargs
 
-                        if event_class is events.CommandExecuted and (
-                            kwargs["cmd_idx"] >= last_idx or not kwargs["success"]
-                        ):
-                            break
+def _is_last_event(batch: Batch, event_class: Type[events.CommandEvent], kwargs: Dict) -> bool:
+    """Check if no more events of `batch` follow the event given by `event_class` and `kwargs`."""
+    return event_class is events.CommandExecuted and (
+        kwargs["cmd_idx"] >= batch._size - 1 or not kwargs["success"]
+    )
 
-            except ClientPayloadError as exc:
-                _log.error(f"Event payload error (batch {batch_id}): {exc}")
-            except ConnectionError:
-                raise
-            except asyncio.TimeoutError:
-                raise BatchTimeoutError()
+
+class StreamingBatch(Batch):
+    """A `Batch` implementation that uses event streaming to return command status.
+
+    The events are received by the event stream of the activity, see `_ActivityEventStream`.
+    """
+
+    def __init__(
+        self,
+        activity: Activity,
+        batch_id: str,
+        batch_size: int,
+        deadline: Optional[datetime] = None,
+    ) -> None:
+        super().__init__(activity, batch_id, batch_size, deadline)
+        #   Events routed to this batch, followed by `None` unless the batch finishes
+        self._events: "asyncio.Queue[Union[CommandEventData, Exception, None]]" = asyncio.Queue()
+
+    async def __aiter__(self) -> AsyncIterator[CommandEventData]:
+        while True:
+            item = await self._events.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+            event_class, kwargs = item
+            if _is_last_event(self, event_class, kwargs):
+                break
 
 
 def _message_event_to_event_data(msg_event: MessageEvent) -> CommandEventData:
@@ -103,6 +103,19 @@ class Agreement(object):
             logger.debug("waitForApproval(%s) failed", self._id, exc_info=True)
             return False
 
+    async def cancel(self, reason: dict) -> bool:
+        """Cancel the agreement, which is only possible until the provider approves it.
+
+        :return: True if the agreement has been successfully cancelled, False otherwise.
+        """
+        try:
+            await self._api.cancel_agreement(self._id, request_body=reason)
+            logger.debug("cancelAgreement(%s) returned successfully", self._id)
+            return True
+        except (ApiException, asyncio.TimeoutError, aiohttp.ClientOSError):
+            logger.debug("cancelAgreement(%s) failed", self._id, exc_info=True)
+            return False
+
     async def terminate(self, reason: dict) -> bool:
         """Terminate the agreement.
 
@@ -155,6 +168,11 @@ class OfferProposal(object):
     def is_draft(self) -> bool:
         return self._proposal.proposal.state == "Draft"
 
+    @property
+    def prev_proposal_id(self) -> Optional[str]:
+        """Id of the proposal this proposal is a response to, if any."""
+        return self._proposal.proposal.prev_proposal_id
+
     async def reject(self, reason: str = "Rejected"):
         """Reject the Offer."""
         await self._subscription._api.reject_proposal_offer(
@@ -0,0 +1,173 @@
+"""Market subscriptions shared by the jobs that publish the same demand."""
+import asyncio
+from collections import OrderedDict
+import json
+import logging
+from typing import Optional, Set, TYPE_CHECKING
+
+from typing_extensions import Final
+
+from yapapi import events
+from yapapi.props import Activity
+from yapapi.props.builder import DemandBuilder
+from yapapi.rest.market import Market, OfferProposal, Subscription
+
+if TYPE_CHECKING:
+    from yapapi.engine import Job
+
+logger = logging.getLogger(__name__)
+
+MAX_REPLAYED_OFFERS: Final[int] = 1000
+"Maximum number of offers kept by a shared subscription to be passed to the jobs that join it."
+
+_EXPIRATION_KEY: Final[str] = Activity.property_keys().expiration
+
+
+def demand_key(demand_builder: DemandBuilder) -> str:
+    """Return a key identifying the demand built by `demand_builder`.
+
+    Demands that differ only in their expiration time have equal keys.
+    """
+    properties = {
+        key: value for key, value in demand_builder.properties.items() if key != _EXPIRATION_KEY
+    }
+    return json.dumps(
+        [properties, demand_builder.constraints], sort_keys=True, separators=(",", ":"), default=str
+    )
+
+
+class SharedSubscription:
+    """A market subscription whose offer proposals are passed to a number of jobs.
+
+    The subscription is created when the first job joins and deleted when the last job leaves.
+    When it expires, it's replaced with a new one created from the demand of the job with
+    the latest expiration time.
+
+    Initial offers are passed to all the jobs. Draft proposals are passed only to the job that
+    sent the counter-proposal they respond to and are dropped if no job claims them.
+    A job that joins an existing subscription receives the offers collected before it joined.
+
+    While a single job uses the subscription, collecting proposals waits for space in its
+    intake. With more jobs, one job's slow negotiations don't hold off the others: an offer
+    is dropped for the jobs with a full intake and drafts are passed in separate tasks.
+    """
+
+    def __init__(self, market_api: Market):
+        self._market_api = market_api
+        self._jobs: Set["Job"] = set()
+        self._subscription: Optional[Subscription] = None
+        self._collect_task: Optional[asyncio.Task] = None
+        #   Tasks passing drafts to jobs with a full intake
+        self._forwarding: Set[asyncio.Task] = set()
+
+        #   Latest initial offer from each provider, passed to the jobs that join later on
+        self._offers: "OrderedDict[str, OfferProposal]" = OrderedDict()
+
+    @property
+    def jobs(self) -> Set["Job"]:
+        """Jobs currently using this subscription."""
+        return set(self._jobs)
+
+    async def add_job(self, job: "Job") -> None:
+        """Start passing proposals to `job`, creating the market subscription if needed."""
+
+        self._jobs.add(job)
+        if self._collect_task is None or self._collect_task.done():
+            self._collect_task = asyncio.get_event_loop().create_task(self._collect_offers())
+        elif self._subscription is not None:
+            logger.debug("Job %s joined shared subscription %s", job.id, self._subscription.id)
+            job.emit(events.SubscriptionCreated, subscription=self._subscription)
+            for offer in list(self._offers.values()):
+                await job._receive_proposal(offer)
+
+    def remove_job(self, job: "Job") -> bool:
+        """Stop passing proposals to `job`.
+
+        When no jobs are left, the subscription is deleted and True is returned.
+        """
+
+        self._jobs.discard(job)
+        if self._jobs:
+            return False
+        if self._collect_task is not None:
+            self._collect_task.cancel()
+            self._collect_task = None
+        for task in self._forwarding:
+            task.cancel()
+        return True
+
+    async def wait(self) -> None:
+        """Wait until collecting offers fails. Cancelling this coroutine does not stop collecting."""
+        assert self._collect_task is not None, "No job has joined this subscription"
+        await asyncio.shield(self._collect_task)
+
+    def _demand_builder(self) -> DemandBuilder:
+        job = max(self._jobs, key=lambda job: job.expiration_time)
+        assert job._demand_builder is not None
+        return job._demand_builder
+
+    async def _collect_offers(self) -> None:
+        """Create a market subscription and repeatedly collect offer proposals for it.
+
+        When the subscription expires, create a new one. And so on...
+        """
+
+        while True:
+            try:
+                subscription = await self._demand_builder().subscribe(self._market_api)
+            except Exception as ex:
+                for job in list(self._jobs):
+                    job.emit(events.SubscriptionFailed, reason=str(ex))
+                raise
+
+            self._subscription = subscription
+            self._offers.clear()
+            for job in list(self._jobs):
+                job.emit(events.SubscriptionCreated, subscription=subscription)
+
+            try:
+                async with subscription:
+                    try:
+                        proposals = subscription.events()
+                    except Exception as ex:
+                        for job in list(self._jobs):
+                            job.emit(
+                                events.CollectFailed, subscription=subscription, reason=str(ex)
+                            )
+                        raise
+
+                    async for proposal in proposals:
+                        await self._dispatch(proposal)
+            finally:
+                self._subscription = None
+
+    async def _dispatch(self, proposal: OfferProposal) -> None:
+        jobs = list(self._jobs)
+        if proposal.is_draft:
+            claimed_by = next((job for job in jobs if job._claim_draft(proposal)), None)
+            if claimed_by is None:
+                logger.debug("Dropping draft %s not claimed by any job", proposal.id)
+                return
+            jobs = [claimed_by]
+        else:
+            key = proposal.issuer or f"proposal:{proposal.id}"
+            self._offers.pop(key, None)
+            self._offers[key] = proposal
+            if len(self._offers) > MAX_REPLAYED_OFFERS:
+                self._offers.popitem(last=False)
+
+        if len(self._jobs) == 1:
+            # Wait until there's space in the job's intake, so that a slow negotiation holds off
+            # collecting further proposals
+            await jobs[0]._receive_proposal(proposal)
+            return
+
+        for job in jobs:
+            if job._receive_proposal_nowait(proposal):
+                continue
+            if proposal.is_draft:
+                forwarding = asyncio.get_event_loop().create_task(job._receive_proposal(proposal))
+                self._forwarding.add(forwarding)
+                forwarding.add_done_callback(self._forwarding.discard)
+            else:
+                logger.debug("Dropping offer %s for job %s with a full intake", proposal.id, job.id)
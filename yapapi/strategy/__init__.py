@@ -10,6 +10,8 @@ from .base import (
     SCORE_REJECTED,
     SCORE_TRUSTED,
 )
+from .boost_fast_providers import BoostFastProviders
+from .caching_strategy import CachingMarketStrategy
 from .decrease_score_unconfirmed import DecreaseScoreForUnconfirmedAgreement
 from .dummy import DummyMS
 from .least_expensive import LeastExpensiveLinearPayuMS
@@ -5,7 +5,7 @@ from copy import deepcopy
 from datetime import datetime, timezone
 from decimal import Decimal
 import logging
-from typing import Dict, Optional
+from typing import Dict, Hashable, List, Optional
 
 from dataclasses import dataclass
 from typing_extensions import Final
@@ -98,6 +98,26 @@ class BaseMarketStrategy(DemandDecorator, abc.ABC):
         """Score `offer`. Better offers should get higher scores."""
         raise NotImplementedError()
 
+    async def score_offers(self, offers: List[rest.market.OfferProposal]) -> List[float]:
+        """Score a batch of `offers`, returning their scores in the same order.
+
+        The engine uses this method to score offers collected from the market in batches.
+        The default implementation calls :func:`score_offer` for each offer, strategies that
+        are able to score many offers at once more efficiently should override it.
+        """
+        return [await self.score_offer(offer) for offer in offers]
+
+    def score_cache_token(self, offer: rest.market.OfferProposal) -> Optional[Hashable]:
+        """Return a token under which the score of `offer` may be cached, or `None`.
+
+        Used by :class:`~yapapi.strategy.CachingMarketStrategy`. Offers with equal properties
+        and equal tokens must get equal scores, so the token should capture any state of
+        the strategy (e.g. the offer issuer's history) that the score depends on.
+        Changing the token for an offer invalidates its previously cached score.
+        The default implementation returns `None`, meaning that scores are never cached.
+        """
+        return None
+
     @abc.abstractmethod
     async def respond_to_provider_offer(
         self,
@@ -0,0 +1,75 @@
+import logging
+
+from typing import Hashable, List, Optional
+from yapapi import events
+from yapapi.props.builder import DemandBuilder
+from yapapi.provider_stats import ProviderStats
+from yapapi import rest
+
+from .wrapping_strategy import WrappingMarketStrategy
+
+
+class BoostFastProviders(WrappingMarketStrategy):
+    """A market strategy wrapper that modifies scoring of providers based on their performance.
+
+    Positive scores given by the base strategy are multiplied by the factor returned by
+    :func:`yapapi.provider_stats.ProviderStats.score`, so that providers that computed tasks
+    faster than others and failed less often are preferred, and the slow or unreliable ones
+    are avoided. Providers with no statistics keep their base scores.
+    """
+
+    def __init__(self, base_strategy, stats: ProviderStats):
+        """
+        :param base_strategy: the base strategy around which this strategy is wrapped
+        :param stats: statistics of providers, updated by the engine's events
+        """
+        super().__init__(base_strategy)
+        self.stats = stats
+        self._logger = logging.getLogger(f"{__name__}.{type(self).__name__}")
+
+    def on_event(self, event: events.Event) -> None:
+        """Update `stats` with `event`.
+
+        This method needs to be added as an event consumer in :func:`yapapi.Golem.add_event_consumer`,
+        unless `stats` are already updated, e.g. by passing them as `provider_stats` to
+        :class:`yapapi.Golem`.
+        """
+        self.stats.on_event(event)
+
+    async def decorate_demand(self, demand: DemandBuilder) -> None:
+        """Decorate `demand` using the base strategy."""
+        await self.base_strategy.decorate_demand(demand)
+
+    async def score_offer(self, offer: rest.market.OfferProposal) -> float:
+        """Score `offer` using the base strategy and apply the issuer's performance factor."""
+        score = await self.base_strategy.score_offer(offer)
+        return self._adjust_score(offer, score)
+
+    async def score_offers(self, offers: List[rest.market.OfferProposal]) -> List[float]:
+        """Score a batch of `offers` using the base strategy and apply performance factors.
+
+        Subclasses overriding :func:`score_offer` get all offers scored with it.
+        """
+        if type(self).score_offer is not BoostFastProviders.score_offer:
+            return await super().score_offers(offers)
+        scores = await self.base_strategy.score_offers(offers)
+        return [self._adjust_score(offer, score) for offer, score in zip(offers, scores)]
+
+    def score_cache_token(self, offer: rest.market.OfferProposal) -> Optional[Hashable]:
+        """Extend the base strategy's token with the offer issuer's performance factor.
+
+        This way a change in the issuer's statistics invalidates the cached scores of its offers.
+        """
+        base_token = self.base_strategy.score_cache_token(offer)
+        if base_token is None:
+            return None
+        return base_token, self.stats.score(offer.issuer)
+
+    def _adjust_score(self, offer: rest.market.OfferProposal, score: float) -> float:
+        factor = self.stats.score(offer.issuer)
+        if factor != 1.0 and score > 0:
+            self._logger.debug(
+                "Scaling score for offer %s from '%s' by %.2f", offer.id, offer.issuer, factor
+            )
+            score *= factor
+        return score
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Tuple
+
+from typing_extensions import Final
+
+from yapapi import rest
+
+from .base import BaseMarketStrategy
+from .wrapping_strategy import WrappingMarketStrategy
+
+DEFAULT_SCORE_CACHE_SIZE: Final[int] = 10000
+"Default maximum number of offer scores remembered by `CachingMarketStrategy`."
+
+logger = logging.getLogger(__name__)
+
+
+def props_digest(props: dict) -> bytes:
+    """Return a hash of the `props` dictionary that doesn't depend on the order of its keys."""
+    encoded = json.dumps(props, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).digest()
+
+
+class CachingMarketStrategy(WrappingMarketStrategy):
+    """A market strategy wrapper that remembers the scores given by the base strategy.
+
+    Scores are cached under a hash of the offer's properties and a token returned by
+    the base strategy's :func:`~yapapi.strategy.BaseMarketStrategy.score_cache_token`.
+    Offers for which the token is `None` are always scored by the base strategy, so only
+    the strategies that declare their scores cacheable benefit from the cache.
+    When the cache is full, the least recently used scores are evicted.
+
+    example:
+    ```python
+    >>> from yapapi.strategy import CachingMarketStrategy, LeastExpensiveLinearPayuMS
+    >>> strategy = CachingMarketStrategy(LeastExpensiveLinearPayuMS(), maxsize=1000)
+    ```
+    """
+
+    def __init__(self, base_strategy: BaseMarketStrategy, maxsize: int = DEFAULT_SCORE_CACHE_SIZE):
+        """
+        :param base_strategy: the base strategy around which this strategy is wrapped
+        :param maxsize: maximum number of cached scores
+        """
+        if maxsize < 1:
+            raise ValueError(f"Expected maxsize >= 1, got {maxsize}")
+        super().__init__(base_strategy)
+        self._maxsize = maxsize
+        self._scores: "OrderedDict[Tuple[bytes, Hashable], float]" = OrderedDict()
+
+        self.hits: int = 0
+        """Number of offers whose scores were found in the cache."""
+
+        self.misses: int = 0
+        """Number of cacheable offers that had to be scored by the base strategy."""
+
+    def clear(self) -> None:
+        """Remove all cached scores."""
+        self._scores.clear()
+
+    def _key(self, offer: rest.market.OfferProposal) -> Optional[Tuple[bytes, Hashable]]:
+        token = self.base_strategy.score_cache_token(offer)
+        if token is None:
+            return None
+        return props_digest(offer.props), token
+
+    def _lookup(self, key: Optional[Tuple[bytes, Hashable]]) -> Optional[float]:
+        if key is None or key not in self._scores:
+            return None
+        self._scores.move_to_end(key)
+        self.hits += 1
+        return self._scores[key]
+
+    def _store(self, key: Optional[Tuple[bytes, Hashable]], score: float) -> None:
+        if key is None:
+            return
+        self.misses += 1
+        self._scores[key] = score
+        if len(self._scores) > self._maxsize:
+            self._scores.popitem(last=False)
+
+    async def score_offer(self, offer: rest.market.OfferProposal) -> float:
+        """Return the cached score of `offer` or score it using the base strategy."""
+        key = self._key(offer)
+        score = self._lookup(key)
+        if score is None:
+            score = await self.base_strategy.score_offer(offer)
+            self._store(key, score)
+        return score
+
+    async def score_offers(self, offers: List[rest.market.OfferProposal]) -> List[float]:
+        """Score a batch of `offers`, passing the ones missing from the cache to the base strategy.
+
+        Subclasses overriding :func:`score_offer` get all offers scored with it.
+        """
+        if type(self).score_offer is not CachingMarketStrategy.score_offer:
+            return await super().score_offers(offers)
+        keys = [self._key(offer) for offer in offers]
+        scores = [self._lookup(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        if missing:
+            new_scores = await self.base_strategy.score_offers([offers[i] for i in missing])
+            for i, score in zip(missing, new_scores):
+                scores[i] = score
+                self._store(keys[i], score)
+
+        logger.debug(
+            "Scored %d offers, %d found in cache, cache size: %d",
+            len(offers),
+            len(offers) - len(missing),
+            len(self._scores),
+        )
+        return scores  # type: ignore
@@ -1,6 +1,6 @@
 import logging
 
-from typing import Set
+from typing import Hashable, List, Optional, Set
 from yapapi import events
 from yapapi.props.builder import DemandBuilder
 from yapapi import rest
@@ -51,6 +51,30 @@ class DecreaseScoreForUnconfirmedAgreement(WrappingMarketStrategy):
         and the base score is positive, then the base score is multiplied by `self.factor`.
         """
         score = await self.base_strategy.score_offer(offer)
+        return self._adjust_score(offer, score)
+
+    async def score_offers(self, offers: List[rest.market.OfferProposal]) -> List[float]:
+        """Score a batch of `offers` using the base strategy and apply penalties if needed.
+
+        Subclasses overriding :func:`score_offer` get all offers scored with it.
+        """
+        if type(self).score_offer is not DecreaseScoreForUnconfirmedAgreement.score_offer:
+            return await super().score_offers(offers)
+        scores = await self.base_strategy.score_offers(offers)
+        return [self._adjust_score(offer, score) for offer, score in zip(offers, scores)]
+
+    def score_cache_token(self, offer: rest.market.OfferProposal) -> Optional[Hashable]:
+        """Extend the base strategy's token with the offer issuer's agreement history.
+
+        This way an issuer confirming or rejecting an agreement invalidates the cached scores
+        of its offers.
+        """
+        base_token = self.base_strategy.score_cache_token(offer)
+        if base_token is None:
+            return None
+        return base_token, offer.issuer in self._rejecting_providers
+
+    def _adjust_score(self, offer: rest.market.OfferProposal, score: float) -> float:
         if offer.issuer in self._rejecting_providers and score > 0:
             self._logger.debug("Decreasing score for offer %s from '%s'", offer.id, offer.issuer)
             score *= self.factor
@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from decimal import Decimal
 import logging
 from types import MappingProxyType
-from typing import Dict, Mapping, Union
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Sequence, Tuple, Union
 
 from yapapi.props import com
 from yapapi.props.builder import DemandBuilder
@@ -37,6 +37,61 @@ class LeastExpensiveLinearPayuMS(MarketStrategy, object):
         # Ensure that the offer uses `PriceModel.LINEAR` price model.
         demand.ensure(f"({com.PRICE_MODEL}={com.PriceModel.LINEAR.value})")
 
+    def _prices_acceptable(
+        self,
+        offer_id: str,
+        fixed_price: float,
+        prices: Sequence[Tuple[str, float, Union[Decimal, float]]],
+    ) -> bool:
+        """Check the prices of an offer against the price caps, logging the rejection reason.
+
+        :param offer_id: id of the offer, used in log messages
+        :param fixed_price: fixed price of the offer
+        :param prices: (resource, price, price cap) triples for all usage counters of the offer
+        """
+        if fixed_price > self._max_fixed_price:
+            self._logger.debug(
+                "Rejected offer %s: fixed price higher than fixed price cap %f.",
+                offer_id,
+                self._max_fixed_price,
+            )
+            return False
+
+        if fixed_price < 0:
+            self._logger.debug("Rejected offer %s: negative fixed price", offer_id)
+            return False
+
+        for resource, price, price_cap in prices:
+
+            if price > price_cap:
+                self._logger.debug(
+                    "Rejected offer %s: price for '%s' higher than price cap %f.",
+                    offer_id,
+                    resource,
+                    price_cap,
+                )
+                return False
+
+            if price < 0:
+                self._logger.debug("Rejected offer %s: negative price for '%s'", offer_id, resource)
+                return False
+
+        return True
+
+    def _score_for_cost(self, cost: float) -> float:
+        # The higher the expected price value, the lower the score.
+        # The score is always lower than SCORE_TRUSTED and is always higher than 0.
+        return SCORE_TRUSTED * 1.0 / (cost + 1.01)
+
+    def score_cache_token(self, offer: rest.market.OfferProposal) -> Optional[Hashable]:
+        """Allow caching the scores, which depend only on the offer's properties.
+
+        Scores of subclasses overriding :func:`score_offer` are never cached.
+        """
+        if type(self).score_offer is not LeastExpensiveLinearPayuMS.score_offer:
+            return None
+        return type(self).__name__
+
     async def score_offer(self, offer: rest.market.OfferProposal) -> float:
         """Score `offer` according to cost for expected computation time."""
 
@@ -48,38 +103,72 @@ class LeastExpensiveLinearPayuMS(MarketStrategy, object):
             )
             return SCORE_REJECTED
 
-        if linear.fixed_price > self._max_fixed_price:
-            self._logger.debug(
-                "Rejected offer %s: fixed price higher than fixed price cap %f.",
-                offer.id,
-                self._max_fixed_price,
-            )
+        price_for = linear.price_for
+        prices = [
+            (resource, price_for[resource], self._max_price_for[resource])
+            for resource in linear.usage_vector
+        ]
+        if not self._prices_acceptable(offer.id, linear.fixed_price, prices):
             return SCORE_REJECTED
 
-        if linear.fixed_price < 0:
-            self._logger.debug("Rejected offer %s: negative fixed price", offer.id)
-            return SCORE_REJECTED
+        expected_usage = [self._expected_time_secs] * len(linear.usage_vector)
+        return self._score_for_cost(linear.calculate_cost(expected_usage))
 
-        expected_usage = []
+    async def score_offers(self, offers: List[rest.market.OfferProposal]) -> List[float]:
+        """Score a batch of `offers` according to cost for expected computation time.
 
-        for resource in linear.usage_vector:
+        Offers with well-formed linear PAYU pricing are scored directly from their properties,
+        without building a :class:`~yapapi.props.com.ComLinear` model for each of them,
+        and the price caps are looked up once per distinct usage vector in the batch.
+        Any other offer is passed to :func:`score_offer`. Subclasses overriding
+        :func:`score_offer` get all offers scored with it.
+        """
+        if type(self).score_offer is not LeastExpensiveLinearPayuMS.score_offer:
+            return await super().score_offers(offers)
 
-            if linear.price_for[resource] > self._max_price_for[resource]:
-                self._logger.debug(
-                    "Rejected offer %s: price for '%s' higher than price cap %f.",
-                    offer.id,
-                    resource,
-                    self._max_price_for[resource],
-                )
-                return SCORE_REJECTED
+        scores: List[float] = []
+        caps_for_usage: Dict[Tuple[str, ...], Tuple[Union[Decimal, float], ...]] = {}
 
-            if linear.price_for[resource] < 0:
-                self._logger.debug("Rejected offer %s: negative price for '%s'", offer.id, resource)
-                return SCORE_REJECTED
+        for offer in offers:
+            props = offer.props
+            coeffs = props.get(com.LINEAR_COEFFS)
+            usage_vector = props.get(com.DEFINED_USAGES)
 
-            expected_usage.append(self._expected_time_secs)
+            if not _is_linear_payu(props, coeffs, usage_vector):
+                scores.append(await self.score_offer(offer))
+                continue
 
-        # The higher the expected price value, the lower the score.
-        # The score is always lower than SCORE_TRUSTED and is always higher than 0.
-        score = SCORE_TRUSTED * 1.0 / (linear.calculate_cost(expected_usage) + 1.01)
-        return score
+            self._logger.debug(
+                "Scoring offer %s, coeffs: %s, usage vector: %s", offer.id, coeffs, usage_vector
+            )
+
+            usage_key = tuple(usage_vector)
+            caps = caps_for_usage.get(usage_key)
+            if caps is None:
+                caps = tuple(self._max_price_for[resource] for resource in usage_key)
+                caps_for_usage[usage_key] = caps
+
+            if not self._prices_acceptable(
+                offer.id, coeffs[-1], list(zip(usage_key, coeffs, caps))
+            ):
+                scores.append(SCORE_REJECTED)
+                continue
+
+            expected_usage = [self._expected_time_secs] * len(usage_key) + [1.0]
+            cost = sum([c * u for (c, u) in zip(coeffs, expected_usage)])
+            scores.append(self._score_for_cost(cost))
+
+        return scores
+
+
+def _is_linear_payu(props: dict, coeffs: Any, usage_vector: Any) -> bool:
+    """Check if `props` describe a valid linear pricing model with the PAYU billing scheme."""
+    return (
+        props.get(com.SCHEME) == com.BillingScheme.PAYU.value
+        and props.get(com.PRICE_MODEL) == com.PriceModel.LINEAR.value
+        and isinstance(coeffs, (list, tuple))
+        and isinstance(usage_vector, (list, tuple))
+        and len(coeffs) == len(usage_vector) + 1
+        and all(isinstance(c, float) for c in coeffs)
+        and all(isinstance(u, str) for u in usage_vector)
+    )
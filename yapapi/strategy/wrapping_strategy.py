@@ -1,5 +1,6 @@
 import abc
 from decimal import Decimal
+from typing import Hashable, Optional
 
 from yapapi.props.builder import DemandBuilder
 from yapapi import rest
@@ -34,6 +35,12 @@ class WrappingMarketStrategy(BaseMarketStrategy, abc.ABC):
     async def score_offer(self, offer: rest.market.OfferProposal) -> float:
         return await self.base_strategy.score_offer(offer)
 
+    def score_cache_token(self, offer: rest.market.OfferProposal) -> Optional[Hashable]:
+        """Forward to the base strategy, unless this wrapper overrides `score_offer`."""
+        if type(self).score_offer is not WrappingMarketStrategy.score_offer:
+            return None
+        return self.base_strategy.score_cache_token(offer)
+
     async def invoice_accepted_amount(self, invoice: rest.payment.Invoice) -> Decimal:
         return await self.base_strategy.invoice_accepted_amount(invoice)
 
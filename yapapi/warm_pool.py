@@ -0,0 +1,234 @@
+"""A pool of activities with a payload deployed and started ahead of the work submitted."""
+import asyncio
+from collections import deque
+import contextlib
+from datetime import datetime, timedelta, timezone
+import logging
+import sys
+from typing import Deque, List, Optional, Set
+
+from typing_extensions import Final
+
+from yapapi import events
+from yapapi.ctx import WorkContext
+from yapapi.engine import _Engine, Job
+from yapapi.payload import Payload
+from yapapi.rest.activity import Activity
+from yapapi.rest.market import Agreement
+from yapapi.script.command import Deploy, Start
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WARM_POOL_TIMEOUT: Final[timedelta] = timedelta(minutes=60)
+"Default time after which the agreements of a `WarmPool` expire."
+
+WARM_POOL_INTERVAL: Final[float] = 2.0
+"Maximum interval (in seconds) between checks whether a `WarmPool` should be refilled."
+
+
+class WarmWorker:
+    """A confirmed agreement with an activity that has its payload deployed and started."""
+
+    def __init__(self, context: WorkContext):
+        self._context = context
+        self._released: asyncio.Future = asyncio.get_event_loop().create_future()
+
+    @property
+    def agreement(self) -> Agreement:
+        return self._context._agreement
+
+    @property
+    def activity(self) -> Activity:
+        return self._context._activity
+
+    @property
+    def provider_id(self) -> str:
+        return self._context.provider_id
+
+    def release(self, reuse: bool = True) -> None:
+        """Return the worker to its pool when the work with it is done.
+
+        The activity is destroyed. If `reuse` is True, the agreement may be used to create
+        another activity for the pool, otherwise it's terminated.
+        """
+        if not self._released.done():
+            self._released.set_result(reuse)
+
+
+class WarmPool:
+    """Keeps a number of agreements with deployed and started activities ready to be claimed.
+
+    A pool uses a job of its own to negotiate agreements for its `payload`. For each agreement,
+    an activity is created and the payload is deployed and started on it, after which
+    the activity waits to be claimed by an :class:`~yapapi.executor.Executor` with the same
+    payload, so that the computation doesn't have to wait for a provider to start working.
+    When the executor is done with a claimed activity, the activity is destroyed and
+    the pool prepares another one, so that `size` activities are ready or being prepared.
+
+    Pools are created with :func:`yapapi.Golem.warm_up` and are stopped with the engine,
+    unless stopped earlier with :func:`stop`.
+    """
+
+    def __init__(
+        self,
+        engine: _Engine,
+        payload: Payload,
+        size: int,
+        timeout: timedelta = DEFAULT_WARM_POOL_TIMEOUT,
+    ):
+        """
+        :param engine: the engine negotiating the agreements and creating the activities
+        :param payload: the payload deployed and started on the activities in the pool
+        :param size: number of activities kept ready or being prepared
+        :param timeout: time after which the agreements negotiated by the pool expire
+        """
+        if size < 1:
+            raise ValueError(f"Expected size >= 1, got {size}")
+        self._engine = engine
+        self._size = size
+        self._job = Job(engine, datetime.now(timezone.utc) + timeout, payload)
+        self._idle: Deque[WarmWorker] = deque()
+        #   Tasks starting and deploying activities that are not ready yet
+        self._preparing: Set[asyncio.Task] = set()
+        self._workers: Set[asyncio.Task] = set()
+        self._services: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._stopped = False
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(job={self._job.id}, size={self._size})"
+
+    def __len__(self) -> int:
+        """Return the number of activities ready to be claimed."""
+        return len(self._idle)
+
+    @property
+    def payload(self) -> Payload:
+        """The payload deployed and started on the activities in this pool."""
+        return self._job.payload
+
+    @property
+    def size(self) -> int:
+        """Number of activities kept ready or being prepared."""
+        return self._size
+
+    async def start(self) -> None:
+        """Start negotiating agreements and preparing activities."""
+        self._engine.add_job(self._job)
+        self._engine.add_warm_pool(self)
+        loop = asyncio.get_event_loop()
+        self._services.add(loop.create_task(self._job.find_offers()))
+        self._services.add(loop.create_task(self._refill()))
+        self._job.agreements_pool.add_proposal_listener(self._wakeup.set)
+        self._wakeup.set()
+
+    def claim(self) -> Optional[WarmWorker]:
+        """Take a ready activity from the pool, if there is one.
+
+        The claimed worker must be released with :func:`WarmWorker.release` when done.
+        """
+        if not self._idle:
+            return None
+        worker = self._idle.popleft()
+        logger.debug("Claimed warm activity %s from %s", worker.activity.id, self)
+        self._wakeup.set()
+        return worker
+
+    async def _refill(self) -> None:
+        loop = asyncio.get_event_loop()
+        try:
+            while not self._stopped:
+                # The agreements pool needs to be cycled regularly even with no wakeups
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=WARM_POOL_INTERVAL)
+                self._wakeup.clear()
+                await self._job.agreements_pool.cycle()
+
+                for _ in range(self._size - len(self._idle) - len(self._preparing)):
+                    preparing = loop.create_task(self._prepare_worker())
+                    self._preparing.add(preparing)
+                    preparing.add_done_callback(self._preparing.discard)
+        finally:
+            for preparing in list(self._preparing):
+                preparing.cancel()
+
+    async def _prepare_worker(self) -> None:
+        """Start a worker and wait until its activity is ready or the worker fails."""
+        ready = asyncio.get_event_loop().create_future()
+        try:
+            worker_task = await self._engine.start_worker(
+                self._job, lambda ctx: self._run_worker(ctx, ready)
+            )
+        except Exception:
+            logger.debug("There was a problem during use_agreement", exc_info=True)
+            return
+        if worker_task is None:
+            return
+        self._workers.add(worker_task)
+        worker_task.add_done_callback(self._on_worker_done)
+        await asyncio.wait([ready, worker_task], return_when=asyncio.FIRST_COMPLETED)
+
+    def _on_worker_done(self, worker_task: asyncio.Task) -> None:
+        self._workers.discard(worker_task)
+        self._wakeup.set()
+
+    async def _run_worker(self, ctx: WorkContext, ready: asyncio.Future) -> None:
+        agreement = ctx._agreement
+        worker = None
+        try:
+            await self._deploy(ctx)
+            worker = WarmWorker(ctx)
+            self._idle.append(worker)
+            ready.set_result(None)
+            logger.debug("Warm activity %s ready in %s", ctx._activity.id, self)
+            reuse = await worker._released
+            ctx.emit(events.WorkerFinished)
+        except Exception:
+            ctx.emit(events.WorkerFinished, exc_info=sys.exc_info())  # type: ignore
+            raise
+        finally:
+            if worker is not None and worker in self._idle:
+                self._idle.remove(worker)
+            await self._engine.accept_payments_for_agreement(self._job.id, agreement.id)
+        if not reuse:
+            # Like a finished executor worker, make the agreements pool terminate the agreement
+            raise StopAsyncIteration()
+
+    async def _deploy(self, ctx: WorkContext) -> None:
+        async def deploy_and_start():
+            script = ctx.new_script()
+            script.add(Deploy())
+            script.add(Start())
+            yield script
+
+        try:
+            await self._engine.process_batches(
+                self._job.id, ctx._agreement.id, ctx._activity, deploy_and_start()
+            )
+        except StopAsyncIteration:
+            pass
+
+    async def stop(self) -> None:
+        """Stop preparing activities and terminate the agreements of the ones not claimed."""
+        if self._stopped:
+            return
+        self._stopped = True
+        self._engine.remove_warm_pool(self)
+        logger.debug("%s is shutting down...", self)
+
+        while self._idle:
+            self._idle.popleft().release(reuse=False)
+        tasks: List[asyncio.Task] = [*self._services, *self._preparing]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Claimed activities are destroyed and their agreements terminated when released
+        if self._workers:
+            await asyncio.wait(self._workers, timeout=10)
+        reason = {"message": "Successfully finished all work", "golem.requestor.code": "Success"}
+        try:
+            await self._job.agreements_pool.terminate_all(reason=reason)
+        except Exception:
+            logger.debug("Couldn't terminate agreements", exc_info=True)
+        self._engine.finalize_job(self._job)